@@ -1,11 +1,20 @@
 import sys
-import gradio as gr
-from langchain_core.messages import HumanMessage
+import threading
 import time
 
+import gradio as gr
+
 sys.path.append("src")
-from src.supervisor import supervisor_graph
-from src.config import validate_config
+from src.config import (
+    DEAL_STORE_ENABLED,
+    METRICS_HOST,
+    METRICS_PORT,
+    UI_CONCURRENCY_LIMIT,
+    validate_config,
+)
+from src.deal_store import start_deal_sync
+from src.metrics import start_metrics_server
+from src.supervisor import astream_reply, supervisor_graph, warm_up
 
 # --- Initialization ---
 print("--- Initializing Breeze AI Copilot ---")
@@ -15,49 +24,61 @@ try:
 
     # Initialize your actual supervisor graph, which is the brain of the application.
     app_supervisor = supervisor_graph
+    # LLM clients and agents are built lazily; start building them in the
+    # background so the first chat message does not pay for it.
+    threading.Thread(target=warm_up, daemon=True).start()
     print("✅ Supervisor Graph initialized successfully.")
 
+    # Deal reads are served from a local snapshot that this worker keeps fresh.
+    if DEAL_STORE_ENABLED:
+        start_deal_sync()
+
+    # Prometheus scrapes request, latency, token, cache and error metrics here.
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT, METRICS_HOST)
+        print(f"✅ Metrics served at http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+
 except Exception as e:
     print(f"❌ Critical Error on Startup: {e}")
     sys.exit(1)
 
 
 # --- Core Chatbot Logic ---
-def chat_responder(message, history):
+async def chat_responder(message, history, session_id=None):
     """
     This function is the core of the Gradio chat interface.
     It takes a user's message and the chat history, sends it to the supervisor agent,
     and streams the response back to the UI.
+
+    The conversation itself is remembered server-side per `session_id` (the
+    browser session), so follow-up questions can refer to earlier answers.
+
+    It runs the graph's async path, so a session waiting on the LLM or Pipedrive
+    does not hold a worker thread and one process can serve many chats at once.
+    Tokens are shown as the LLM generates them.
     """
 
     print(f"User Message: {message}")
 
-    # The input to the graph is a dictionary matching the AgentState
-    initial_state = {"messages": [HumanMessage(content=message)]}
-
     response_stream = ""
+    start = time.perf_counter()
+    first_token_at = None
 
-    # Stream events to see the flow of the graph in real-time
     print("Supervisor is routing the request...")
-    for event in app_supervisor.stream(initial_state, stream_mode="values"):
-        # The 'event' is the full state of the graph after a node has run
-        last_message = event["messages"][-1]
-
-        # We only want to display the final output from the chosen agent
-        if (
-            hasattr(last_message, "name")
-            and last_message.name
-            and last_message.name != "supervisor"
-        ):
-            print(f"--- Output from: {last_message.name} ---")
-            print(last_message.content)
+    async for agent, text, done in astream_reply(message, session_id):
+        if first_token_at is None:
+            first_token_at = time.perf_counter() - start
+            print(f"⏱️ First text from {agent} after {first_token_at:.2f}s")
+        if done:
+            print(f"--- Output from: {agent} ---")
+            print(text)
             print("----------------------------------------")
-            # This part handles the streaming display in the UI
-            full_content = last_message.content
-            for char in full_content:
-                response_stream += char
-                time.sleep(0.005)  # speed of streaming
-                yield response_stream
+            # The final reply replaces the streamed tokens (they are the same
+            # text when the agent streamed).
+            response_stream = text
+        else:
+            response_stream += text
+        yield response_stream
 
     # If for some reason no agent responded, provide a fallback message
     if not response_stream:
@@ -255,18 +276,21 @@ with gr.Blocks(
     def user(user_message, history):
         return "", history + [[user_message, None]]
 
-    def bot(history):
+    async def bot(history, request: gr.Request):
         user_message = history[-1][0]
         history[-1][1] = ""
-        for response_chunk in chat_responder(user_message, history):
+        async for response_chunk in chat_responder(
+            user_message, history, request.session_hash
+        ):
             history[-1][1] = response_chunk
             yield history
 
+    # The bot handler is async, so many chats can be in flight at once.
     submit_btn.click(user, [txt, chatbot], [txt, chatbot], queue=False).then(
-        bot, chatbot, chatbot
+        bot, chatbot, chatbot, concurrency_limit=UI_CONCURRENCY_LIMIT
     )
     txt.submit(user, [txt, chatbot], [txt, chatbot], queue=False).then(
-        bot, chatbot, chatbot
+        bot, chatbot, chatbot, concurrency_limit=UI_CONCURRENCY_LIMIT
     )
 
 if __name__ == "__main__":
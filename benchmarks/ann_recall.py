@@ -0,0 +1,96 @@
+"""
+Recall@k vs. latency of the IVF index (src/ann_index.py) against exact search
+on synthetic clustered vectors.
+
+Usage:
+    python benchmarks/ann_recall.py [--n 200000] [--dim 256] [--k 10]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from src.ann_index import IVFIndex, _normalize, _top_k
+
+
+def make_dataset(n: int, dim: int, queries: int, clusters: int = 1000, seed: int = 0):
+    """Gaussian blobs around random centers, which is roughly how text embeddings
+    of similar deals/notes group together."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    data = centers[rng.integers(0, clusters, n)]
+    data += 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    picks = rng.integers(0, n, queries)
+    query_vectors = data[picks] + 0.3 * rng.standard_normal((queries, dim))
+    return _normalize(data), _normalize(query_vectors.astype(np.float32))
+
+
+def exact_search(data: np.ndarray, queries: np.ndarray, k: int):
+    results = []
+    for query in queries:
+        scores = data @ query
+        results.append(set(_top_k(scores, k).tolist()))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--n", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", default="1,4,8,16,32")
+    parser.add_argument("--dtypes", default="float32,float16,int8")
+    parser.add_argument("--rerank", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"Generating {args.n} x {args.dim} vectors...")
+    data, queries = make_dataset(args.n, args.dim, args.queries)
+
+    start = time.perf_counter()
+    truth = exact_search(data, queries, args.k)
+    exact_ms = (time.perf_counter() - start) / args.queries * 1000
+    print(
+        f"Exact search: {exact_ms:.2f} ms/query, "
+        f"{data.nbytes / 1e6:.1f} MB of float32 vectors\n"
+    )
+
+    print(
+        f"{'dtype':>8} {'nprobe':>7} {'rerank':>7} {'recall@' + str(args.k):>10} "
+        f"{'ms/query':>9} {'speedup':>8} {'index MB':>9}"
+    )
+    for dtype in args.dtypes.split(","):
+        start = time.perf_counter()
+        index = IVFIndex.build(data, dtype=dtype)
+        build_s = time.perf_counter() - start
+        for nprobe in [int(x) for x in args.nprobe.split(",")]:
+            for rerank in sorted({0, args.rerank}):
+                start = time.perf_counter()
+                results = index.search(
+                    queries,
+                    k=args.k,
+                    nprobe=nprobe,
+                    rerank=rerank,
+                    exact_vectors=data,
+                )
+                ms = (time.perf_counter() - start) / args.queries * 1000
+                recall = np.mean(
+                    [
+                        len({row for row, _ in hits} & expected) / args.k
+                        for hits, expected in zip(results, truth)
+                    ]
+                )
+                print(
+                    f"{dtype:>8} {nprobe:>7} {rerank:>7} {recall:>10.3f} "
+                    f"{ms:>9.2f} {exact_ms / ms:>7.1f}x {index.nbytes / 1e6:>9.1f}"
+                )
+        print(f"   ({dtype} index built in {build_s:.1f}s, {index.nlist} lists)\n")
+
+
+if __name__ == "__main__":
+    main()
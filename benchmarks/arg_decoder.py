@@ -0,0 +1,148 @@
+"""
+Tool argument decoding on a corpus of agent outputs (well-formed and
+malformed: single quotes, trailing commas, key=value, Python literals,
+truncated replies, trailing text) with the shared decoder
+(src/tools/arg_decoder.py) vs. the per-tool pipeline it replaced (regex from
+the first "{" to the last "}", json.loads, a second json.loads for JSON
+strings, then the Pydantic model). Every input the decoder cannot read costs
+the agent another LLM iteration, so the inputs that only the legacy pipeline
+fails on are the retries avoided.
+
+Usage:
+    python benchmarks/arg_decoder.py [--repeat 2000]
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from src.tools.arg_decoder import decode_arguments
+from src.tools.crm_tools import (
+    AggregateDealsInput,
+    BulkCreateNotesInput,
+    BulkUpdateDealStatusInput,
+    CreateNoteInput,
+    UpdateDealStatusInput,
+)
+
+CORPUS = os.path.join(os.path.dirname(__file__), "data", "malformed_tool_inputs.jsonl")
+
+MODELS = {
+    "create_crm_note": CreateNoteInput,
+    "update_deal_status": UpdateDealStatusInput,
+    "bulk_create_crm_notes": BulkCreateNotesInput,
+    "bulk_update_deal_status": BulkUpdateDealStatusInput,
+    "CRM_Deal_Analytics": AggregateDealsInput,
+}
+
+
+def legacy_decode(tool_input: str, model):
+    """The pipeline each tool used to run on its input."""
+    match = re.search(r"\{.*\}", tool_input.strip(), re.DOTALL)
+    if not match:
+        return None
+    try:
+        data = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        try:
+            data = json.loads(json.loads(match.group(0)))
+        except (json.JSONDecodeError, TypeError):
+            return None
+    try:
+        return model(**data)
+    except (TypeError, ValueError):
+        return None
+
+
+def new_decode(tool_input: str, model):
+    return decode_arguments(tool_input, model)[0]
+
+
+def outcome(decoded, expected, model) -> str:
+    if decoded is None:
+        return "failed"
+    if expected is not None and decoded == model(**expected):
+        return "ok"
+    return "wrong"
+
+
+def _is_json_object(text: str) -> bool:
+    try:
+        return isinstance(json.loads(text), dict)
+    except ValueError:
+        return False
+
+
+def per_call_us(decode, cases: list, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for case in cases:
+            decode(case["input"], MODELS[case["tool"]])
+    return 1e6 * (time.perf_counter() - start) / (repeat * len(cases))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    with open(CORPUS) as f:
+        cases = [json.loads(line) for line in f]
+    decodable = [case for case in cases if case["expected"] is not None]
+    well_formed = [case for case in decodable if _is_json_object(case["input"])]
+
+    pipelines = {"legacy": legacy_decode, "decoder": new_decode}
+    results = {
+        name: [
+            outcome(
+                decode(case["input"], MODELS[case["tool"]]),
+                case["expected"],
+                MODELS[case["tool"]],
+            )
+            for case in cases
+        ]
+        for name, decode in pipelines.items()
+    }
+
+    print(
+        f"\n{len(cases)} tool inputs: {len(decodable)} decodable "
+        f"({len(well_formed)} well-formed JSON), {len(cases) - len(decodable)} not; "
+        f"{args.repeat} runs\n"
+    )
+    print(
+        f"{'pipeline':<9} {'decoded':>8} {'wrong':>6} {'retries':>8} "
+        f"{'µs well-formed':>15} {'µs all':>8}"
+    )
+    for name, decode in pipelines.items():
+        outcomes = results[name]
+        print(
+            f"{name:<9} {outcomes.count('ok'):>8} {outcomes.count('wrong'):>6} "
+            f"{outcomes.count('failed'):>8} "
+            f"{per_call_us(decode, well_formed, args.repeat):>15.1f} "
+            f"{per_call_us(decode, cases, args.repeat):>8.1f}"
+        )
+
+    # Decodable inputs the legacy pipeline sent back to the LLM.
+    retried = [
+        i
+        for i, result in enumerate(results["legacy"])
+        if result != "ok" and cases[i]["expected"] is not None
+    ]
+    avoided = sum(results["decoder"][i] == "ok" for i in retried)
+    print(
+        f"\nLLM retries avoided: {avoided} of the {len(retried)} decodable "
+        f"inputs the legacy pipeline failed on "
+        f"({avoided / max(1, len(retried)):.0%})"
+    )
+    for case, result in zip(cases, results["decoder"]):
+        if case["expected"] is not None and result != "ok":
+            print(f"  still failing: {case['tool']} {case['input']!r}")
+
+
+if __name__ == "__main__":
+    main()
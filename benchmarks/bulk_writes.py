@@ -0,0 +1,117 @@
+"""
+"Mark deals 10-60 as lost": one update_deal_status tool call per deal, which
+also costs the ReAct sales agent one LLM Thought/Action cycle per deal, versus a
+single bulk_update_deal_status call (sync and async).
+
+Pipedrive is replaced by a local stub with a fixed per-call latency that
+enforces a burst quota (429 + Retry-After above it). LLM time is not measured;
+it is estimated as `--llm-latency` seconds per agent cycle.
+
+Usage:
+    python benchmarks/bulk_writes.py [--deals 10-60] [--api-latency 0.1]
+                                     [--quota 80] [--write-rate 10] [--llm-latency 1.5]
+
+Pass --write-rate 0 to switch the client-side rate limit off and see the
+quota's 429s and retries instead.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from benchmarks.stubs import start_pipedrive_stub
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--deals", default="10-60")
+    parser.add_argument("--api-latency", type=float, default=0.1)
+    parser.add_argument(
+        "--quota", type=int, default=80, help="Calls accepted per 2 seconds."
+    )
+    parser.add_argument("--write-rate", type=float, default=10)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--llm-latency", type=float, default=1.5)
+    args = parser.parse_args()
+
+    server, base_url = start_pipedrive_stub(
+        latency=args.api_latency, rate_limit=args.quota
+    )
+    os.environ.update(
+        PIPEDRIVE_API_BASE=base_url,
+        PIPEDRIVE_API_TOKEN="stub-token",
+        PIPEDRIVE_RATE_LIMIT=str(args.write_rate),
+        PIPEDRIVE_RATE_BURST=str(max(1, int(args.write_rate * 2))),
+        PIPEDRIVE_BULK_MAX_WORKERS=str(args.workers),
+    )
+    from src.tools import crm_tools
+
+    deal_ids = crm_tools._expand_deal_ids(args.deals)
+    bulk_input = json.dumps({"deal_ids": [args.deals], "status": "lost"})
+
+    def measure(label, run, llm_cycles):
+        server.stats.update(calls=0, rate_limited=0, max_in_flight=0)
+        # Let the stub's quota window and the client's token bucket refill.
+        time.sleep(2.5)
+        start = time.perf_counter()
+        message = run()
+        elapsed = time.perf_counter() - start
+        rows.append(
+            (
+                label,
+                elapsed,
+                llm_cycles,
+                elapsed + llm_cycles * args.llm_latency,
+                dict(server.stats),
+            )
+        )
+        return message
+
+    rows = []
+    measure(
+        "one call per deal",
+        lambda: [
+            crm_tools.run_update_deal_status_tool(
+                json.dumps({"deal_id": deal_id, "status": "lost"})
+            )
+            for deal_id in deal_ids
+        ],
+        # One Thought/Action cycle per deal, plus the final answer.
+        len(deal_ids) + 1,
+    )
+    measure(
+        "bulk tool", lambda: crm_tools.run_bulk_update_deal_status_tool(bulk_input), 2
+    )
+    message = measure(
+        "bulk tool (async)",
+        lambda: asyncio.run(crm_tools.arun_bulk_update_deal_status_tool(bulk_input)),
+        2,
+    )
+    server.shutdown()
+
+    print(
+        f"\n{len(deal_ids)} deals, {args.api_latency * 1000:.0f} ms per Pipedrive call, "
+    )
+    print(
+        f"quota {args.quota} calls / 2 s, client write rate {args.write_rate}/s, "
+        f"{args.workers} workers, {args.llm_latency}s per LLM cycle (estimated)\n"
+    )
+    print(
+        f"{'mode':<20} {'API time':>9} {'LLM cycles':>11} {'est. total':>11} "
+        f"{'calls':>6} {'429s':>5} {'max in flight':>14}"
+    )
+    for label, elapsed, cycles, total, stats in rows:
+        print(
+            f"{label:<20} {elapsed:>8.2f}s {cycles:>11} {total:>10.1f}s "
+            f"{stats['calls']:>6} {stats['rate_limited']:>5} {stats['max_in_flight']:>14}"
+        )
+    print(f"\nTool result: {message}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Load test of the supervisor graph: many concurrent chat turns served by the
+blocking path (`invoke` on a fixed pool of worker threads, like a threaded web
+server) versus the async path (`ainvoke` on one event loop).
+
+All turns arrive at once, and latency is measured from arrival, so it includes
+time spent waiting for a free worker thread. The Nebius endpoint is replaced
+by a local stub with a fixed per-call latency, and the local vector store is
+used, so no API keys are needed.
+
+Usage:
+    python benchmarks/chat_load.py [--concurrency 1,10,50,100,200]
+                                   [--threads 40] [--llm-latency 2.0]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from benchmarks.stubs import start_llm_stub
+
+QUESTIONS = [
+    "What is the value of the Acme deal?",
+    "Write a marketing email about our product launch",
+    "Draft a polite response to a customer asking about an invoice delay",
+]
+
+
+def make_turns(count: int) -> list[str]:
+    # Unique texts, so no request is served from a cache.
+    return [f"{QUESTIONS[i % len(QUESTIONS)]} (#{i})" for i in range(count)]
+
+
+def summarize(label: str, concurrency: int, latencies: list[float], wall: float):
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+    print(
+        f"{label:<6} {concurrency:>11} {len(latencies) / wall:>10.1f} "
+        f"{statistics.median(latencies):>8.2f} {p95:>8.2f}"
+    )
+
+
+def run_blocking(graph, turns, concurrency, threads):
+    from langchain_core.messages import HumanMessage
+
+    start = time.perf_counter()
+
+    def turn(text):
+        graph.invoke({"messages": [HumanMessage(content=text)]})
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=min(concurrency, threads)) as pool:
+        latencies = list(pool.map(turn, turns))
+    return latencies, time.perf_counter() - start
+
+
+async def run_async(graph, turns, concurrency):
+    from langchain_core.messages import HumanMessage
+
+    slots = asyncio.Semaphore(concurrency)
+    start = time.perf_counter()
+
+    async def turn(text):
+        async with slots:
+            await graph.ainvoke({"messages": [HumanMessage(content=text)]})
+            return time.perf_counter() - start
+
+    latencies = await asyncio.gather(*(turn(text) for text in turns))
+    return latencies, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", default="1,10,50,100,200")
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=40,
+        help="Worker threads available to the blocking path.",
+    )
+    parser.add_argument("--llm-latency", type=float, default=2.0)
+    parser.add_argument("--turns-per-session", type=int, default=2)
+    args = parser.parse_args()
+
+    server, base_url = start_llm_stub(latency=args.llm_latency)
+    os.environ.update(
+        NEBIUS_API_BASE=base_url,
+        NEBIUS_API_KEY="stub-key",
+        VECTOR_STORE_BACKEND="local",
+        LOCAL_DATA_DIR=tempfile.mkdtemp(),
+        # The stub has no quota; measure concurrency, not the rate limit.
+        NEBIUS_LLM_RATE_LIMIT="0",
+        NEBIUS_EMBEDDING_RATE_LIMIT="0",
+    )
+    from src.supervisor import supervisor_graph, warm_up
+
+    warm_up()
+    print(
+        f"\n{'mode':<6} {'concurrency':>11} {'turns/s':>10} {'p50 s':>8} {'p95 s':>8}"
+    )
+    offset = 0
+    for concurrency in [int(c) for c in args.concurrency.split(",")]:
+        count = concurrency * args.turns_per_session
+        turns = make_turns(offset + count)[offset:]
+        offset += count
+        latencies, wall = run_blocking(
+            supervisor_graph, turns, concurrency, args.threads
+        )
+        summarize("sync", concurrency, latencies, wall)
+
+        turns = make_turns(offset + count)[offset:]
+        offset += count
+        latencies, wall = asyncio.run(run_async(supervisor_graph, turns, concurrency))
+        summarize("async", concurrency, latencies, wall)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Cold-start time of the copilot: importing src.supervisor, the first request
+(which builds the LLM client, agents and RAG chain on demand) and a second,
+warm request. Each run is a fresh Python process talking to a local stub of
+the Nebius endpoint and the local vector store, so no API keys are needed.
+
+Usage:
+    python benchmarks/cold_start.py [--runs 5] [--llm-latency 0.05]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(ROOT)
+
+
+def child():
+    """Runs inside the measured process and prints one JSON line of timings."""
+    start = time.perf_counter()
+    from langchain_core.messages import HumanMessage
+
+    from src.registry import build_times
+    from src.supervisor import supervisor_graph
+
+    timings = {"import_s": time.perf_counter() - start}
+    for name, question in [
+        ("first_request_s", "What is the status of the EmpowerMove deal?"),
+        ("warm_request_s", "Who owns the Global Logistics deal?"),
+    ]:
+        start = time.perf_counter()
+        supervisor_graph.invoke({"messages": [HumanMessage(content=question)]})
+        timings[name] = time.perf_counter() - start
+    timings["build_times"] = build_times()
+    print("COLD_START " + json.dumps(timings))
+
+
+def run_once(env: dict) -> dict:
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child"],
+        env=env,
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    for line in result.stdout.splitlines():
+        if line.startswith("COLD_START "):
+            return json.loads(line[len("COLD_START ") :])
+    raise RuntimeError(f"No timings in child output:\n{result.stdout}\n{result.stderr}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child()
+        return
+
+    from benchmarks.stubs import start_llm_stub
+
+    server, base_url = start_llm_stub(latency=args.llm_latency)
+    runs = []
+    with tempfile.TemporaryDirectory() as data_dir:
+        env = dict(
+            os.environ,
+            NEBIUS_API_BASE=base_url,
+            NEBIUS_API_KEY="stub-key",
+            VECTOR_STORE_BACKEND="local",
+            LOCAL_DATA_DIR=data_dir,
+        )
+        for i in range(args.runs):
+            runs.append(run_once(env))
+            print(
+                f"run {i + 1}: import {runs[-1]['import_s']:.2f}s, "
+                f"first request {runs[-1]['first_request_s']:.2f}s, "
+                f"warm request {runs[-1]['warm_request_s']:.2f}s"
+            )
+    server.shutdown()
+
+    print(f"\nMedian over {args.runs} fresh processes:")
+    for key in ("import_s", "first_request_s", "warm_request_s"):
+        print(f"  {key:<16} {statistics.median(run[key] for run in runs):.3f}")
+    print("Component build times (last run):")
+    for name, seconds in runs[-1]["build_times"].items():
+        print(f"  {seconds:8.3f}s  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Aggregation queries of the CRM_Deal_Analytics tool (src/deal_analytics.py)
+over a synthetic deal snapshot: the time to build the columnar copy, to patch
+it after a write, and per query, compared with the same aggregation written as
+a plain Python loop over the deals. Every result is checked against the loop,
+with values summed as Decimals, and its groups against `order_by`.
+
+Usage:
+    python benchmarks/deal_analytics.py [--deals 100000] [--repeat 20]
+"""
+
+import argparse
+import datetime
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from src.deal_analytics import DealAnalytics
+from src.deal_store import DealStore
+
+QUERIES = [
+    (
+        "total value of open deals by owner",
+        {
+            "metrics": ["count", "total_value"],
+            "group_by": ["owner_name"],
+            "status": ["open"],
+        },
+    ),
+    ("win rate by quarter", {"metrics": ["win_rate"], "group_by": ["quarter"]}),
+    (
+        "average value by status and year",
+        {"metrics": ["average_value"], "group_by": ["status", "year"]},
+    ),
+    (
+        "deals of one organization in 2025",
+        {
+            "metrics": ["count", "total_value"],
+            "org_name": "Org 17 Ltd",
+            "date_from": datetime.date(2025, 1, 1),
+            "date_to": datetime.date(2025, 12, 31),
+        },
+    ),
+    (
+        "value by organization and month",
+        {"metrics": ["total_value"], "group_by": ["org_name", "month"], "limit": 20},
+    ),
+    (
+        "deal count by owner, by win rate",
+        {"metrics": ["count"], "group_by": ["owner_name"], "order_by": "win_rate"},
+    ),
+    (
+        "deal count by status, by value",
+        {"metrics": ["count"], "group_by": ["status"], "order_by": "total_value"},
+    ),
+]
+
+
+def make_deals(count: int) -> list[dict]:
+    rng = random.Random(11)
+    start = datetime.datetime(2024, 1, 1)
+    deals = []
+    for i in range(1, count + 1):
+        added = start + datetime.timedelta(seconds=rng.randint(0, 900 * 86400))
+        deals.append(
+            {
+                "id": i,
+                "title": f"Deal {i}",
+                "status": rng.choice(["open", "open", "won", "lost"]),
+                "value": rng.randint(0, 5_000_000) / 100,
+                "currency": rng.choice(["EUR"] * 9 + ["USD"]),
+                "owner_name": f"Owner {rng.randint(1, 40)}",
+                "person_name": f"Contact {i}",
+                "org_name": f"Org {rng.randint(1, 2000)} Ltd",
+                "add_time": added.strftime("%Y-%m-%d %H:%M:%S"),
+                "update_time": added.strftime("%Y-%m-%d %H:%M:%S"),
+            }
+        )
+    return deals
+
+
+def _period(added: str, bucket: str) -> str:
+    year, month = int(added[:4]), int(added[5:7])
+    if bucket == "month":
+        return f"{year}-{month:02d}"
+    if bucket == "quarter":
+        return f"{year}-Q{(month - 1) // 3 + 1}"
+    return str(year)
+
+
+def python_aggregate(deals: list[dict], query: dict) -> dict:
+    """The reference: one pass over the deal dicts, exact Decimal sums."""
+    group_by = list(query.get("group_by", []))
+    metrics = {*query["metrics"], query.get("order_by")}
+    value_metrics = {"total_value", "average_value"} & metrics
+    selected = []
+    for deal in deals:
+        if query.get("status") and deal["status"] not in query["status"]:
+            continue
+        if query.get("org_name") and deal["org_name"] != query["org_name"]:
+            continue
+        day = datetime.date.fromisoformat(deal["add_time"][:10])
+        if query.get("date_from") and day < query["date_from"]:
+            continue
+        if query.get("date_to") and day > query["date_to"]:
+            continue
+        selected.append(deal)
+    if (
+        value_metrics
+        and "currency" not in group_by
+        and len({deal["currency"] for deal in selected}) > 1
+    ):
+        group_by.append("currency")
+    groups = defaultdict(lambda: [0, Decimal(0), 0, 0])
+    for deal in selected:
+        key = tuple(
+            _period(deal["add_time"], column)
+            if column in ("month", "quarter", "year")
+            else deal[column]
+            for column in group_by
+        )
+        group = groups[key]
+        group[0] += 1
+        group[1] += Decimal(str(deal["value"]))
+        group[2] += deal["status"] == "won"
+        group[3] += deal["status"] in ("won", "lost")
+    return groups
+
+
+def check(deals: list[dict], query: dict, result: dict) -> bool:
+    expected = python_aggregate(deals, query)
+    rows = result["rows"]
+    if result["groups"] != len(expected):
+        return False
+    order_by = query.get("order_by")
+    if order_by:
+        ranked = [values[order_by] for _, values in rows]
+        ranked = [-1 if value is None else value for value in ranked]
+        if ranked != sorted(ranked, reverse=True):
+            return False
+    for labels, values in rows:
+        count, total, won, closed = expected[labels]
+        if values.get("count", count) != count:
+            return False
+        if "total_value" in values and Decimal(f"{values['total_value']:.2f}") != total:
+            return False
+        if "average_value" in values and abs(
+            Decimal(values["average_value"]) - total / count
+        ) > Decimal("0.000001"):
+            return False
+        if "win_rate" in values:
+            rate = won / closed if closed else None
+            if (rate is None) != (values["win_rate"] is None) or (
+                rate is not None and abs(rate - values["win_rate"]) > 1e-12
+            ):
+                return False
+    return True
+
+
+def timed(function, repeat: int) -> float:
+    """Median seconds of a call."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--deals", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    deals = make_deals(args.deals)
+    store = DealStore(os.path.join(tempfile.mkdtemp(), "deals.sqlite"))
+    store.upsert(deals)
+    analytics = DealAnalytics(store)
+
+    start = time.perf_counter()
+    analytics.columns()
+    build = time.perf_counter() - start
+    store.apply_local(1, {"status": "won"})
+    deals[0]["status"] = "won"
+    start = time.perf_counter()
+    analytics.columns()
+    patch = time.perf_counter() - start
+
+    print(f"\n{args.deals:,} deals; median of {args.repeat} runs\n")
+    print(
+        f"Columnar copy: built in {1000 * build:.0f} ms, patched after a write in {1000 * patch:.1f} ms\n"
+    )
+    print(
+        f"{'query':<36} {'numpy ms':>9} {'python ms':>10} {'speedup':>8} {'groups':>7} {'exact':>6}"
+    )
+    for name, query in QUERIES:
+        result = analytics.aggregate(**query)
+        numpy_time = timed(
+            lambda query=query: analytics.aggregate(**query), args.repeat
+        )
+        python_time = timed(
+            lambda query=query: python_aggregate(deals, query),
+            max(1, args.repeat // 10),
+        )
+        print(
+            f"{name:<36} {1000 * numpy_time:>9.2f} {1000 * python_time:>10.1f} "
+            f"{python_time / numpy_time:>7.0f}x {result['groups']:>7} "
+            f"{'yes' if check(deals, query, result) else 'NO':>6}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Deal reads on the chat path (crm_connector.get_deal / get_recent_deals) served
+live by Pipedrive vs. by the local deal snapshot (src/deal_store.py), with
+several chats reading at once under the Pipedrive rate limit, plus the time of
+the snapshot's initial full sync.
+
+Pipedrive is replaced by a local stub with a fixed per-call latency, so no
+API keys are needed.
+
+Usage:
+    python benchmarks/deal_reads.py [--deals 5000] [--reads 200] [--threads 8]
+        [--latency 0.1] [--rate-limit 10]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from benchmarks.stubs import start_pipedrive_stub
+
+
+def make_deals(count: int) -> list[dict]:
+    rng = random.Random(7)
+    return [
+        {
+            "id": i,
+            "title": f"Deal {i}",
+            "status": rng.choice(["open", "won", "lost"]),
+            "value": rng.randint(1, 100) * 500,
+            "currency": "EUR",
+            "owner_name": f"Owner {i % 12}",
+            "person_name": f"Contact {i}",
+            "org_name": f"Org {i % 400}",
+            "add_time": f"2026-01-01 00:{i // 60 % 60:02d}:{i % 60:02d}",
+            "update_time": f"2026-02-01 00:{i // 60 % 60:02d}:{i % 60:02d}",
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+def run_reads(read, reads: int, threads: int, deal_count: int) -> tuple:
+    """Returns per-read latencies and the total wall-clock time."""
+    rng = random.Random(1)
+    ids = [rng.randint(1, deal_count) for _ in range(reads)]
+
+    def timed(deal_id):
+        start = time.perf_counter()
+        read(deal_id)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        latencies = list(pool.map(timed, ids))
+    return latencies, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--deals", type=int, default=5000)
+    parser.add_argument("--reads", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--rate-limit", type=float, default=10)
+    args = parser.parse_args()
+
+    server, base_url = start_pipedrive_stub(
+        latency=args.latency, deals=make_deals(args.deals)
+    )
+    os.environ.update(
+        PIPEDRIVE_API_BASE=base_url,
+        PIPEDRIVE_API_TOKEN="stub-token",
+        LOCAL_DATA_DIR=tempfile.mkdtemp(),
+        PIPEDRIVE_RATE_LIMIT=str(args.rate_limit),
+        PIPEDRIVE_RATE_BURST=str(int(args.rate_limit)),
+    )
+    from src import config, crm_connector
+    from src.deal_store import DealSyncWorker, get_deal_store
+
+    store = get_deal_store()
+    rows = []
+
+    # Before the first sync the snapshot is stale, so every read goes live.
+    calls = server.stats["calls"]
+    rows.append(
+        ("pipedrive",)
+        + run_reads(crm_connector.get_deal, args.reads, args.threads, args.deals)
+        + (server.stats["calls"] - calls,)
+    )
+
+    start = time.perf_counter()
+    DealSyncWorker(store, config.DEAL_STORE_SYNC_INTERVAL_SECONDS).sync_once()
+    sync_seconds = time.perf_counter() - start
+
+    calls = server.stats["calls"]
+    rows.append(
+        ("snapshot",)
+        + run_reads(crm_connector.get_deal, args.reads, args.threads, args.deals)
+        + (server.stats["calls"] - calls,)
+    )
+    server.shutdown()
+
+    print(
+        f"\n{args.reads} get_deal reads from {args.threads} threads; Pipedrive stub "
+        f"latency {args.latency:.2f}s, rate limit {args.rate_limit:g}/s\n"
+    )
+    print(
+        f"{'source':<10} {'p50 ms':>9} {'p95 ms':>9} {'reads/s':>9} "
+        f"{'Pipedrive calls':>16}"
+    )
+    for source, latencies, elapsed, calls in rows:
+        latencies.sort()
+        print(
+            f"{source:<10} {1000 * statistics.median(latencies):>9.2f} "
+            f"{1000 * latencies[int(0.95 * len(latencies))]:>9.2f} "
+            f"{len(latencies) / elapsed:>9.0f} {calls:>16}"
+        )
+    print(
+        f"\nInitial full sync of {len(store)} deals into the snapshot: "
+        f"{sync_seconds:.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,396 @@
+"""
+End-to-end benchmark: replays a corpus of realistic requests
+(benchmarks/data/e2e_corpus.jsonl) through the supervisor graph, the way the
+chat UI sends them, at several numbers of concurrent users.
+
+Every external service is replaced by a deterministic local stand-in from
+benchmarks/stubs.py: an OpenAI-compatible LLM and embeddings server with
+configurable latency, a Pipedrive API serving the recorded deals in
+benchmarks/data/e2e_deals.json, and the local vector store, which is built by
+running `ingest_data.py --rebuild` against the stubs first. The stub LLM
+routes escalations to the corpus label and makes the tool call a model would
+(note, status update, bulk update or deal lookup), so the Sales Agent's tool
+steps really reach the Pipedrive stub.
+
+For each level of concurrency (closed loop: every user sends its next request
+as soon as the previous reply is complete) it reports p50/p95/p99 latency,
+time to the first streamed chunk, throughput and errors, and a per-stage
+breakdown from the metrics registry (src/metrics.py): the time spent per turn
+in each graph node, in LLM calls, tools, retrieval and embeddings, and in
+HTTP calls per endpoint. Stages nest, so their times do not add up.
+
+`--save-baseline` writes the results as JSON; `--baseline` compares a run
+against one and exits with status 1 when p95 latency or throughput regress by
+more than `--tolerance`, so the script can gate CI:
+
+    python benchmarks/e2e.py --save-baseline benchmarks/baselines/e2e.json
+    python benchmarks/e2e.py --baseline benchmarks/baselines/e2e.json
+
+Usage:
+    python benchmarks/e2e.py [--users 1,8,32] [--turns 0] [--llm-latency 0.3]
+        [--token-latency 0.01] [--pipedrive-latency 0.1] [--rate-limits]
+        [--sales-agent-mode tool_calling|react]
+        [--save-baseline PATH] [--baseline PATH] [--tolerance 0.2]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import itertools
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from benchmarks.stubs import start_llm_stub, start_pipedrive_stub
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+DATA_DIR = os.path.join(ROOT, "benchmarks", "data")
+CORPUS_PATH = os.path.join(DATA_DIR, "e2e_corpus.jsonl")
+DEALS_PATH = os.path.join(DATA_DIR, "e2e_deals.json")
+
+STATUS = r"\b(won|lost|open)\b"
+
+
+def load_corpus(path: str) -> list[dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def react_action(question: str):
+    """The tool call a model would make for a Sales Agent question."""
+    deal_range = re.search(r"deals\s+(\d+)\s*-\s*(\d+)", question, re.IGNORECASE)
+    status = re.search(STATUS, question, re.IGNORECASE)
+    if deal_range and status:
+        return "bulk_update_deal_status", json.dumps(
+            {"deal_ids": [f"{deal_range[1]}-{deal_range[2]}"], "status": status[1]}
+        )
+    note = re.search(r"note to deal (\d+) saying (.+)", question, re.IGNORECASE)
+    if note:
+        return "create_crm_note", json.dumps(
+            {"deal_id": int(note[1]), "content": note[2].strip()}
+        )
+    deal = re.search(r"deal (\d+)", question, re.IGNORECASE)
+    if deal and status and re.search(r"\b(mark|update|set)\b", question, re.IGNORECASE):
+        return "update_deal_status", json.dumps(
+            {"deal_id": int(deal[1]), "status": status[1].lower()}
+        )
+    return "CRM_Deal_Lookup", question
+
+
+def make_router(corpus: list[dict]):
+    """Answers the supervisor's routing requests with the corpus label."""
+    labels = {entry["text"]: entry["label"] for entry in corpus}
+
+    def tool_arguments(body):
+        message = body["messages"][-1]["content"]
+        text = re.sub(r" \(ref \d+\)$", "", message)
+        if text in labels:
+            return {"next": labels[text]}
+        # Sub-tasks of compound requests are not in the corpus.
+        if re.search(r"\b(deal|note|status)\b", text, re.IGNORECASE):
+            return {"next": "Sales Agent"}
+        if re.search(r"\b(email|blog|post|campaign|subject)\b", text, re.IGNORECASE):
+            return {"next": "Marketing Agent"}
+        return {"next": "Service Agent"}
+
+    return tool_arguments
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def histogram_totals(histogram) -> dict:
+    """{label: (seconds, calls)} of a histogram with one label."""
+    return {key[0]: (value[1], value[2]) for key, value in histogram.collect().items()}
+
+
+def stage_snapshot(metrics) -> dict:
+    stages = histogram_totals(metrics.STAGE_SECONDS)
+    for endpoint, totals in histogram_totals(metrics.HTTP_SECONDS).items():
+        stages[f"http:{endpoint}"] = totals
+    return stages
+
+
+def stage_breakdown(before: dict, after: dict, turns: int) -> dict:
+    """Milliseconds and calls per turn spent in each stage between two snapshots."""
+    breakdown = {}
+    for stage, (seconds, calls) in sorted(after.items()):
+        seconds_before, calls_before = before.get(stage, (0.0, 0))
+        if calls > calls_before:
+            breakdown[stage] = {
+                "ms_per_turn": round(1000 * (seconds - seconds_before) / turns, 2),
+                "calls_per_turn": round((calls - calls_before) / turns, 2),
+            }
+    return breakdown
+
+
+async def run_level(astream_reply, metrics, corpus, users: int, turns: int, refs):
+    """Runs `turns` requests with `users` concurrent users; returns the results."""
+    requests = iter([corpus[i % len(corpus)] for i in range(turns)])
+    samples = []
+
+    async def user():
+        for entry in requests:
+            # A unique reference keeps repeated requests out of the caches.
+            message = f"{entry['text']} (ref {next(refs)})"
+            start = time.perf_counter()
+            first = None
+            error = None
+            try:
+                async for _ in astream_reply(message):
+                    if first is None:
+                        first = time.perf_counter() - start
+            except Exception as e:
+                error = repr(e)
+            samples.append(
+                {
+                    "category": entry["category"],
+                    "latency": time.perf_counter() - start,
+                    "first_chunk": first,
+                    "error": error,
+                }
+            )
+
+    before = stage_snapshot(metrics)
+    start = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(users)))
+    elapsed = time.perf_counter() - start
+    latencies = [s["latency"] for s in samples]
+    first_chunks = [s["first_chunk"] for s in samples if s["first_chunk"] is not None]
+    by_category = {}
+    for sample in samples:
+        by_category.setdefault(sample["category"], []).append(sample["latency"])
+    return {
+        "users": users,
+        "turns": len(samples),
+        "p50_s": round(percentile(latencies, 0.50), 4),
+        "p95_s": round(percentile(latencies, 0.95), 4),
+        "p99_s": round(percentile(latencies, 0.99), 4),
+        "first_chunk_p50_s": round(statistics.median(first_chunks), 4)
+        if first_chunks
+        else None,
+        "throughput_rps": round(len(samples) / elapsed, 3),
+        "errors": sum(1 for s in samples if s["error"]),
+        "first_error": next((s["error"] for s in samples if s["error"]), None),
+        "categories_p50_s": {
+            category: round(statistics.median(values), 4)
+            for category, values in sorted(by_category.items())
+        },
+        "stages": stage_breakdown(before, stage_snapshot(metrics), len(samples)),
+    }
+
+
+def build_store(env: dict):
+    """Runs the real ingestion against the Pipedrive and embeddings stubs."""
+    try:
+        subprocess.run(
+            [sys.executable, "ingest_data.py", "--rebuild"],
+            cwd=ROOT,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except subprocess.CalledProcessError as e:
+        sys.exit(f"❌ Ingestion failed:\n{e.stdout}\n{e.stderr}")
+
+
+def print_level(level: dict):
+    first = level["first_chunk_p50_s"]
+    print(
+        f"{level['users']:>5} {level['turns']:>6} {1000 * level['p50_s']:>8.0f} "
+        f"{1000 * level['p95_s']:>8.0f} {1000 * level['p99_s']:>8.0f} "
+        f"{'-' if first is None else f'{1000 * first:.0f}':>10} "
+        f"{level['throughput_rps']:>8.2f} {level['errors']:>6}"
+    )
+
+
+def print_stages(level: dict):
+    print(f"\nPer-stage breakdown at {level['users']} user(s), per turn:")
+    print(f"  {'stage':<34} {'ms':>9} {'calls':>7}")
+    for stage, row in level["stages"].items():
+        print(f"  {stage:<34} {row['ms_per_turn']:>9.1f} {row['calls_per_turn']:>7.2f}")
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Returns the regressions of `results` against `baseline`."""
+    regressions = []
+    for users, level in results["levels"].items():
+        base = baseline.get("levels", {}).get(users)
+        if base is None:
+            continue
+        if level["p95_s"] > base["p95_s"] * (1 + tolerance):
+            regressions.append(
+                f"{users} user(s): p95 {1000 * level['p95_s']:.0f} ms "
+                f"vs. baseline {1000 * base['p95_s']:.0f} ms"
+            )
+        if level["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{users} user(s): {level['throughput_rps']:.2f} req/s "
+                f"vs. baseline {base['throughput_rps']:.2f} req/s"
+            )
+        if level["errors"] > base["errors"]:
+            regressions.append(
+                f"{users} user(s): {level['errors']} errors "
+                f"vs. baseline {base['errors']}"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--users", default="1,8,32")
+    parser.add_argument(
+        "--turns",
+        type=int,
+        default=0,
+        help="Requests per level (default: the corpus, or 4 per user if more).",
+    )
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--token-latency", type=float, default=0.01)
+    parser.add_argument("--pipedrive-latency", type=float, default=0.1)
+    parser.add_argument(
+        "--rate-limits",
+        action="store_true",
+        help="Keep the configured request quotas instead of disabling them.",
+    )
+    parser.add_argument(
+        "--sales-agent-mode",
+        choices=("tool_calling", "react"),
+        default=os.getenv("SALES_AGENT_MODE", "tool_calling"),
+    )
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--baseline", metavar="PATH")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+    user_levels = [int(n) for n in args.users.split(",")]
+
+    corpus = load_corpus(CORPUS_PATH)
+    with open(DEALS_PATH) as f:
+        deals = json.load(f)
+
+    llm, llm_url = start_llm_stub(
+        latency=args.llm_latency,
+        reply="Here is the answer, based on the CRM records and our knowledge base.",
+        tool_arguments=make_router(corpus),
+        token_latency=args.token_latency,
+        react_action=react_action,
+    )
+    pipedrive, pipedrive_url = start_pipedrive_stub(
+        latency=args.pipedrive_latency, deals=deals
+    )
+    env = dict(
+        os.environ,
+        NEBIUS_API_BASE=llm_url,
+        NEBIUS_API_KEY="stub-key",
+        PIPEDRIVE_API_BASE=pipedrive_url,
+        PIPEDRIVE_API_TOKEN="stub-token",
+        VECTOR_STORE_BACKEND="local",
+        LOCAL_DATA_DIR=tempfile.mkdtemp(),
+        TRACE_WATERFALL="false",
+        METRICS_PORT="0",
+        SALES_AGENT_MODE=args.sales_agent_mode,
+    )
+    if not args.rate_limits:
+        for name in (
+            "PIPEDRIVE_RATE_LIMIT",
+            "NEBIUS_LLM_RATE_LIMIT",
+            "NEBIUS_EMBEDDING_RATE_LIMIT",
+        ):
+            env[name] = "0"
+    build_store(env)
+    os.environ.update(env)
+
+    from src import metrics
+    from src.supervisor import astream_reply, warm_up
+
+    warm_up()
+    refs = itertools.count()
+
+    async def run_all():
+        # Warm the clients and caches once; one event loop keeps connections.
+        await run_level(astream_reply, metrics, corpus, 1, 3, refs)
+        levels = {}
+        for users in user_levels:
+            turns = args.turns or max(len(corpus), 4 * users)
+            levels[str(users)] = await run_level(
+                astream_reply, metrics, corpus, users, turns, refs
+            )
+        return levels
+
+    pipedrive_calls = pipedrive.stats["calls"]
+    # The agents print their routing decisions; keep the report readable.
+    with contextlib.redirect_stdout(io.StringIO()):
+        levels = asyncio.run(run_all())
+    llm.shutdown()
+    pipedrive.shutdown()
+
+    results = {
+        "settings": {
+            "corpus": len(corpus),
+            "llm_latency_s": args.llm_latency,
+            "token_latency_s": args.token_latency,
+            "pipedrive_latency_s": args.pipedrive_latency,
+            "rate_limits": args.rate_limits,
+            "sales_agent_mode": args.sales_agent_mode,
+        },
+        "levels": levels,
+    }
+
+    print(
+        f"\n{len(corpus)} requests in the corpus; stub LLM latency "
+        f"{args.llm_latency:.2f}s, Pipedrive {args.pipedrive_latency:.2f}s; "
+        f"{pipedrive.stats['calls'] - pipedrive_calls} Pipedrive calls.\n"
+    )
+    print(
+        f"{'users':>5} {'turns':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+        f"{'first ms':>10} {'req/s':>8} {'errors':>6}"
+    )
+    for level in levels.values():
+        print_level(level)
+    for level in levels.values():
+        if level["first_error"]:
+            print(f"\n⚠️ {level['users']} user(s): {level['first_error']}")
+
+    first = next(iter(levels.values()))
+    print(f"\nMedian latency by category at {first['users']} user(s):")
+    for category, p50 in first["categories_p50_s"].items():
+        print(f"  {category:<16} {1000 * p50:>8.0f} ms")
+    for level in levels.values():
+        print_stages(level)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save_baseline)), exist_ok=True)
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+        print(f"\n✅ Baseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("settings") != results["settings"]:
+            print(f"\n⚠️ {args.baseline} was recorded with different settings.")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ Regressions against {args.baseline}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"\n✅ No regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Measures DirectNebiusEmbeddings throughput (docs/sec) against a local stub
+endpoint for a grid of batch sizes and concurrency levels.
+
+Usage:
+    python benchmarks/embedding_throughput.py [--docs 2000] [--dim 256]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+# The stub has no quota; measure the client, not the client-side rate limit.
+os.environ.setdefault("NEBIUS_EMBEDDING_RATE_LIMIT", "0")
+
+from benchmarks.stubs import fake_embedding, start_embedding_stub
+from src.embedding_client import DirectNebiusEmbeddings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--batch-sizes", default="1,16,64,128")
+    parser.add_argument("--concurrency", default="1,2,4,8")
+    args = parser.parse_args()
+
+    server, base_url = start_embedding_stub(dim=args.dim)
+    texts = [
+        f"Information about the CRM deal titled 'Deal {i}' with Deal ID: {i}."
+        for i in range(args.docs)
+    ]
+
+    print(f"Embedding {args.docs} docs against {base_url}")
+    print(f"{'batch':>6} {'workers':>8} {'seconds':>9} {'docs/sec':>10}")
+    try:
+        for batch_size in [int(x) for x in args.batch_sizes.split(",")]:
+            for workers in [int(x) for x in args.concurrency.split(",")]:
+                client = DirectNebiusEmbeddings(
+                    model_name="stub",
+                    api_key="stub",
+                    api_base=base_url,
+                    batch_size=batch_size,
+                    max_concurrency=workers,
+                )
+                start = time.perf_counter()
+                vectors = client.embed_documents(texts)
+                elapsed = time.perf_counter() - start
+                assert len(vectors) == len(texts)
+                # Results must come back in input order regardless of batching.
+                assert vectors[-1] == fake_embedding(texts[-1], args.dim)
+                print(
+                    f"{batch_size:>6} {workers:>8} {elapsed:>9.2f} "
+                    f"{len(texts) / elapsed:>10.1f}"
+                )
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
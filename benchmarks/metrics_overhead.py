@@ -0,0 +1,92 @@
+"""
+Cost of recording a metric (src/metrics.py) on the hot path: counter
+increments and histogram observations from 1 to N threads at once, with the
+registry's per-thread shards vs. a single dict behind a lock, and the time of
+a full /metrics scrape.
+
+Usage:
+    python benchmarks/metrics_overhead.py [--threads 8] [--ops 100000]
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from src import metrics
+
+
+class LockedCounter:
+    """The straightforward alternative: one dict shared by all threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.values())
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+def run_threads(record, threads: int, ops: int) -> float:
+    """Returns nanoseconds per recorded value, with `threads` recording at once."""
+    barrier = threading.Barrier(threads + 1)
+
+    def work():
+        barrier.wait()
+        for _ in range(ops):
+            record()
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    start = time.perf_counter_ns()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter_ns() - start) / (threads * ops)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=100_000)
+    args = parser.parse_args()
+
+    sharded = metrics.Counter("bench_sharded_total", "Benchmark.", ("endpoint",))
+    histogram = metrics.Histogram("bench_seconds", "Benchmark.", ("stage",))
+    locked = LockedCounter()
+    cases = {
+        "counter, per-thread shards": lambda: sharded.inc(endpoint="pipedrive"),
+        "counter, shared lock": lambda: locked.inc(endpoint="pipedrive"),
+        "histogram, per-thread shards": lambda: histogram.observe(0.2, stage="llm"),
+    }
+
+    thread_counts = sorted({1, args.threads})
+    header = "".join(f"{f'{n} thread(s)':>14}" for n in thread_counts)
+    print(f"ns per recorded value ({args.ops} per thread)\n")
+    print(f"{'':<30}{header}")
+    for name, record in cases.items():
+        row = "".join(
+            f"{run_threads(record, n, args.ops):>14.0f}" for n in thread_counts
+        )
+        print(f"{name:<30}{row}")
+
+    expected = args.ops * sum(thread_counts)
+    total = sum(sharded.collect().values())
+    print(f"\nSharded counter total: {total} (expected {expected})")
+
+    start = time.perf_counter()
+    body = metrics.render()
+    print(
+        f"Scrape of {len(body.splitlines())} lines: "
+        f"{1000 * (time.perf_counter() - start):.2f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Wall-clock time of compound requests ("update deal 10 to won and draft a
+thank-you reply ...") answered in one turn, with the supervisor fanning the
+independent sub-tasks out to their agents in parallel, compared with sending
+the same sub-tasks as separate turns one after another. First checks which
+clauses of a few requests wait for the one before them, and exits with
+status 1 if one is wrong.
+
+The Nebius endpoint is replaced by a local stub with a fixed per-call latency,
+and the local vector store is used, so no API keys are needed.
+
+Usage:
+    python benchmarks/multi_intent.py [--llm-latency 1.0] [--runs 3]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from benchmarks.stubs import start_llm_stub
+
+REQUESTS = [
+    "Update deal 10 to won and draft a thank-you reply to the customer",
+    (
+        "Mark deal 3 as lost and write a blog post outline about churn "
+        "and draft a polite response to a customer asking about an invoice delay"
+    ),
+    # "then" keeps the second step after the first.
+    "Update deal 7 to won, then draft a thank-you reply to the customer about it",
+    # A relative "that" and "this quarter" refer to nothing earlier.
+    (
+        "Find deals that are still open and draft a thank-you reply "
+        "to the owner of this quarter's biggest deal"
+    ),
+]
+
+# Requests and whether each clause waits for the one before it.
+SPLITS = [
+    (
+        "Find deals that are open and draft a reply on this quarter's top deal",
+        [False, False],
+    ),
+    ("Show deal 5 and check that the deal is open", [False, False]),
+    ("Find the biggest open deal and add a note to it", [False, True]),
+    ("List deals in this pipeline and mark that one as won", [False, True]),
+    ("Get deal 4 and summarize this", [False, True]),
+]
+
+
+async def timed(graph, text: str) -> tuple[float, dict]:
+    from langchain_core.messages import HumanMessage
+
+    start = time.perf_counter()
+    state = await graph.ainvoke({"messages": [HumanMessage(content=text)]})
+    return time.perf_counter() - start, state
+
+
+async def measure(graph, request: str, run: int) -> dict:
+    # A unique suffix per run keeps the route and answer caches out of it.
+    suffix = f" (run {run})"
+    compound, state = await timed(graph, request + suffix)
+    steps = state["plan"]
+    depth = {}
+    for step in steps:
+        depth[step["id"]] = 1 + max((depth[a] for a in step["after"]), default=0)
+    separate = [(await timed(graph, step["task"] + suffix))[0] for step in steps]
+    return {
+        "steps": len(steps),
+        "waves": max(depth.values(), default=0),
+        "compound": compound,
+        "separate": sum(separate),
+        "slowest": max(separate),
+    }
+
+
+async def run_all(graph, runs: int) -> list:
+    rows = []
+    for request in REQUESTS:
+        results = [await measure(graph, request, i) for i in range(runs)]
+        rows.append(
+            (
+                request,
+                {key: statistics.median(r[key] for r in results) for key in results[0]},
+            )
+        )
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--llm-latency", type=float, default=1.0)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    server, base_url = start_llm_stub(latency=args.llm_latency)
+    os.environ.update(
+        NEBIUS_API_BASE=base_url,
+        NEBIUS_API_KEY="stub-key",
+        VECTOR_STORE_BACKEND="local",
+        LOCAL_DATA_DIR=tempfile.mkdtemp(),
+    )
+    from src.supervisor import supervisor_graph, warm_up
+    from src.task_planner import split_request
+
+    failed = False
+    for request, expected in SPLITS:
+        flags = [dependent for _, dependent in split_request(request)]
+        if flags != expected:
+            print(f"Clauses waiting {flags}, expected {expected}: {request}")
+            failed = True
+    if failed:
+        server.shutdown()
+        sys.exit(1)
+
+    warm_up()
+    # One event loop for all runs, so the LLM client keeps its connections.
+    rows = asyncio.run(run_all(supervisor_graph, args.runs))
+    server.shutdown()
+
+    print(f"\nStub LLM latency {args.llm_latency:.2f}s per call\n")
+    print(
+        f"{'steps':>5} {'waves':>5} {'separate turns':>15} {'slowest step':>13} "
+        f"{'one turn':>9}  request"
+    )
+    for request, r in rows:
+        print(
+            f"{r['steps']:>5.0f} {r['waves']:>5.0f} {r['separate']:>14.2f}s "
+            f"{r['slowest']:>12.2f}s {r['compound']:>8.2f}s  {request[:60]}"
+        )
+
+
+if __name__ == "__main__":
+    main()
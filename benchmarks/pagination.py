@@ -0,0 +1,146 @@
+"""
+Checks the paginated deal export (crm_connector.iter_all_deals) against a
+local Pipedrive stub that serves start/limit pages with
+more_items_in_collection:
+
+  1. completeness: every deal is yielded exactly once, for collections that
+                   are empty, smaller than a page, an exact multiple of the
+                   page size and one deal past it.
+  2. concurrency:  at most `max_workers` page requests are in flight at once,
+                   and the pages requested past the end stay within that bound.
+  3. early close:  closing the iterator after a few deals returns without
+                   waiting for the pages in flight, and no new pages are
+                   requested after it.
+
+Exits with status 1 if a check fails.
+
+Usage:
+    python benchmarks/pagination.py [--latency 0.05]
+"""
+
+import argparse
+import math
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from benchmarks.stubs import start_pipedrive_stub
+
+# (deals, page size, max workers)
+CASES = [
+    (0, 50, 4),
+    (7, 50, 4),
+    (200, 50, 4),
+    (201, 50, 4),
+    (1000, 100, 1),
+    (1000, 100, 8),
+    (1000, 30, 16),
+]
+
+
+def make_deals(count: int) -> list[dict]:
+    return [
+        {"id": i, "title": f"Deal {i}", "status": "open"} for i in range(1, count + 1)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    deals = []
+    server, base_url = start_pipedrive_stub(latency=args.latency, deals=deals)
+    os.environ.update(
+        PIPEDRIVE_API_BASE=base_url,
+        PIPEDRIVE_API_TOKEN="stub-token",
+        PIPEDRIVE_RATE_LIMIT="0",
+    )
+    from src import crm_connector
+
+    failures = []
+
+    def check(ok: bool, label: str):
+        print(f"  {'ok  ' if ok else 'FAIL'} {label}")
+        if not ok:
+            failures.append(label)
+
+    def reset(count: int):
+        deals[:] = make_deals(count)
+        server.stats.update(calls=0, in_flight=0, max_in_flight=0)
+
+    print(f"\nPipedrive stub latency {args.latency:.2f}s per page\n")
+    print("completeness and concurrency")
+    for count, page_size, max_workers in CASES:
+        reset(count)
+        start = time.perf_counter()
+        # _iter_pages, not iter_all_deals: the latter drops repeated IDs,
+        # which would hide overlapping pages.
+        ids = Counter(
+            deal["id"]
+            for deal in crm_connector._iter_pages("deals", page_size, max_workers, {})
+        )
+        elapsed = time.perf_counter() - start
+        exported = [
+            deal["id"] for deal in crm_connector.iter_all_deals(page_size, max_workers)
+        ]
+        pages = math.ceil(count / page_size)
+        stats = server.stats
+        label = f"{count} deals, pages of {page_size}, {max_workers} workers"
+        check(
+            set(ids) == set(range(1, count + 1)) and max(ids.values(), default=1) == 1,
+            f"{label}: each deal once ({sum(ids.values())} yielded, {elapsed:.2f}s)",
+        )
+        check(
+            sorted(exported) == list(range(1, count + 1)),
+            f"{label}: iter_all_deals yields each deal once",
+        )
+        # The export runs twice; each needs its pages plus at most
+        # max_workers requests past the end.
+        check(
+            stats["max_in_flight"] <= max_workers
+            and stats["calls"] <= 2 * (max(pages, 1) + max_workers),
+            f"{label}: max {stats['max_in_flight']} pages in flight, "
+            f"{stats['calls']} page requests for 2 x {pages} pages",
+        )
+
+    print("\nearly close")
+    reset(5000)
+    # Let the pools of the exports above wind down first.
+    time.sleep(4 * args.latency)
+    threads = threading.active_count()
+    iterator = crm_connector.iter_all_deals(page_size=50, max_workers=4)
+    first = [next(iterator)["id"] for _ in range(10)]
+    start = time.perf_counter()
+    iterator.close()
+    close_seconds = time.perf_counter() - start
+    calls = server.stats["calls"]
+    time.sleep(4 * args.latency)
+    check(len(set(first)) == 10, "the first 10 deals are distinct")
+    check(
+        close_seconds < args.latency,
+        f"close() returns in {1000 * close_seconds:.1f} ms",
+    )
+    check(
+        server.stats["calls"] == calls and calls <= 2 * 4,
+        f"no pages requested after close ({calls} in total)",
+    )
+    check(
+        threading.active_count() <= threads,
+        f"worker threads stopped ({threading.active_count()} threads, "
+        f"{threads} before)",
+    )
+    server.shutdown()
+
+    if failures:
+        print(f"\n{len(failures)} check(s) failed")
+        sys.exit(1)
+    print("\nAll checks passed")
+
+
+if __name__ == "__main__":
+    main()
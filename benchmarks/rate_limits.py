@@ -0,0 +1,180 @@
+"""
+Checks the rate scheduler (src/scheduler.py) against a local Pipedrive stub
+that enforces a quota of `--quota` calls per 2 seconds and answers 429 +
+Retry-After above it.
+
+  1. burst:      60 concurrent note writes, without and with the scheduler.
+  2. priority:   a background flood (like ingestion) plus interactive writes
+                 arriving every 0.2s, with and without priorities.
+  3. processes:  two processes writing at once, each with its own bucket, and
+                 sharing one bucket through RATE_LIMIT_SHARED_PATH.
+
+Every scenario runs in fresh child processes, configured through the
+environment like the app.
+
+Usage:
+    python benchmarks/rate_limits.py [--quota 40] [--api-latency 0.02]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(ROOT)
+
+
+def child(workload: str):
+    """Runs one workload and prints one JSON line of results."""
+    from src import crm_connector, scheduler
+
+    start = time.perf_counter()
+
+    def write(i):
+        sent = time.perf_counter()
+        ok = crm_connector.create_note_on_deal(i, f"note {i}") is not None
+        return ok, time.perf_counter() - sent
+
+    if workload == "burst":
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            results = list(pool.map(write, range(1, 61)))
+        latencies = {"all": [latency for _, latency in results]}
+    else:
+        flood_priority = (
+            scheduler.BACKGROUND if workload == "priority" else scheduler.INTERACTIVE
+        )
+
+        def flood(i):
+            with scheduler.request_priority(flood_priority):
+                return write(i)
+
+        with ThreadPoolExecutor(max_workers=24) as pool:
+            background = [pool.submit(flood, i) for i in range(1, 81)]
+            time.sleep(0.5)
+            interactive = []
+            for i in range(10):
+                interactive.append(pool.submit(write, 1000 + i))
+                time.sleep(0.2)
+            results = [f.result() for f in background + interactive]
+        latencies = {
+            "background": [f.result()[1] for f in background],
+            "interactive": [f.result()[1] for f in interactive],
+        }
+
+    print(
+        "RATE_LIMITS "
+        + json.dumps(
+            {
+                "wall_s": time.perf_counter() - start,
+                "ok": sum(ok for ok, _ in results),
+                "total": len(results),
+                "latencies": latencies,
+            }
+        )
+    )
+
+
+def spawn(workload: str, env: dict) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--child", workload],
+        env=env,
+        cwd=ROOT,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    )
+
+
+def collect(process: subprocess.Popen) -> dict:
+    stdout, _ = process.communicate()
+    for line in stdout.splitlines():
+        if line.startswith("RATE_LIMITS "):
+            return json.loads(line[len("RATE_LIMITS ") :])
+    raise RuntimeError(f"No results in child output:\n{stdout}")
+
+
+def mean(values) -> float:
+    return sum(values) / len(values) if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--quota", type=int, default=40, help="Calls per 2 seconds.")
+    parser.add_argument("--api-latency", type=float, default=0.02)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child)
+        return
+
+    from benchmarks.stubs import start_pipedrive_stub
+
+    server, base_url = start_pipedrive_stub(
+        latency=args.api_latency, rate_limit=args.quota
+    )
+    # A bucket admits at most burst + 2 * rate calls per 2-second window.
+    rate, burst = args.quota * 0.35, args.quota * 0.3
+    base_env = dict(
+        os.environ,
+        PIPEDRIVE_API_BASE=base_url,
+        PIPEDRIVE_API_TOKEN="stub-token",
+        PIPEDRIVE_RATE_BURST=str(int(burst)),
+        HTTP_RETRY_AFTER_MAX="5",
+    )
+    limited = dict(base_env, PIPEDRIVE_RATE_LIMIT=str(rate))
+    unlimited = dict(base_env, PIPEDRIVE_RATE_LIMIT="0")
+
+    def run(label, workload, envs):
+        # Let the stub's quota window reset between scenarios.
+        time.sleep(2.1)
+        server.stats.update(calls=0, rate_limited=0)
+        results = [collect(p) for p in [spawn(workload, env) for env in envs]]
+        rows.append((label, results, dict(server.stats)))
+
+    rows = []
+    run("burst, no scheduler", "burst", [unlimited])
+    run("burst, scheduler", "burst", [limited])
+    run("flood, no priorities", "flood", [limited])
+    run("flood, priorities", "priority", [limited])
+    shared = os.path.join(tempfile.mkdtemp(), "rate_limits.sqlite")
+    run("2 processes, own buckets", "burst", [limited, limited])
+    run(
+        "2 processes, shared bucket",
+        "burst",
+        [dict(limited, RATE_LIMIT_SHARED_PATH=shared)] * 2,
+    )
+    server.shutdown()
+
+    print(
+        f"\nStub quota: {args.quota} calls / 2 s. Scheduler: {rate:g}/s, "
+        f"burst {int(burst)}\n"
+    )
+    print(
+        f"{'scenario':<28} {'ok':>8} {'calls':>6} {'429s':>5} {'wall s':>7} "
+        f"{'interactive s':>14} {'background s':>13}"
+    )
+    for label, results, stats in rows:
+        ok = sum(r["ok"] for r in results)
+        total = sum(r["total"] for r in results)
+        wall = max(r["wall_s"] for r in results)
+        latencies = {}
+        for r in results:
+            for kind, values in r["latencies"].items():
+                latencies.setdefault(kind, []).extend(values)
+        interactive = latencies.get("interactive")
+        background = latencies.get("background")
+        print(
+            f"{label:<28} {f'{ok}/{total}':>8} {stats['calls']:>6} "
+            f"{stats['rate_limited']:>5} {wall:>7.2f} "
+            f"{mean(interactive) if interactive else float('nan'):>14.2f} "
+            f"{mean(background) if background else float('nan'):>13.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
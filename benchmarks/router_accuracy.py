@@ -0,0 +1,140 @@
+"""
+Accuracy and latency of the tiered fast router (src/fast_router.py) on a
+labeled routing dataset, and how many supervisor LLM calls it avoids.
+
+Offline (the default), utterances are embedded with a local hashed
+bag-of-words model and escalated decisions are counted but answered with the
+true label, so the numbers isolate the local tiers. With --live, the
+configured embedding model and the real supervisor LLM are used.
+
+Usage:
+    python benchmarks/router_accuracy.py [--dataset benchmarks/data/routing_dataset.jsonl]
+                                         [--min-margin 0.03] [--live]
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import re
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from src.fast_router import FastRouter
+
+DEFAULT_DATASET = os.path.join(
+    os.path.dirname(__file__), "data", "routing_dataset.jsonl"
+)
+
+
+class HashedBagOfWords:
+    """Offline stand-in for the embedding model: hashed unigrams and bigrams."""
+
+    def __init__(self, dim: int = 1024):
+        self.dim = dim
+
+    def embed_query(self, text: str) -> list[float]:
+        tokens = re.findall(r"[a-z]+", text.lower())
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in tokens + [f"{a} {b}" for a, b in itertools.pairwise(tokens)]:
+            digest = hashlib.md5(feature.encode("utf-8")).digest()
+            sign = 1.0 if digest[4] & 1 else -1.0
+            vector[int.from_bytes(digest[:4], "big") % self.dim] += sign
+        return vector.tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self.embed_query(text) for text in texts]
+
+
+def load_dataset(path: str) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dataset", default=DEFAULT_DATASET)
+    parser.add_argument("--min-score", type=float, default=None)
+    parser.add_argument("--min-margin", type=float, default=None)
+    parser.add_argument(
+        "--llm-latency",
+        type=float,
+        default=1.0,
+        help="Assumed seconds per supervisor LLM call (offline mode).",
+    )
+    parser.add_argument("--live", action="store_true")
+    args = parser.parse_args()
+
+    dataset = load_dataset(args.dataset)
+    if args.live:
+        from src.embedding_client import get_embedding_model
+        from src.supervisor import ask_supervisor_llm
+
+        embedder, escalate = get_embedding_model(), ask_supervisor_llm
+        min_score = args.min_score
+    else:
+        labels = {row["text"]: row["label"] for row in dataset}
+        embedder, escalate = HashedBagOfWords(), labels.get
+        # Bag-of-words cosines are much lower than those of a real model.
+        min_score = 0.1 if args.min_score is None else args.min_score
+
+    options = {}
+    if min_score is not None:
+        options["min_score"] = min_score
+    if args.min_margin is not None:
+        options["min_margin"] = args.min_margin
+    router = FastRouter(embedder, escalate, **options)
+    router.prepare()
+
+    per_tier = {}
+    latencies = []
+    for row in dataset:
+        start = time.perf_counter()
+        agent, tier = router.route(row["text"])
+        elapsed = time.perf_counter() - start
+        if tier != "llm":
+            latencies.append(elapsed)
+        correct, total = per_tier.get(tier, (0, 0))
+        per_tier[tier] = (correct + (agent == row["label"]), total + 1)
+
+    print(f"{len(dataset)} utterances from {args.dataset}\n")
+    print(f"{'tier':<10} {'decided':>8} {'accuracy':>9}")
+    for tier in ("rules", "embedding", "llm"):
+        correct, total = per_tier.get(tier, (0, 0))
+        accuracy = f"{correct / total:.1%}" if total else "-"
+        print(f"{tier:<10} {total:>8} {accuracy:>9}")
+
+    local_correct = sum(c for t, (c, _) in per_tier.items() if t != "llm")
+    local_total = sum(n for t, (_, n) in per_tier.items() if t != "llm")
+    overall = sum(c for c, _ in per_tier.values()) / len(dataset)
+    print(
+        f"\nLocal decisions: {local_total}/{len(dataset)} "
+        f"({local_total / len(dataset):.1%} of LLM calls avoided), "
+        f"accuracy {local_correct / max(local_total, 1):.1%}"
+    )
+    print(f"Overall accuracy: {overall:.1%}")
+    if latencies:
+        print(
+            f"Local routing latency: p50 {1000 * statistics.median(latencies):.2f} ms, "
+            f"max {1000 * max(latencies):.2f} ms"
+        )
+    if not args.live:
+        print(
+            f"Estimated time saved at {args.llm_latency:.1f}s per LLM call: "
+            f"{local_total * args.llm_latency:.1f}s"
+        )
+
+    # A second pass is served entirely from the route cache.
+    for row in dataset:
+        router.route(row["text"])
+    print(f"\nRouter stats after a repeated pass: {router.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,429 @@
+"""
+Local stand-ins for the external services the copilot talks to, used by the
+benchmark scripts in this directory. Every stub runs on 127.0.0.1 on a random
+free port in a daemon thread.
+"""
+
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+def fake_embedding(text: str, dim: int) -> list[float]:
+    """Deterministic pseudo-embedding derived from a hash of the text."""
+    seed = int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:8], "big")
+    rng = random.Random(seed)
+    return [rng.uniform(-1.0, 1.0) for _ in range(dim)]
+
+
+class _JSONHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Send headers and body in one segment so keep-alive clients are not held
+    # up by Nagle's algorithm / delayed ACKs.
+    disable_nagle_algorithm = True
+    wbufsize = 1 << 16
+
+    def log_message(self, *args):
+        pass
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def send_json(self, body, status=200, headers=None):
+        raw = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(raw)
+
+
+class _StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default listen backlog of 5 makes bursts of concurrent clients wait
+    # for SYN retransmits (or get reset), which would distort load tests.
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        # Clients closing idle keep-alive connections is expected under load.
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def _serve(handler_cls):
+    server = _StubServer(("127.0.0.1", 0), handler_cls)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def start_embedding_stub(
+    dim: int = 256,
+    base_latency: float = 0.02,
+    per_item_latency: float = 0.001,
+    max_concurrency: int = 8,
+):
+    """
+    Starts an OpenAI-compatible /embeddings stub.
+
+    Each request costs `base_latency + per_item_latency * len(input)` seconds, and
+    at most `max_concurrency` requests are processed at once, roughly like a
+    GPU-backed inference server.
+
+    Returns:
+        tuple: The server (call `.shutdown()` when done) and its base URL.
+    """
+    slots = threading.BoundedSemaphore(max_concurrency)
+
+    class Handler(_JSONHandler):
+        def do_POST(self):
+            body = self.read_json()
+            texts = body.get("input") or []
+            if isinstance(texts, str):
+                texts = [texts]
+            with slots:
+                time.sleep(base_latency + per_item_latency * len(texts))
+            data = [
+                {"object": "embedding", "index": i, "embedding": fake_embedding(t, dim)}
+                for i, t in enumerate(texts)
+            ]
+            self.send_json({"object": "list", "data": data, "model": body.get("model")})
+
+    return _serve(Handler)
+
+
+def start_llm_stub(
+    dim: int = 256,
+    latency: float = 0.05,
+    reply: str = "This is a stub answer.",
+    tool_arguments=None,
+    token_latency: float = 0.0,
+    react_action=None,
+):
+    """
+    Starts an OpenAI-compatible stub serving both /embeddings and
+    /chat/completions, standing in for the Nebius endpoint (NEBIUS_API_BASE).
+
+    Structured-output requests (a JSON-schema `response_format` or tools) are
+    answered with `tool_arguments(request_body)`, by default a route to the
+    Service Agent: as JSON content, or as a call to the first tool. All other
+    chat requests get `reply` (in the "Final Answer:" format for ReAct prompts).
+    With `react_action`, a ReAct prompt that has no observation yet is first
+    answered with the action `react_action(question)` returns, as a
+    (tool name, tool input) tuple, or None to answer right away. Tool-calling
+    agent requests (tools without a forced `tool_choice`) get `reply`, or with
+    `react_action` first the same action as a native tool call, with a JSON tool input as the arguments and any
+    other input as {"question": input}; `react_action` may also return a list
+    of actions, sent as parallel tool calls. Once the request holds tool
+    results, it gets `reply`.
+    Each chat request takes `latency` seconds; streamed replies are sent word
+    by word, `token_latency` seconds apart.
+
+    Returns:
+        tuple: The server (call `.shutdown()` when done) and its base URL.
+    """
+    if tool_arguments is None:
+
+        def tool_arguments(body):
+            return {"next": "Service Agent"}
+
+    class Handler(_JSONHandler):
+        def do_POST(self):
+            body = self.read_json()
+            if self.path.endswith("/embeddings"):
+                texts = body.get("input") or []
+                if isinstance(texts, str):
+                    texts = [texts]
+                data = [
+                    {
+                        "object": "embedding",
+                        "index": i,
+                        "embedding": fake_embedding(t, dim),
+                    }
+                    for i, t in enumerate(texts)
+                ]
+                self.send_json(
+                    {"object": "list", "data": data, "model": body.get("model")}
+                )
+                return
+
+            time.sleep(latency)
+            if body.get("tools") and not body.get("tool_choice"):
+                calls = self.agent_tool_calls(body)
+                if calls:
+                    self.send_tool_calls(body, calls)
+                    return
+                content = reply
+            elif body.get("tools"):
+                name = body["tools"][0]["function"]["name"]
+                self.send_tool_calls(body, [(name, tool_arguments(body))])
+                return
+            elif (body.get("response_format") or {}).get("type") == "json_schema":
+                content = json.dumps(tool_arguments(body))
+            elif "Final Answer:" in json.dumps(body.get("messages")):
+                # ReAct prompts (the Sales Agent) expect this exact format.
+                content = self.react_reply(body)
+            else:
+                content = reply
+            if body.get("stream"):
+                self.send_stream(body, content)
+            else:
+                self.send_completion(body, {"role": "assistant", "content": content})
+
+        @staticmethod
+        def agent_tool_calls(body) -> list:
+            """The (tool name, arguments) calls answering a tool-calling agent."""
+            if not react_action or any(
+                m.get("role") == "tool" for m in body["messages"]
+            ):
+                return []
+            question = body["messages"][-1]["content"]
+            actions = react_action(question) or []
+            if isinstance(actions, tuple):
+                actions = [actions]
+            calls = []
+            for tool, tool_input in actions:
+                try:
+                    arguments = json.loads(tool_input)
+                except ValueError:
+                    arguments = None
+                if not isinstance(arguments, dict):
+                    arguments = {"question": tool_input}
+                calls.append((tool, arguments))
+            return calls
+
+        def send_tool_calls(self, body, calls):
+            tool_calls = [
+                {
+                    "id": f"call_stub_{i}",
+                    "type": "function",
+                    "function": {"name": name, "arguments": json.dumps(arguments)},
+                }
+                for i, (name, arguments) in enumerate(calls)
+            ]
+            if not body.get("stream"):
+                message = {
+                    "role": "assistant",
+                    "content": None,
+                    "tool_calls": tool_calls,
+                }
+                self.send_completion(body, message, "tool_calls")
+                return
+            self.start_stream()
+            delta = {
+                "role": "assistant",
+                "tool_calls": [
+                    dict(call, index=i) for i, call in enumerate(tool_calls)
+                ],
+            }
+            self.send_event(body, delta, None)
+            self.end_stream(body, "tool_calls", "")
+
+        @staticmethod
+        def react_reply(body):
+            prompt = body["messages"][-1]["content"]
+            # The scratchpad follows the last "Question:" of the prompt.
+            question, _, scratchpad = prompt.rsplit("Question:", 1)[-1].partition(
+                "\nThought:"
+            )
+            if react_action and "Observation:" not in scratchpad:
+                action = react_action(question.strip())
+                if action:
+                    tool, tool_input = action
+                    return (
+                        f"Thought: I should use {tool}.\nAction: {tool}\n"
+                        f"Action Input: {tool_input}"
+                    )
+            return f"Thought: I now know the final answer\nFinal Answer: {reply}"
+
+        def send_completion(self, body, message, finish_reason="stop"):
+            self.send_json(
+                {
+                    "id": "chatcmpl-stub",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model"),
+                    "choices": [
+                        {"index": 0, "message": message, "finish_reason": finish_reason}
+                    ],
+                    "usage": self.usage(body, message.get("content") or ""),
+                }
+            )
+
+        @staticmethod
+        def usage(body, content):
+            # Rough counts: a token per 4 characters of prompt, one per word.
+            prompt_tokens = len(json.dumps(body.get("messages"))) // 4
+            completion_tokens = len(content.split())
+            return {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            }
+
+        def send_stream(self, body, content):
+            """Sends `content` word by word as server-sent events (chunked)."""
+            self.start_stream()
+            words = content.split(" ")
+            for i, word in enumerate(words):
+                delta = {"content": word if i == 0 else " " + word}
+                if i == 0:
+                    delta["role"] = "assistant"
+                self.send_event(body, delta, None)
+                if token_latency:
+                    time.sleep(token_latency)
+            self.end_stream(body, "stop", content)
+
+        def start_stream(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+        def end_stream(self, body, finish_reason, content):
+            self.send_event(body, {}, finish_reason)
+            if (body.get("stream_options") or {}).get("include_usage"):
+                self.send_event(body, None, None, usage=self.usage(body, content))
+            self.send_chunk(b"data: [DONE]\n\n")
+            self.send_chunk(b"")
+
+        def send_event(self, body, delta, finish_reason, usage=None):
+            event = {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model"),
+                # The usage chunk has no choices, as with OpenAI.
+                "choices": [
+                    {"index": 0, "delta": delta, "finish_reason": finish_reason}
+                ]
+                if usage is None
+                else [],
+            }
+            if usage is not None:
+                event["usage"] = usage
+            self.send_chunk(f"data: {json.dumps(event)}\n\n".encode())
+
+        def send_chunk(self, data: bytes):
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+    return _serve(Handler)
+
+
+def start_pipedrive_stub(
+    latency: float = 0.1,
+    rate_limit: int = 0,
+    window: float = 2.0,
+    deals: list | None = None,
+):
+    """
+    Starts a stub of the Pipedrive v1 endpoints used by the copilot:
+    POST /api/v1/notes and PUT /api/v1/deals/<id>, plus GET /api/v1/deals
+    (paginated with start/limit) and GET /api/v1/deals/<id> serving `deals`.
+    Deals with an ID above 100000 do not exist (404).
+
+    Each call takes `latency` seconds. With `rate_limit`, at most that many
+    calls are accepted per `window` seconds; the rest get a 429 with a
+    Retry-After header, like Pipedrive's burst limit.
+
+    Returns:
+        tuple: The server (call `.shutdown()` when done, `.stats` holds call
+        counts) and its API base URL.
+    """
+    lock = threading.Lock()
+    stats = {"calls": 0, "rate_limited": 0, "in_flight": 0, "max_in_flight": 0}
+    deals_by_id = {deal["id"]: deal for deal in deals or []}
+    window_state = {"start": time.monotonic(), "count": 0}
+
+    class Handler(_JSONHandler):
+        def admit(self) -> bool:
+            with lock:
+                stats["calls"] += 1
+                if rate_limit:
+                    now = time.monotonic()
+                    if now - window_state["start"] >= window:
+                        window_state["start"], window_state["count"] = now, 0
+                    if window_state["count"] >= rate_limit:
+                        stats["rate_limited"] += 1
+                        retry_after = window - (now - window_state["start"])
+                        self.send_json(
+                            {"success": False, "error": "Rate limit exceeded"},
+                            status=429,
+                            headers={"Retry-After": f"{max(retry_after, 0.01):.2f}"},
+                        )
+                        return False
+                    window_state["count"] += 1
+                stats["in_flight"] += 1
+                stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+            return True
+
+        def respond(self, deal_id: int, data: dict):
+            time.sleep(latency)
+            with lock:
+                stats["in_flight"] -= 1
+            if deal_id > 100000:
+                self.send_json({"success": False, "error": "Deal not found"}, 404)
+            else:
+                self.send_json({"success": True, "data": data})
+
+        def do_POST(self):
+            body = self.read_json()
+            if not self.admit():
+                return
+            deal_id = int(body.get("deal_id") or 0)
+            self.respond(deal_id, {"id": stats["calls"], **body})
+
+        def do_PUT(self):
+            body = self.read_json()
+            if not self.admit():
+                return
+            deal_id = int(self.path.split("?")[0].rstrip("/").rsplit("/", 1)[-1])
+            deal = deals_by_id.get(deal_id, {"id": deal_id})
+            with lock:
+                deal.update(body)
+            self.respond(deal_id, deal)
+
+        def do_GET(self):
+            if not self.admit():
+                return
+            parts = urlsplit(self.path)
+            tail = parts.path.rstrip("/").rsplit("/", 1)[-1]
+            if tail.isdigit():
+                deal_id = int(tail)
+                if deal_id not in deals_by_id:
+                    deal_id = 100001
+                self.respond(deal_id, deals_by_id.get(deal_id))
+                return
+            query = parse_qs(parts.query)
+            start = int(query.get("start", ["0"])[0])
+            limit = int(query.get("limit", ["100"])[0])
+            page = (deals or [])[start : start + limit]
+            more = start + limit < len(deals or [])
+            time.sleep(latency)
+            with lock:
+                stats["in_flight"] -= 1
+            self.send_json(
+                {
+                    "success": True,
+                    "data": page,
+                    "additional_data": {
+                        "pagination": {
+                            "start": start,
+                            "limit": limit,
+                            "more_items_in_collection": more,
+                        }
+                    },
+                }
+            )
+
+    server, base_url = _serve(Handler)
+    server.stats = stats
+    return server, base_url + "/api/v1"
@@ -0,0 +1,114 @@
+"""
+Overhead of request tracing (src/tracing.py): the cost of an instrumentation
+point outside a trace (what every span costs when TRACING_ENABLED is off),
+and the time of a chat turn through the graph with tracing off and on,
+against a local stub of the Nebius endpoint with no latency, so the
+copilot's own overhead is all that is measured.
+
+Usage:
+    python benchmarks/tracing_overhead.py [--turns 200]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+QUESTIONS = [
+    "Write a marketing email about our spring webinar",
+    "Draft a polite response to a customer asking about an invoice delay",
+    "What did the customer complain about regarding the invoice?",
+]
+
+
+def span_cost_ns(tracing, calls: int) -> float:
+    start = time.perf_counter_ns()
+    for _ in range(calls):
+        with tracing.span("noop", tracing.HTTP) as span:
+            span.set(status_code=200)
+    return (time.perf_counter_ns() - start) / calls
+
+
+async def run_turns(astream_reply, turns: int) -> list[float]:
+    latencies = []
+    for i in range(turns):
+        start = time.perf_counter()
+        async for _ in astream_reply(QUESTIONS[i % len(QUESTIONS)]):
+            pass
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--span-calls", type=int, default=200_000)
+    args = parser.parse_args()
+
+    from benchmarks.stubs import start_llm_stub
+
+    server, base_url = start_llm_stub(latency=0.0)
+    data_dir = tempfile.mkdtemp()
+    os.environ.update(
+        NEBIUS_API_BASE=base_url,
+        NEBIUS_API_KEY="stub-key",
+        VECTOR_STORE_BACKEND="local",
+        LOCAL_DATA_DIR=data_dir,
+        NEBIUS_LLM_RATE_LIMIT="0",
+        NEBIUS_EMBEDDING_RATE_LIMIT="0",
+        TRACE_WATERFALL="false",
+    )
+    from src import tracing
+    from src.supervisor import astream_reply, warm_up
+
+    warm_up()
+    trace_file = os.path.join(data_dir, "traces.jsonl")
+
+    async def measure():
+        # Warm the clients and caches, then alternate so drift affects both.
+        await run_turns(astream_reply, len(QUESTIONS))
+        results = {"off": [], "on": []}
+        for _ in range(4):
+            for mode in ("off", "on"):
+                if mode == "on":
+                    tracing.enable(trace_file)
+                else:
+                    tracing.disable()
+                results[mode] += await run_turns(astream_reply, args.turns // 4)
+        tracing.disable()
+        return results
+
+    # The agents print their routing decisions; keep the report readable.
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = asyncio.run(measure())
+    server.shutdown()
+
+    print(
+        f"Instrumentation point outside a trace: "
+        f"{span_cost_ns(tracing, args.span_calls):.0f} ns per span"
+    )
+    print(f"\n{'tracing':<8} {'turns':>6} {'p50 ms':>8} {'mean ms':>8}")
+    for mode, latencies in results.items():
+        print(
+            f"{mode:<8} {len(latencies):>6} "
+            f"{1000 * statistics.median(latencies):>8.2f} "
+            f"{1000 * statistics.mean(latencies):>8.2f}"
+        )
+    traces = tracing.load_traces(trace_file)
+    spans = sum(len(trace) for trace in traces)
+    extra = statistics.mean(results["on"]) - statistics.mean(results["off"])
+    print(
+        f"\n{len(traces)} traces, {spans / max(len(traces), 1):.1f} spans per turn; "
+        f"tracing adds {1000 * extra:.2f} ms per turn when enabled."
+    )
+
+
+if __name__ == "__main__":
+    main()
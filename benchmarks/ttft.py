@@ -0,0 +1,109 @@
+"""
+Time-to-first-token (TTFT) and total reply time of the chat UI path, comparing
+the old display, which waited for the finished reply and replayed it one
+character every 5 ms, with token streaming through `astream_reply`.
+
+The Nebius endpoint is replaced by a local stub that waits `--llm-latency`
+seconds before the first token and then sends one word every
+`--token-latency` seconds, so no API keys are needed. The replay numbers are
+derived from the same runs: time until the agent finished, plus 5 ms for the
+first character (TTFT) or for every character (total).
+
+Usage:
+    python benchmarks/ttft.py [--runs 3] [--llm-latency 0.4]
+                              [--token-latency 0.01] [--reply-words 300]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from benchmarks.stubs import start_llm_stub
+
+REPLAY_DELAY = 0.005
+
+PROMPTS = {
+    "marketing email": "Write a marketing email about our AI-powered analytics",
+    "blog outline": "Draft a blog post outline about AI in sales",
+    "service reply": "Draft a polite response to a customer asking about an invoice delay",
+    "RAG answer": "What did the customer complain about regarding the late invoice?",
+}
+
+
+async def measure(question: str) -> dict:
+    from src.supervisor import astream_reply
+
+    start = time.perf_counter()
+    first_token = None
+    reply = ""
+    async for _, text, done in astream_reply(question):
+        if first_token is None:
+            first_token = time.perf_counter() - start
+        if done:
+            reply = text
+    finished = time.perf_counter() - start
+    return {
+        "stream_ttft": first_token,
+        "stream_total": finished,
+        "replay_ttft": finished + REPLAY_DELAY,
+        "replay_total": finished + REPLAY_DELAY * len(reply),
+        "chars": len(reply),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--llm-latency", type=float, default=0.4)
+    parser.add_argument("--token-latency", type=float, default=0.01)
+    parser.add_argument("--reply-words", type=int, default=300)
+    args = parser.parse_args()
+
+    reply = " ".join(f"word{i % 100:02d}" for i in range(args.reply_words))
+    server, base_url = start_llm_stub(
+        latency=args.llm_latency, token_latency=args.token_latency, reply=reply
+    )
+    data_dir = tempfile.mkdtemp()
+    os.environ.update(
+        NEBIUS_API_BASE=base_url,
+        NEBIUS_API_KEY="stub-key",
+        VECTOR_STORE_BACKEND="local",
+        LOCAL_DATA_DIR=data_dir,
+    )
+    from src.supervisor import warm_up
+
+    warm_up()
+
+    results = {}
+    for name, question in PROMPTS.items():
+        # A unique suffix per run keeps the answer cache out of the measurement.
+        runs = [asyncio.run(measure(f"{question} (run {i})")) for i in range(args.runs)]
+        results[name] = {
+            key: statistics.median(run[key] for run in runs) for key in runs[0]
+        }
+    server.shutdown()
+
+    print(
+        f"\nStub: {args.llm_latency:.2f}s to first token, "
+        f"{args.reply_words} words at {args.token_latency * 1000:.0f} ms each\n"
+    )
+    print(
+        f"{'path':<16} {'chars':>6} {'replay TTFT':>12} {'stream TTFT':>12} "
+        f"{'replay total':>13} {'stream total':>13}"
+    )
+    for name, r in results.items():
+        print(
+            f"{name:<16} {r['chars']:>6.0f} {r['replay_ttft']:>11.2f}s "
+            f"{r['stream_ttft']:>11.2f}s {r['replay_total']:>12.2f}s "
+            f"{r['stream_total']:>12.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,81 +1,293 @@
+import argparse
+import hashlib
+import json
 import sys
+import time
+from contextlib import nullcontext
 
 sys.path.append("src")
 
 from langchain.docstore.document import Document
-
-# LOOK HERE: This line is different from the old version
-from langchain_pinecone import PineconeVectorStore
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
-from src.crm_connector import get_recent_deals
-from src.vector_store_connector import get_pinecone_client, get_pinecone_index
+from src.crm_connector import iter_all_deals, iter_deal_changes
+from src.deal_documents import format_deal_to_document
+from src.vector_store_connector import (
+    get_pinecone_client,
+    get_pinecone_index,
+    get_vector_store,
+)
 from src.embedding_client import get_embedding_model
-from src.config import PINECONE_INDEX_NAME
-
-
-# The function below is unchanged
-def format_deal_to_document(deal: dict) -> Document:
-    content = (
-        f"Information about the CRM deal titled '{deal.get('title', 'N/A')}' "
-        f"with Deal ID: {deal.get('id', 0)}. "  # <-- ADD THIS LINE
-        f"The current status of this deal is '{deal.get('status', 'N/A')}'. "
-        f"It has a value of {deal.get('value', 0)} {deal.get('currency', '')}. "
-        f"The deal is owned by {deal.get('owner_name', 'N/A')}. "
-        f"The main contact person is {deal.get('person_name', 'N/A')} "
-        f"at the organization {deal.get('org_name', 'N/A')}."
+from src.config import DEAL_STORE_ENABLED, PINECONE_INDEX_NAME, VECTOR_STORE_BACKEND
+from src.sync_state import SyncState
+from src.deal_index import DealIndex
+from src.deal_store import get_deal_store
+from src.scheduler import BACKGROUND, set_default_priority
+
+# Number of deals formatted and upserted together while deals stream in.
+INGEST_BATCH_SIZE = 500
+
+
+def deal_content_hash(document: Document) -> str:
+    """Hash of everything that ends up in the index for a deal."""
+    payload = json.dumps(
+        {"content": document.page_content, "metadata": document.metadata},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def deal_vector_ids(deal_id, chunk_count: int, start: int = 0) -> list[str]:
+    """Stable vector IDs for a deal's chunks, so re-ingesting a deal overwrites it."""
+    return [f"deal-{deal_id}-{i}" for i in range(start, chunk_count)]
+
+
+def sync_deal_batch(deals, text_splitter, vectorstore, state) -> tuple[int, int]:
+    """
+    Upserts the deals of a batch whose content changed since the last sync.
+
+    Returns:
+        tuple: The number of deals that were (re-)embedded and the number of
+        chunks written.
+    """
+    documents = [format_deal_to_document(deal) for deal in deals]
+    known = state.get_deals(doc.metadata["deal_id"] for doc in documents)
+    update_times = {deal.get("id", 0): deal.get("update_time") for deal in deals}
+
+    chunks_to_write = []
+    ids_to_write = []
+    stale_ids = []
+    state_rows = []
+    for document in documents:
+        deal_id = document.metadata["deal_id"]
+        content_hash = deal_content_hash(document)
+        previous_hash, previous_count = known.get(deal_id, (None, 0))
+        if content_hash == previous_hash:
+            continue
+
+        chunks = text_splitter.split_documents([document])
+        chunks_to_write.extend(chunks)
+        ids_to_write.extend(deal_vector_ids(deal_id, len(chunks)))
+        # Drop chunks left over from a longer previous version of the deal.
+        stale_ids.extend(deal_vector_ids(deal_id, previous_count, len(chunks)))
+        state_rows.append(
+            (deal_id, content_hash, len(chunks), update_times.get(deal_id))
+        )
+
+    if chunks_to_write:
+        vectorstore.add_documents(chunks_to_write, ids=ids_to_write)
+    if stale_ids:
+        vectorstore.delete(ids=stale_ids)
+    # Only record the new hashes once the vectors are safely written.
+    state.upsert_deals(state_rows)
+    return len(state_rows), len(chunks_to_write)
+
+
+def delete_deals(deal_ids, vectorstore, state) -> int:
+    """Removes the vectors of deleted or merged deals. Returns how many were known."""
+    known = state.get_deals(deal_ids)
+    ids = []
+    for deal_id, (_, chunk_count) in known.items():
+        ids.extend(deal_vector_ids(deal_id, chunk_count))
+    if ids:
+        vectorstore.delete(ids=ids)
+    state.delete_deals(known)
+    return len(known)
+
+
+def sync_deal_stream(
+    deals, text_splitter, vectorstore, state, deal_index, deal_store=None
+) -> dict:
+    """
+    Runs sync_deal_batch over a stream of deals in INGEST_BATCH_SIZE batches and
+    keeps the deal lookup index (and the deal snapshot, if given) up to date
+    with every deal seen.
+    """
+    stats = {"seen": 0, "changed": 0, "chunks": 0, "watermark": None}
+    seen_ids = set()
+    batch = []
+
+    def flush():
+        deal_index.upsert(batch)
+        if deal_store is not None:
+            deal_store.upsert(batch)
+        changed, chunks = sync_deal_batch(batch, text_splitter, vectorstore, state)
+        stats["changed"] += changed
+        stats["chunks"] += chunks
+        print(f"   Processed {stats['seen']} deals ({stats['changed']} changed)...")
+
+    for deal in deals:
+        stats["seen"] += 1
+        seen_ids.add(deal.get("id", 0))
+        update_time = deal.get("update_time")
+        if update_time and (stats["watermark"] or "") < update_time:
+            stats["watermark"] = update_time
+        batch.append(deal)
+        if len(batch) >= INGEST_BATCH_SIZE:
+            flush()
+            batch = []
+    if batch:
+        flush()
+
+    stats["seen_ids"] = seen_ids
+    return stats
+
+
+def run_full_sync(
+    text_splitter, vectorstore, state, deal_index, deal_store=None
+) -> dict:
+    """
+    Streams every deal from Pipedrive, re-embeds the ones whose content changed
+    and deletes vectors of deals that no longer exist.
+    """
+    # Deals are streamed page by page, so embedding starts while the rest of the
+    # export is still being downloaded.
+    stats = sync_deal_stream(
+        iter_all_deals(), text_splitter, vectorstore, state, deal_index, deal_store
     )
+    seen_ids = stats.pop("seen_ids")
+    gone = state.all_deal_ids() - seen_ids
+    stats["deleted"] = delete_deals(gone, vectorstore, state) if gone else 0
+    deal_index.remove(set(deal_index.deals) - seen_ids)
+    if deal_store is not None:
+        deal_store.remove(deal_store.ids() - seen_ids)
+    return stats
+
 
-    metadata = {
-        "source": "pipedrive",
-        "deal_id": deal.get("id", 0),
-        "status": deal.get("status", "N/A"),
-        "value": deal.get("value", 0),
-    }
-    return Document(page_content=content, metadata=metadata)
+def run_incremental_sync(
+    since: str, text_splitter, vectorstore, state, deal_index, deal_store=None
+) -> dict:
+    """Applies only the deal changes (including deletions) reported since `since`."""
+    # Keep the latest version of each deal; a deletion always wins.
+    changes = {}
+    for deal_id, deal in iter_deal_changes(since):
+        previous = changes.get(deal_id, {})
+        if deal is None or previous is None:
+            changes[deal_id] = None
+        elif (deal.get("update_time") or "") >= (previous.get("update_time") or ""):
+            changes[deal_id] = deal
+
+    updated = [deal for deal in changes.values() if deal is not None]
+    removed = [deal_id for deal_id, deal in changes.items() if deal is None]
+
+    stats = sync_deal_stream(
+        updated, text_splitter, vectorstore, state, deal_index, deal_store
+    )
+    stats.pop("seen_ids")
+    stats["deleted"] = delete_deals(removed, vectorstore, state) if removed else 0
+    deal_index.remove(removed)
+    if deal_store is not None:
+        deal_store.remove(removed)
+    stats["watermark"] = max(since, stats["watermark"] or since)
+    return stats
 
 
 def main():
     """Main function to run the data ingestion pipeline."""
+    parser = argparse.ArgumentParser(
+        description="Sync Pipedrive deals into the vector store."
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only process deals changed since the last successful sync.",
+    )
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Delete every vector and all sync state, then ingest from scratch.",
+    )
+    parser.add_argument(
+        "--build-ann-index",
+        action="store_true",
+        help="After syncing, build the approximate (IVF) index of the local store.",
+    )
+    args = parser.parse_args()
+
     print("--- Starting CRM Data Ingestion and Vectorization ---")
+    # Ingestion shares the Pipedrive and Nebius quotas with the chat app; when
+    # they run out, chat requests get the next tokens.
+    set_default_priority(BACKGROUND)
 
     print("Step 1: Initializing clients...")
-    pc_client = get_pinecone_client()
     embedding_model = get_embedding_model()
 
-    if not all([pc_client, embedding_model]):
-        print("❌ Client initialization failed. Aborting.")
-        return
-
-    print("Step 2: Fetching deals from Pipedrive...")
-    deals = get_recent_deals(limit=100)
-    if not deals:
-        print("⚠️ No deals found in Pipedrive. Nothing to ingest.")
-        return
-    print(f"   Found {len(deals)} deals.")
-
-    print("Step 3: Formatting deals into LangChain Documents...")
-    documents = [format_deal_to_document(deal) for deal in deals]
-
-    print("Step 4: Splitting documents into smaller chunks...")
+    if VECTOR_STORE_BACKEND == "pinecone":
+        pc_client = get_pinecone_client()
+        if not all([pc_client, embedding_model]):
+            print("❌ Client initialization failed. Aborting.")
+            return
+        print("Step 2: Preparing the Pinecone index...")
+        get_pinecone_index(pc_client, PINECONE_INDEX_NAME)
+    else:
+        print("Step 2: Loading the local vector store...")
+    vectorstore = get_vector_store(embedding_model)
     text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-    docs_to_ingest = text_splitter.split_documents(documents)
-    print(f"   Split into {len(docs_to_ingest)} chunks.")
+    state = SyncState()
+    deal_index = DealIndex.load()
+    # The chat app reads deals from this snapshot; ingestion already has them.
+    deal_store = get_deal_store() if DEAL_STORE_ENABLED else None
 
-    print("Step 5: Ingesting data into Pinecone...")
-    get_pinecone_index(pc_client, PINECONE_INDEX_NAME)
+    # A local store only becomes durable when it is persisted, so its sync state
+    # is committed together with the persisted vectors at the end of the run.
+    persist = getattr(vectorstore, "persist", None)
+    with state.transaction() if persist else nullcontext():
+        if args.rebuild:
+            print("   Rebuild requested: clearing the index and local sync state...")
+            try:
+                vectorstore.delete(delete_all=True)
+            except Exception as e:
+                print(f"   (Index was already empty or could not be cleared: {e})")
+            state.clear()
+            deal_index = DealIndex()
 
-    # LOOK HERE: This line is also different. It uses PineconeVectorStore.
-    PineconeVectorStore.from_documents(
-        documents=docs_to_ingest,
-        embedding=embedding_model,
-        index_name=PINECONE_INDEX_NAME,
-    )
+        watermark = state.get_watermark()
+        if args.incremental and watermark:
+            print(f"Step 3: Syncing deals changed since {watermark}...")
+            stats = run_incremental_sync(
+                watermark, text_splitter, vectorstore, state, deal_index, deal_store
+            )
+        else:
+            if args.incremental:
+                print("   No previous sync found, falling back to a full sync.")
+            print(
+                "Step 3: Streaming all deals from Pipedrive and syncing in batches..."
+            )
+            stats = run_full_sync(
+                text_splitter, vectorstore, state, deal_index, deal_store
+            )
+            if not stats["seen"]:
+                print("⚠️ No deals found in Pipedrive. Nothing to ingest.")
+
+        if stats["watermark"]:
+            state.set_watermark(stats["watermark"])
+        if args.build_ann_index:
+            if hasattr(vectorstore, "build_ann_index"):
+                print("Step 4: Building the approximate nearest-neighbor index...")
+                start = time.perf_counter()
+                index = vectorstore.build_ann_index()
+                print(
+                    f"   Indexed {len(index)} vectors in {index.nlist} lists "
+                    f"({index.dtype}, {index.nbytes / 1e6:.1f} MB) "
+                    f"in {time.perf_counter() - start:.1f}s."
+                )
+            else:
+                print("⚠️ --build-ann-index only applies to the local vector store.")
+        if persist:
+            persist()
+        deal_index.save()
+        if deal_store is not None:
+            deal_store.mark_synced(stats["watermark"])
 
     print("\n--- ✅ Ingestion Complete! ---")
     print(
-        f"Successfully vectorized and stored {len(docs_to_ingest)} document chunks in Pinecone."
+        f"Processed {stats['seen']} deals: {stats['changed']} re-embedded "
+        f"({stats['chunks']} chunks), {stats['deleted']} deleted, "
+        f"{stats['seen'] - stats['changed']} unchanged."
     )
+    if hasattr(embedding_model, "stats"):
+        print(f"Embedding cache: {embedding_model.stats()}")
 
 
 if __name__ == "__main__":
@@ -1,14 +1,17 @@
+import asyncio
 import sys
-from langchain_core.messages import HumanMessage
+import threading
+import uuid
 
 # Add the 'src' directory to the Python path
 sys.path.append("src")
 
-from src.supervisor import supervisor_graph
-from src.config import validate_config
+from src.config import DEAL_STORE_ENABLED, validate_config
+from src.deal_store import start_deal_sync
+from src.supervisor import astream_reply, warm_up
 
 
-def main():
+async def main():
     """
     Main function to run the interactive multi-agent copilot.
     """
@@ -19,16 +22,22 @@ def main():
         validate_config()
         print("✅ Initializing Supervisor Graph...")
         # The graph is already compiled when imported
-        app = supervisor_graph
+        # Build the LLM clients and agents while the user types the first request.
+        threading.Thread(target=warm_up, daemon=True).start()
+        # Deal reads are served from a local snapshot that this worker keeps fresh.
+        if DEAL_STORE_ENABLED:
+            start_deal_sync()
         print("✅ Graph ready. You can now send requests to the agent team.")
         print("   (Type 'exit' to quit)")
+        # Follow-up requests in this run can refer to earlier answers.
+        session_id = uuid.uuid4().hex
     except Exception as e:
         print(f"❌ Failed to initialize application: {e}")
         return
 
     while True:
         # Get user input
-        question = input("\nYour Request: ")
+        question = await asyncio.to_thread(input, "\nYour Request: ")
 
         if question.lower().strip() == "exit":
             print("Exiting Copilot. Goodbye!")
@@ -40,18 +49,24 @@ def main():
         # Invoke the graph
         print("Supervisor is routing the request...")
 
-        # The input to the graph is a dictionary where keys match the AgentState
-        initial_state = {"messages": [HumanMessage(content=question)]}
-
-        # Stream events to see the flow of the graph in real-time
-        for event in app.stream(initial_state, stream_mode="values"):
-            # The 'event' is the full state of the graph after a node has run
-            last_message = event["messages"][-1]
-            if last_message.name:
-                print(f"\n--- Output from: {last_message.name} ---")
-                print(last_message.content)
-                print("----------------------------------------")
+        # Tokens are printed as they are generated; agents that do not stream
+        # print their reply once they finish.
+        streamed = False
+        async for agent, text, done in astream_reply(question, session_id):
+            if not done:
+                if not streamed:
+                    print(f"\n--- Output from: {agent} ---")
+                    streamed = True
+                print(text, end="", flush=True)
+                continue
+            if streamed:
+                print()
+            else:
+                print(f"\n--- Output from: {agent} ---")
+                print(text)
+            print("----------------------------------------")
+            streamed = False
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
@@ -1,5 +1,6 @@
 from langchain_core.runnables import RunnableLambda
 from src.tools.generative_tools import marketing_email_tool, marketing_tool
+from src.registry import component
 
 
 # This agent needs to decide between two tools: drafting an email or an outline.
@@ -19,6 +20,15 @@ def marketing_router(input_data):
         return marketing_tool.invoke(user_input)
 
 
+async def amarketing_router(input_data):
+    """Async version of marketing_router, used by the async graph path."""
+    user_input = input_data.get("input", "").lower()
+    if "email" in user_input:
+        return await marketing_email_tool.ainvoke(user_input)
+    return await marketing_tool.ainvoke(user_input)
+
+
+@component
 def get_marketing_agent():
     """
     Initializes and returns the Marketing Agent.
@@ -27,5 +37,5 @@ def get_marketing_agent():
     instead of a complex ReAct agent. This avoids parsing errors with long outputs.
     """
     # RunnableLambda wraps our router function so it can be part of a LangChain chain.
-    agent = RunnableLambda(marketing_router)
+    agent = RunnableLambda(marketing_router, afunc=amarketing_router)
     return agent
@@ -1,9 +1,15 @@
-from langchain.agents import AgentExecutor, create_react_agent
-from langchain_core.prompts import PromptTemplate
+from langchain.agents import (
+    AgentExecutor,
+    create_react_agent,
+    create_tool_calling_agent,
+)
 from langchain.tools.render import render_text_description
+from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
 
+from src import config
 from src.llm_connector import get_llm
-from src.tools.crm_tools import sales_agent_tools
+from src.registry import component
+from src.tools.crm_tools import sales_agent_structured_tools, sales_agent_tools
 
 # --- THIS IS THE CRITICAL FIX ---
 # We are making the instructions for Action Input much more explicit to prevent parsing errors.
@@ -22,6 +28,8 @@ Action: the action to take, should be one of [{tool_names}]
 Action Input: The input to the action.
 - If the tool takes a single string argument, the input should be a simple string.
 - If the tool takes multiple arguments (like create_crm_note), the input MUST be a valid JSON dictionary with the correct argument names as keys. For example: {{"deal_id": 123, "content": "This is a summary."}}
+- If the request covers several deals, use bulk_create_crm_notes or bulk_update_deal_status ONCE with all the deal IDs instead of one action per deal. For example: {{"deal_ids": ["10-60"], "status": "lost"}}
+- For totals, counts, averages or win rates over many deals, use CRM_Deal_Analytics ONCE with a JSON query instead of adding up lookup results. For example: {{"metrics": ["count", "total_value"], "group_by": ["owner_name"], "status": ["open"]}}
 Observation: the result of the action
 ... (this Thought/Action/Action Input/Observation can repeat)
 Thought: I now know the final answer
@@ -34,7 +42,60 @@ Thought:{agent_scratchpad}
 """
 
 
+# Instructions of the tool-calling Sales Agent (SALES_AGENT_MODE=tool_calling).
+# The tools and their argument schemas are sent through the tools API.
+TOOL_CALLING_SYSTEM_PROMPT = """
+You are the Breeze AI Sales Agent. Your primary goal is to assist users by
+accessing CRM data and performing actions within the CRM, using the tools.
+
+- Call several tools in the same step when their calls do not depend on each
+  other (e.g. notes on two different deals, or looking up two deals); they run
+  at the same time. When a call needs the result of another (e.g. the deal ID
+  found by a lookup), wait for that result first.
+- If the request covers several deals, use bulk_create_crm_notes or
+  bulk_update_deal_status ONCE with all the deal IDs instead of one call per deal.
+- For totals, counts, averages or win rates over many deals, use
+  CRM_Deal_Analytics instead of adding up lookup results.
+- When you are done, answer the user directly, based on the tool results.
+"""
+
+
+@component
 def get_sales_agent():
+    """
+    Initializes and returns the Sales Agent executor of the configured
+    SALES_AGENT_MODE: a tool-calling agent by default, or the ReAct agent,
+    which is compatible with a wide range of LLMs.
+    """
+    if config.SALES_AGENT_MODE == "react":
+        return get_react_sales_agent()
+    return get_tool_calling_sales_agent()
+
+
+@component
+def get_tool_calling_sales_agent():
+    """
+    Sales Agent using the model's native tool calling. One LLM call can ask
+    for several tool calls; the executor runs them concurrently (on the async
+    path) and sends all their results back in the next call. The arguments
+    arrive as JSON validated against the tool schemas, so there is no text to
+    parse and no parsing retry.
+    """
+    llm = get_llm(temperature=0.0)
+    tools = sales_agent_structured_tools
+    prompt = ChatPromptTemplate.from_messages(
+        [
+            ("system", TOOL_CALLING_SYSTEM_PROMPT),
+            ("human", "{input}"),
+            ("placeholder", "{agent_scratchpad}"),
+        ]
+    )
+    agent = create_tool_calling_agent(llm, tools, prompt)
+    return AgentExecutor(agent=agent, tools=tools, verbose=True)
+
+
+@component
+def get_react_sales_agent():
     """
     Initializes and returns the Sales Agent executor using the reliable
     ReAct agent type, which is compatible with a wide range of LLMs.
@@ -1,6 +1,7 @@
 from langchain_core.runnables import RunnableLambda
 from src.tools.generative_tools import service_tool
-from src.tools.crm_tools import crm_rag_tool
+from src.tools.crm_tools import crm_rag_tool, lookup_deals_text
+from src.registry import component
 
 
 def service_router(input_data: dict) -> str:
@@ -15,15 +16,33 @@ def service_router(input_data: dict) -> str:
         # If the user wants to draft something, use the generative tool.
         return service_tool.invoke(user_input)
     else:
-        # Otherwise, assume it's a question about CRM data and use the RAG tool.
+        # Questions about a specific deal ID or name are answered straight from
+        # the local deal index; everything else goes through the RAG tool.
+        deal_details = lookup_deals_text(user_input)
+        if deal_details is not None:
+            return deal_details
         return crm_rag_tool.invoke(user_input)
 
 
+async def aservice_router(input_data: dict) -> str:
+    """Async version of service_router, used by the async graph path."""
+    user_input = input_data.get("input", "").lower()
+    draft_keywords = ["draft", "write", "respond", "response", "reply"]
+
+    if any(keyword in user_input for keyword in draft_keywords):
+        return await service_tool.ainvoke(user_input)
+    deal_details = lookup_deals_text(user_input)
+    if deal_details is not None:
+        return deal_details
+    return await crm_rag_tool.ainvoke(user_input)
+
+
+@component
 def get_service_agent():
     """
     Initializes and returns the Service Agent.
     This is now a simple, robust chain that directly routes to the correct tool,
     avoiding parsing errors with long, creative outputs.
     """
-    agent = RunnableLambda(service_router)
+    agent = RunnableLambda(service_router, afunc=aservice_router)
     return agent
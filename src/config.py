@@ -6,19 +6,183 @@ from dotenv import load_dotenv
 dotenv_path = os.path.join(os.path.dirname(__file__), "..", ".env")
 load_dotenv(dotenv_path=dotenv_path)
 
+# Local files (caches, indexes, sync state) are kept under this directory.
+LOCAL_DATA_DIR = os.getenv(
+    "LOCAL_DATA_DIR", os.path.join(os.path.dirname(__file__), "..", "data")
+)
+
 # --- LLM Configuration ---
 NEBIUS_API_KEY = os.getenv("NEBIUS_API_KEY")
 NEBIUS_API_BASE = os.getenv("NEBIUS_API_BASE")
 
 LLM_MODEL_NAME = "openai/gpt-oss-120b"
 EMBEDDING_MODEL_NAME = "intfloat/e5-mistral-7b-instruct"
+# Micro-batching limits for embedding requests (items and estimated tokens).
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+EMBEDDING_MAX_BATCH_TOKENS = int(os.getenv("EMBEDDING_MAX_BATCH_TOKENS", "16000"))
+# Number of embedding batches sent to the server in parallel.
+EMBEDDING_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "4"))
+# Content-addressed embedding cache (in-memory LRU backed by SQLite).
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH", os.path.join(LOCAL_DATA_DIR, "embedding_cache.sqlite")
+)
+EMBEDDING_CACHE_MEMORY_ITEMS = int(os.getenv("EMBEDDING_CACHE_MEMORY_ITEMS", "2048"))
+EMBEDDING_CACHE_MAX_MB = int(os.getenv("EMBEDDING_CACHE_MAX_MB", "2048"))
 # --- Vector DB Configuration ---
+# "pinecone" (hosted) or "local" (in-process NumPy index persisted to disk).
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "pinecone").lower()
+LOCAL_VECTOR_STORE_PATH = os.getenv(
+    "LOCAL_VECTOR_STORE_PATH", os.path.join(LOCAL_DATA_DIR, "vector_store")
+)
+# Approximate (IVF) index for the local backend, built with
+# `python ingest_data.py --build-ann-index`. NLIST=0 picks ~4*sqrt(n) buckets.
+LOCAL_ANN_NLIST = int(os.getenv("LOCAL_ANN_NLIST", "0"))
+LOCAL_ANN_NPROBE = int(os.getenv("LOCAL_ANN_NPROBE", "8"))
+LOCAL_ANN_RERANK = int(os.getenv("LOCAL_ANN_RERANK", "4"))
+# Storage for the index codes: "float32", "float16" (2x smaller) or "int8" (4x).
+LOCAL_ANN_DTYPE = os.getenv("LOCAL_ANN_DTYPE", "int8")
+# Filters matching at most this many vectors are searched exactly.
+LOCAL_ANN_EXACT_THRESHOLD = int(os.getenv("LOCAL_ANN_EXACT_THRESHOLD", "20000"))
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 PINECONE_INDEX_NAME = "sachin08"
+# Watermark and per-deal content hashes used by incremental ingestion.
+SYNC_STATE_PATH = os.getenv(
+    "SYNC_STATE_PATH", os.path.join(LOCAL_DATA_DIR, "sync_state.sqlite")
+)
+
+# --- RAG Retrieval Configuration ---
+# "hybrid" fuses BM25 keyword search with vector search; "vector" is dense only.
+RAG_RETRIEVAL_MODE = os.getenv("RAG_RETRIEVAL_MODE", "hybrid").lower()
+RAG_VECTOR_K = int(os.getenv("RAG_VECTOR_K", "4"))
+RAG_BM25_K = int(os.getenv("RAG_BM25_K", "4"))
+# Number of fused documents passed to the LLM as context.
+RAG_FUSED_K = int(os.getenv("RAG_FUSED_K", "3"))
+RAG_RRF_K = int(os.getenv("RAG_RRF_K", "60"))
+# Semantic answer cache: reuse an answer when a new question's embedding is at
+# least this cosine-similar to a cached one (and names the same deals).
+RAG_CACHE_ENABLED = os.getenv("RAG_CACHE_ENABLED", "true").lower() == "true"
+RAG_CACHE_SIMILARITY = float(os.getenv("RAG_CACHE_SIMILARITY", "0.95"))
+RAG_CACHE_TTL_SECONDS = float(os.getenv("RAG_CACHE_TTL_SECONDS", "3600"))
+RAG_CACHE_MAX_ENTRIES = int(os.getenv("RAG_CACHE_MAX_ENTRIES", "1000"))
+
+# --- UI Configuration ---
+# Maximum number of chat turns the Gradio UI processes at the same time.
+UI_CONCURRENCY_LIMIT = int(os.getenv("UI_CONCURRENCY_LIMIT", "200"))
+
+# --- Routing Configuration ---
+# Route obvious requests with keyword rules / example embeddings and only ask
+# the supervisor LLM when the local classifier is unsure.
+FAST_ROUTER_ENABLED = os.getenv("FAST_ROUTER_ENABLED", "true").lower() == "true"
+# Minimum cosine score of the best agent centroid, and minimum lead over the
+# runner-up, for an embedding-based decision.
+FAST_ROUTER_MIN_SCORE = float(os.getenv("FAST_ROUTER_MIN_SCORE", "0.5"))
+FAST_ROUTER_MIN_MARGIN = float(os.getenv("FAST_ROUTER_MIN_MARGIN", "0.03"))
+FAST_ROUTER_CACHE_SIZE = int(os.getenv("FAST_ROUTER_CACHE_SIZE", "1024"))
+# Split compound requests ("update deal 10 to won and draft a thank-you email")
+# into sub-tasks that run on their agents concurrently.
+MULTI_INTENT_ENABLED = os.getenv("MULTI_INTENT_ENABLED", "true").lower() == "true"
+MULTI_INTENT_MAX_TASKS = int(os.getenv("MULTI_INTENT_MAX_TASKS", "4"))
+
+# --- Sales Agent ---
+# "tool_calling": the model calls the CRM tools through the OpenAI-compatible
+# tools API, several at once if it wants, and they run concurrently.
+# "react": the Thought/Action/Observation text loop, for models without tool
+# calling support.
+SALES_AGENT_MODE = os.getenv("SALES_AGENT_MODE", "tool_calling").lower()
+
+# --- Conversation Memory ---
+# Chat sessions remember earlier turns (a LangGraph checkpointer in SQLite), so
+# follow-ups like "add a note to that deal" work.
+MEMORY_ENABLED = os.getenv("MEMORY_ENABLED", "true").lower() == "true"
+MEMORY_PATH = os.getenv("MEMORY_PATH", os.path.join(LOCAL_DATA_DIR, "memory.sqlite"))
+# Estimated tokens of recent messages kept verbatim; older turns are folded into
+# a running summary of at most MEMORY_SUMMARY_WORDS words.
+MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", "2000"))
+MEMORY_SUMMARY_WORDS = int(os.getenv("MEMORY_SUMMARY_WORDS", "200"))
+# Sessions idle for longer than this are deleted (0 keeps them forever).
+MEMORY_IDLE_TTL_SECONDS = float(os.getenv("MEMORY_IDLE_TTL_SECONDS", "3600"))
+
 # --- CRM Configuration ---
+# Deal-ID and name lookup index written by ingest_data.py.
+DEAL_INDEX_PATH = os.getenv(
+    "DEAL_INDEX_PATH", os.path.join(LOCAL_DATA_DIR, "deal_index.json")
+)
 PIPEDRIVE_API_TOKEN = os.getenv("PIPEDRIVE_API_TOKEN")
 
 PIPEDRIVE_COMPANY_DOMAIN = os.getenv("PIPEDRIVE_COMPANY_DOMAIN")
+# Overrides the API base URL derived from the company domain (e.g. a proxy or
+# a local stand-in for benchmarks).
+PIPEDRIVE_API_BASE = os.getenv("PIPEDRIVE_API_BASE")
+# Pipedrive caps list endpoints at 500 items per page.
+PIPEDRIVE_PAGE_SIZE = int(os.getenv("PIPEDRIVE_PAGE_SIZE", "500"))
+# Number of deal pages fetched in parallel during a full export.
+PIPEDRIVE_MAX_WORKERS = int(os.getenv("PIPEDRIVE_MAX_WORKERS", "4"))
+# Requests in flight, and maximum number of deals, of one bulk write.
+PIPEDRIVE_BULK_MAX_WORKERS = int(os.getenv("PIPEDRIVE_BULK_MAX_WORKERS", "8"))
+PIPEDRIVE_BULK_MAX_ITEMS = int(os.getenv("PIPEDRIVE_BULK_MAX_ITEMS", "500"))
+# Local snapshot of the deals (SQLite), kept in sync by a background worker and
+# read instead of Pipedrive while its last sync is at most
+# DEAL_STORE_MAX_STALENESS_SECONDS old. Writes go to Pipedrive and are applied
+# to the snapshot right away.
+DEAL_STORE_ENABLED = os.getenv("DEAL_STORE_ENABLED", "true").lower() == "true"
+DEAL_STORE_PATH = os.getenv(
+    "DEAL_STORE_PATH", os.path.join(LOCAL_DATA_DIR, "deal_store.sqlite")
+)
+DEAL_STORE_SYNC_INTERVAL_SECONDS = float(
+    os.getenv("DEAL_STORE_SYNC_INTERVAL_SECONDS", "60")
+)
+DEAL_STORE_MAX_STALENESS_SECONDS = float(
+    os.getenv("DEAL_STORE_MAX_STALENESS_SECONDS", "300")
+)
+
+# --- Rate Limits ---
+# Every call to an upstream endpoint first takes a token from that endpoint's
+# bucket: requests per second and burst size, sized from the plan's quota
+# (0 disables the limit). Chat requests are served ahead of ingestion while
+# calls wait for tokens.
+PIPEDRIVE_RATE_LIMIT = float(os.getenv("PIPEDRIVE_RATE_LIMIT", "10"))
+PIPEDRIVE_RATE_BURST = int(os.getenv("PIPEDRIVE_RATE_BURST", "20"))
+NEBIUS_LLM_RATE_LIMIT = float(os.getenv("NEBIUS_LLM_RATE_LIMIT", "10"))
+NEBIUS_LLM_RATE_BURST = int(os.getenv("NEBIUS_LLM_RATE_BURST", "20"))
+NEBIUS_EMBEDDING_RATE_LIMIT = float(os.getenv("NEBIUS_EMBEDDING_RATE_LIMIT", "20"))
+NEBIUS_EMBEDDING_RATE_BURST = int(os.getenv("NEBIUS_EMBEDDING_RATE_BURST", "40"))
+# SQLite file holding the buckets, so several worker processes share one quota.
+# Unset, each process keeps its own buckets.
+RATE_LIMIT_SHARED_PATH = os.getenv("RATE_LIMIT_SHARED_PATH")
+# Share of each burst that background work (ingestion) leaves for chat requests.
+RATE_LIMIT_INTERACTIVE_RESERVE = float(
+    os.getenv("RATE_LIMIT_INTERACTIVE_RESERVE", "0.25")
+)
+
+# --- HTTP Transport Configuration ---
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "60"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.5"))
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "30"))
+# Upper bound on how long we honor a server's Retry-After header.
+HTTP_RETRY_AFTER_MAX = float(os.getenv("HTTP_RETRY_AFTER_MAX", "60"))
+# Maximum number of pooled keep-alive connections per host.
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "16"))
+# Maximum concurrent connections per host for the async client.
+HTTP_ASYNC_MAX_CONNECTIONS = int(os.getenv("HTTP_ASYNC_MAX_CONNECTIONS", "100"))
+
+# --- Tracing ---
+# Records a span for every graph node, routing decision, LLM call, tool,
+# retriever, embedding call and HTTP request of a chat turn (see src/tracing.py).
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+# Spans are appended to this file, one JSON object per line.
+TRACE_FILE = os.getenv("TRACE_FILE", os.path.join(LOCAL_DATA_DIR, "traces.jsonl"))
+# Print a waterfall of every traced turn to stdout.
+TRACE_WATERFALL = os.getenv("TRACE_WATERFALL", "true").lower() == "true"
+
+# --- Metrics ---
+# Port of the Prometheus-style /metrics endpoint served next to the Gradio app
+# (0 disables it). Metrics are always recorded; this only controls the endpoint.
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9464"))
+# Interface of the endpoint; 0.0.0.0 lets a scraper on another host reach it.
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
 
 
 # --- Validation ---
@@ -29,12 +193,23 @@ def validate_config():
     required_vars = {
         "NEBIUS_API_KEY": NEBIUS_API_KEY,
         "NEBIUS_API_BASE": NEBIUS_API_BASE,
-        "PINECONE_API_KEY": PINECONE_API_KEY,
         "PIPEDRIVE_API_TOKEN": PIPEDRIVE_API_TOKEN,
         "PIPEDRIVE_COMPANY_DOMAIN": PIPEDRIVE_COMPANY_DOMAIN,
         "PINECONE_INDEX_NAME": PINECONE_INDEX_NAME,
         "EMBEDDING_MODEL_NAME": EMBEDDING_MODEL_NAME,
     }
+    if VECTOR_STORE_BACKEND == "pinecone":
+        required_vars["PINECONE_API_KEY"] = PINECONE_API_KEY
+    elif VECTOR_STORE_BACKEND != "local":
+        raise ValueError(
+            f"Unknown VECTOR_STORE_BACKEND '{VECTOR_STORE_BACKEND}'. "
+            "Use 'pinecone' or 'local'."
+        )
+    if SALES_AGENT_MODE not in ("tool_calling", "react"):
+        raise ValueError(
+            f"Unknown SALES_AGENT_MODE '{SALES_AGENT_MODE}'. "
+            "Use 'tool_calling' or 'react'."
+        )
     missing_vars = [key for key, value in required_vars.items() if value is None]
     if missing_vars:
         raise ValueError(
@@ -1,21 +1,46 @@
 # import os
-import requests
+import asyncio
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 # import config
-from . import config
+from . import config, http_client, metrics
+from .deal_store import get_deal_store
+from .scheduler import bind_priority
 
-BASE_URL = f"https://{config.PIPEDRIVE_COMPANY_DOMAIN}.pipedrive.com/api/v1"
+BASE_URL = (
+    config.PIPEDRIVE_API_BASE
+    or f"https://{config.PIPEDRIVE_COMPANY_DOMAIN}.pipedrive.com/api/v1"
+)
 API_TOKEN = config.PIPEDRIVE_API_TOKEN
 
+# Every Pipedrive call goes through the "pipedrive" rate scheduler (see
+# src/scheduler.py), so bulk writes, ingestion and concurrent chats together
+# stay under the account's quota.
+ENDPOINT = "pipedrive"
+
+
+def _fresh_store():
+    """The local deal snapshot if it is enabled and recent enough, else None."""
+    if not config.DEAL_STORE_ENABLED:
+        return None
+    store = get_deal_store()
+    return store if store.is_fresh() else None
+
 
 def get_recent_deals(limit: int = 5):
     """
-    Fetch recent deals from Pipedrive REST API.
+    Fetch recent deals, from the local deal snapshot (src/deal_store.py) when
+    it is fresh enough, else from the Pipedrive REST API.
     """
+    store = _fresh_store()
+    if store is not None:
+        metrics.DEAL_READS.inc(source="snapshot")
+        return store.query(order_by="add_time", limit=limit)
+    metrics.DEAL_READS.inc(source="pipedrive")
     try:
         url = f"{BASE_URL}/deals"
         params = {"api_token": API_TOKEN, "sort": "add_time DESC", "limit": limit}
-        response = requests.get(url, params=params)
+        response = http_client.request("GET", url, params=params, endpoint=ENDPOINT)
         response.raise_for_status()
         data = response.json()
         return data.get("data", [])
@@ -24,6 +49,251 @@ def get_recent_deals(limit: int = 5):
         return []
 
 
+def get_deal(deal_id: int):
+    """
+    Fetch one deal, from the local deal snapshot when it is fresh enough and
+    has the deal, else from Pipedrive (and then keep it in the snapshot).
+
+    Returns:
+        dict: The deal, or None if it does not exist or the call failed.
+    """
+    store = _fresh_store()
+    if store is not None:
+        deal = store.get(deal_id)
+        if deal is not None:
+            metrics.DEAL_READS.inc(source="snapshot")
+            return deal
+    metrics.DEAL_READS.inc(source="pipedrive")
+    try:
+        url = f"{BASE_URL}/deals/{deal_id}"
+        response = http_client.request(
+            "GET", url, params={"api_token": API_TOKEN}, endpoint=ENDPOINT
+        )
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        deal = response.json().get("data")
+    except Exception as e:
+        print(f"Error fetching deal ID {deal_id}: {e}")
+        return None
+    if deal and config.DEAL_STORE_ENABLED:
+        get_deal_store().upsert([deal])
+    return deal
+
+
+def _fetch_page(path: str, start: int, limit: int, params: dict):
+    """
+    Fetches a single page of a Pipedrive list endpoint starting at the given offset.
+
+    Returns:
+        tuple: The list of items on the page and whether Pipedrive reports
+        more items after it.
+    """
+    url = f"{BASE_URL}/{path}"
+    page_params = {**params, "api_token": API_TOKEN, "start": start, "limit": limit}
+    response = http_client.request("GET", url, params=page_params, endpoint=ENDPOINT)
+    response.raise_for_status()
+    data = response.json()
+    pagination = (data.get("additional_data") or {}).get("pagination") or {}
+    return data.get("data") or [], bool(pagination.get("more_items_in_collection"))
+
+
+def _iter_pages(path: str, page_size: int, max_workers: int, params: dict):
+    """
+    Streams every item of a paginated Pipedrive list endpoint, following the
+    start/more_items_in_collection cursor.
+
+    Up to `max_workers` pages are requested ahead of the cursor at once, and items
+    are yielded as soon as their page arrives (pages may complete out of order).
+    """
+    page_size = max(1, min(page_size, 500))
+    max_workers = max(1, max_workers)
+
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    fetch_page = bind_priority(_fetch_page)
+    pending = {}
+    next_start = 0
+    # Offset of the first page known to be past the end of the collection.
+    end_start = None
+
+    def submit_next_page():
+        nonlocal next_start
+        future = pool.submit(fetch_page, path, next_start, page_size, params)
+        pending[future] = next_start
+        next_start += page_size
+
+    try:
+        for _ in range(max_workers):
+            submit_next_page()
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                start = pending.pop(future)
+                if end_start is not None and start >= end_start:
+                    continue
+
+                try:
+                    items, more_items = future.result()
+                except Exception as e:
+                    print(f"Error fetching /{path} page starting at {start}: {e}")
+                    raise
+
+                yield from items
+
+                if not more_items:
+                    last_start = start + page_size
+                    end_start = min(end_start or last_start, last_start)
+                    for other, other_start in pending.items():
+                        if other_start >= end_start:
+                            other.cancel()
+                elif end_start is None:
+                    submit_next_page()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_all_deals(
+    page_size: int = config.PIPEDRIVE_PAGE_SIZE,
+    max_workers: int = config.PIPEDRIVE_MAX_WORKERS,
+    **params,
+):
+    """
+    Streams every deal in Pipedrive, following the start/more_items_in_collection
+    pagination cursor.
+
+    Up to `max_workers` pages are requested ahead of the cursor at once, and deals
+    are yielded as soon as their page arrives (pages may complete out of order).
+    Extra keyword arguments are passed through as query parameters, e.g.
+    `status="all_not_deleted"` or `sort="update_time DESC"`.
+
+    Args:
+        page_size (int): Number of deals requested per page (Pipedrive max is 500).
+        max_workers (int): Maximum number of page requests in flight.
+
+    Yields:
+        dict: One deal at a time.
+    """
+    seen_ids = set()
+    for deal in _iter_pages("deals", page_size, max_workers, params):
+        # Offset pagination can repeat a deal if the collection shifts
+        # while the export is running.
+        deal_id = deal.get("id")
+        if deal_id in seen_ids:
+            continue
+        seen_ids.add(deal_id)
+        yield deal
+
+
+def is_deleted_deal(deal: dict) -> bool:
+    """Returns True if a deal payload describes a deleted (or merged-away) deal."""
+    return bool(deal.get("deleted")) or deal.get("status") == "deleted"
+
+
+def iter_deal_changes(
+    since: str,
+    page_size: int = config.PIPEDRIVE_PAGE_SIZE,
+    max_workers: int = config.PIPEDRIVE_MAX_WORKERS,
+):
+    """
+    Streams deals changed since a point in time, using Pipedrive's /recents feed.
+
+    The feed also reports deleted deals, including the ones removed by a merge,
+    so callers can drop them from downstream indexes.
+
+    Args:
+        since (str): UTC timestamp in Pipedrive's "YYYY-MM-DD HH:MM:SS" format.
+
+    Yields:
+        tuple: (deal_id, deal), where deal is None if the deal was deleted.
+    """
+    params = {"since_timestamp": since, "items": "deal"}
+    for change in _iter_pages("recents", page_size, max_workers, params):
+        if change.get("item") != "deal":
+            continue
+        deal = change.get("data")
+        deal_id = change.get("id") or (deal or {}).get("id")
+        if deal_id is None:
+            continue
+        if not deal or is_deleted_deal(deal):
+            yield deal_id, None
+        else:
+            yield deal_id, deal
+
+
+DEAL_STATUSES = ["open", "won", "lost"]
+
+
+def _note_request(deal_id: int, content: str) -> dict:
+    return {
+        "url": f"{BASE_URL}/notes",
+        "params": {"api_token": API_TOKEN},
+        "json": {"content": content, "deal_id": deal_id},
+    }
+
+
+def _status_request(deal_id: int, status: str) -> dict:
+    return {
+        "url": f"{BASE_URL}/deals/{deal_id}",
+        "params": {"api_token": API_TOKEN},
+        "json": {"status": status},
+    }
+
+
+def _write(method: str, request: dict):
+    """Sends a rate-limited write call and returns its `data`; raises on failure."""
+    response = http_client.request(method, endpoint=ENDPOINT, **request)
+    response.raise_for_status()
+    return response.json().get("data")
+
+
+async def _awrite(method: str, request: dict):
+    response = await http_client.arequest(method, endpoint=ENDPOINT, **request)
+    response.raise_for_status()
+    return response.json().get("data")
+
+
+# --- Write-through to the deal snapshot ---
+# A status change is applied to the local snapshot before Pipedrive is called,
+# so reads right after it see the new status; it is replaced by Pipedrive's
+# copy of the deal on success and rolled back on failure.
+
+
+def _apply_locally(deal_id: int, status: str):
+    if not config.DEAL_STORE_ENABLED:
+        return None
+    try:
+        return get_deal_store().apply_local(deal_id, {"status": status})
+    except Exception as e:
+        print(f"⚠️ Could not update deal ID {deal_id} in the deal store: {e}")
+        return None
+
+
+def _settle_locally(deal_id: int, previous, ok: bool, data=None):
+    """Keeps Pipedrive's copy of the deal after a write, or reverts a failed one."""
+    if not config.DEAL_STORE_ENABLED:
+        return
+    try:
+        store = get_deal_store()
+        if not ok:
+            store.revert_local(deal_id, previous)
+        elif isinstance(data, dict) and data.get("id") is not None:
+            store.settle_local(deal_id, previous, data)
+        else:
+            store.settle_local(deal_id, previous)
+    except Exception as e:
+        print(f"⚠️ Could not update deal ID {deal_id} in the deal store: {e}")
+
+
+def _check_status(status: str) -> bool:
+    if status not in DEAL_STATUSES:
+        print(
+            f"❌ Invalid status provided: '{status}'. Must be 'open', 'won', or 'lost'."
+        )
+        return False
+    return True
+
+
 def create_note_on_deal(deal_id: int, content: str):
     """
     Creates a new note associated with a specific deal ID in Pipedrive.
@@ -36,13 +306,20 @@ def create_note_on_deal(deal_id: int, content: str):
         dict: The API response from Pipedrive, or None if it failed.
     """
     try:
-        url = f"{BASE_URL}/notes"
-        params = {"api_token": API_TOKEN}
-        payload = {"content": content, "deal_id": deal_id}
-        response = requests.post(url, params=params, json=payload)
-        response.raise_for_status()
+        data = _write("POST", _note_request(deal_id, content))
         print(f"✅ Successfully created note on deal ID {deal_id}.")
-        return response.json().get("data")
+        return data
+    except Exception as e:
+        print(f"❌ Error creating note on deal ID {deal_id}: {e}")
+        return None
+
+
+async def acreate_note_on_deal(deal_id: int, content: str):
+    """Async version of `create_note_on_deal` (same arguments and return value)."""
+    try:
+        data = await _awrite("POST", _note_request(deal_id, content))
+        print(f"✅ Successfully created note on deal ID {deal_id}.")
+        return data
     except Exception as e:
         print(f"❌ Error creating note on deal ID {deal_id}: {e}")
         return None
@@ -59,23 +336,203 @@ def update_deal_status(deal_id: int, status: str):
     Returns:
         dict: The API response from Pipedrive, or None if it failed.
     """
-    if status not in ["open", "won", "lost"]:
-        print(
-            f"❌ Invalid status provided: '{status}'. Must be 'open', 'won', or 'lost'."
-        )
+    if not _check_status(status):
         return None
 
+    previous = _apply_locally(deal_id, status)
+    ok, data = False, None
     try:
-        url = f"{BASE_URL}/deals/{deal_id}"
-        params = {"api_token": API_TOKEN}
-        payload = {"status": status}
-        response = requests.put(url, params=params, json=payload)
-        response.raise_for_status()
+        data = _write("PUT", _status_request(deal_id, status))
+        ok = True
+        print(f"✅ Successfully updated status for deal ID {deal_id} to '{status}'.")
+        return data
+    except Exception as e:
+        print(f"❌ Error updating status for deal ID {deal_id}: {e}")
+        return None
+    finally:
+        _settle_locally(deal_id, previous, ok, data)
+
+
+async def aupdate_deal_status(deal_id: int, status: str):
+    """Async version of `update_deal_status` (same arguments and return value)."""
+    if not _check_status(status):
+        return None
+
+    previous = _apply_locally(deal_id, status)
+    ok, data = False, None
+    try:
+        data = await _awrite("PUT", _status_request(deal_id, status))
+        ok = True
         print(f"✅ Successfully updated status for deal ID {deal_id} to '{status}'.")
-        return response.json().get("data")
+        return data
     except Exception as e:
         print(f"❌ Error updating status for deal ID {deal_id}: {e}")
         return None
+    finally:
+        _settle_locally(deal_id, previous, ok, data)
+
+
+# --- Bulk writes ---
+# Pipedrive has no batch endpoint for notes or deal updates, so a bulk write is
+# one call per deal, with at most `max_workers` in flight and every call going
+# through the shared write rate limit.
+
+
+def _describe_error(error: Exception) -> str:
+    # HTTP errors are reduced to their status: their message contains the URL,
+    # and with it the API token.
+    response = getattr(error, "response", None)
+    if response is not None:
+        reason = getattr(response, "reason", None) or getattr(
+            response, "reason_phrase", ""
+        )
+        return f"HTTP {response.status_code} {reason}".strip()
+    return str(error)
+
+
+def _item_result(deal_id: int, data=None, error: Exception | None = None) -> dict:
+    if error is not None:
+        return {"deal_id": deal_id, "ok": False, "error": _describe_error(error)}
+    return {"deal_id": deal_id, "ok": True, "data": data}
+
+
+def _run_bulk(method: str, requests: list, max_workers: int) -> list[dict]:
+    @bind_priority
+    def run(item):
+        deal_id, request = item
+        if isinstance(request, Exception):
+            return _item_result(deal_id, error=request)
+        try:
+            return _item_result(deal_id, _write(method, request))
+        except Exception as e:
+            return _item_result(deal_id, error=e)
+
+    if not requests:
+        return []
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(max_workers, len(requests)))
+    ) as pool:
+        return list(pool.map(run, requests))
+
+
+async def _arun_bulk(method: str, requests: list, max_workers: int) -> list[dict]:
+    slots = asyncio.Semaphore(max(1, max_workers))
+
+    async def run(item):
+        deal_id, request = item
+        if isinstance(request, Exception):
+            return _item_result(deal_id, error=request)
+        async with slots:
+            try:
+                return _item_result(deal_id, await _awrite(method, request))
+            except Exception as e:
+                return _item_result(deal_id, error=e)
+
+    return list(await asyncio.gather(*(run(item) for item in requests)))
+
+
+def _summarize_bulk(action: str, results: list[dict]):
+    failed = [r for r in results if not r["ok"]]
+    icon = "✅" if not failed else "⚠️"
+    print(
+        f"{icon} Bulk {action}: {len(results) - len(failed)}/{len(results)} succeeded."
+    )
+    for result in failed:
+        print(f"❌ Deal ID {result['deal_id']}: {result['error']}")
+    return results
+
+
+def _status_requests(updates) -> list:
+    # An invalid status fails its item without calling Pipedrive.
+    return [
+        (
+            deal_id,
+            _status_request(deal_id, status)
+            if status in DEAL_STATUSES
+            else ValueError(f"Invalid status '{status}'"),
+        )
+        for deal_id, status in updates
+    ]
+
+
+def _apply_bulk_locally(updates) -> dict:
+    return {
+        deal_id: _apply_locally(deal_id, status)
+        for deal_id, status in updates
+        if status in DEAL_STATUSES
+    }
+
+
+def _settle_bulk_locally(results: list[dict], previous: dict) -> list[dict]:
+    for result in results:
+        deal_id = result["deal_id"]
+        if deal_id in previous:
+            _settle_locally(
+                deal_id, previous[deal_id], result["ok"], result.get("data")
+            )
+    return results
+
+
+def bulk_create_notes(
+    notes, max_workers: int = config.PIPEDRIVE_BULK_MAX_WORKERS
+) -> list[dict]:
+    """
+    Creates one note per (deal_id, content) pair.
+
+    Args:
+        notes: Iterable of (deal_id, content) tuples.
+        max_workers (int): Maximum number of requests in flight.
+
+    Returns:
+        list: One result per note, in input order:
+        {"deal_id", "ok": True, "data"} or {"deal_id", "ok": False, "error"}.
+    """
+    requests = [
+        (deal_id, _note_request(deal_id, content)) for deal_id, content in notes
+    ]
+    return _summarize_bulk("note creation", _run_bulk("POST", requests, max_workers))
+
+
+async def abulk_create_notes(
+    notes, max_workers: int = config.PIPEDRIVE_BULK_MAX_WORKERS
+) -> list[dict]:
+    """Async version of `bulk_create_notes` (same arguments and return value)."""
+    requests = [
+        (deal_id, _note_request(deal_id, content)) for deal_id, content in notes
+    ]
+    return _summarize_bulk(
+        "note creation", await _arun_bulk("POST", requests, max_workers)
+    )
+
+
+def bulk_update_deal_status(
+    updates, max_workers: int = config.PIPEDRIVE_BULK_MAX_WORKERS
+) -> list[dict]:
+    """
+    Sets the status of many deals.
+
+    Args:
+        updates: Iterable of (deal_id, status) tuples; status is 'open', 'won'
+            or 'lost' (other values fail without calling Pipedrive).
+        max_workers (int): Maximum number of requests in flight.
+
+    Returns:
+        list: One result per deal, in input order, like `bulk_create_notes`.
+    """
+    updates = list(updates)
+    previous = _apply_bulk_locally(updates)
+    results = _run_bulk("PUT", _status_requests(updates), max_workers)
+    return _summarize_bulk("status update", _settle_bulk_locally(results, previous))
+
+
+async def abulk_update_deal_status(
+    updates, max_workers: int = config.PIPEDRIVE_BULK_MAX_WORKERS
+) -> list[dict]:
+    """Async version of `bulk_update_deal_status` (same arguments and return value)."""
+    updates = list(updates)
+    previous = _apply_bulk_locally(updates)
+    results = await _arun_bulk("PUT", _status_requests(updates), max_workers)
+    return _summarize_bulk("status update", _settle_bulk_locally(results, previous))
 
 
 if __name__ == "__main__":
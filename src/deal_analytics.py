@@ -0,0 +1,396 @@
+import copy
+import datetime
+import threading
+
+import numpy as np
+
+from .deal_index import normalize_name
+from .deal_store import DealStore, get_deal_store
+from .registry import component
+
+# Deal columns a query can filter and group by.
+CATEGORY_COLUMNS = ("status", "owner_name", "org_name", "currency")
+DATE_COLUMNS = ("add_time", "update_time")
+# Groupings by the calendar period of the query's date column.
+TIME_BUCKETS = ("month", "quarter", "year")
+METRICS = ("count", "total_value", "average_value", "win_rate")
+VALUE_METRICS = ("total_value", "average_value")
+PERIODS = (
+    "this_month",
+    "last_month",
+    "this_quarter",
+    "last_quarter",
+    "this_year",
+    "last_year",
+)
+
+
+def _to_cents(values) -> np.ndarray:
+    values = np.array([value or 0 for value in values], dtype=np.float64)
+    return np.rint(values * 100).astype(np.int64)
+
+
+def _to_datetimes(values) -> np.ndarray:
+    # Pipedrive times look like "2024-05-01 13:45:00"; missing ones become NaT.
+    texts = [value.replace(" ", "T") if value else "NaT" for value in values]
+    try:
+        return np.array(texts, dtype="datetime64[s]")
+    except ValueError:
+        parsed = []
+        for text in texts:
+            try:
+                parsed.append(np.datetime64(text, "s"))
+            except ValueError:
+                parsed.append(np.datetime64("NaT", "s"))
+        return np.array(parsed, dtype="datetime64[s]")
+
+
+class DealColumns:
+    """
+    Every deal of the snapshot as NumPy columns, for aggregations: the
+    categorical fields as integer codes plus their distinct values, the deal
+    value as integer cents (so sums are exact) and the times as datetime64.
+    Deals removed since it was built are kept, but not `alive`.
+    """
+
+    def __init__(self, columns: dict):
+        self.ids = np.array(columns["id"], dtype=np.int64)
+        self.position = {deal_id: i for i, deal_id in enumerate(columns["id"])}
+        self.alive = np.ones(self.ids.size, dtype=bool)
+        self.size = self.ids.size
+        self.categories = {name: [] for name in CATEGORY_COLUMNS}
+        self._index = {name: {} for name in CATEGORY_COLUMNS}
+        self.codes = {
+            name: self._encode(name, columns[name]) for name in CATEGORY_COLUMNS
+        }
+        self.cents = _to_cents(columns["value"])
+        self.dates = {name: _to_datetimes(columns[name]) for name in DATE_COLUMNS}
+
+    def _encode(self, column: str, values) -> np.ndarray:
+        """Integer codes of the values, adding the new ones to the categories."""
+        index = self._index[column]
+        categories = self.categories[column]
+
+        def code(value):
+            value = value or ""
+            found = index.get(value)
+            if found is None:
+                found = index[value] = len(categories)
+                categories.append(value)
+            return found
+
+        return np.fromiter(map(code, values), dtype=np.int32, count=len(values))
+
+    def patched(self, columns: dict, deal_ids) -> "DealColumns":
+        """
+        A copy with the given deals replaced by `columns` (their current rows)
+        and the ones missing from it removed. Arrays are copied, not changed
+        in place, so queries running on this instance are not affected.
+        """
+        new = copy.copy(self)
+        new.categories = {name: list(v) for name, v in self.categories.items()}
+        new._index = {name: dict(v) for name, v in self._index.items()}
+        new.position = dict(self.position)
+
+        ids = np.array(columns["id"], dtype=np.int64)
+        positions = np.array(
+            [self.position.get(deal_id, -1) for deal_id in columns["id"]],
+            dtype=np.int64,
+        )
+        existing = positions >= 0
+        added = ids[~existing]
+        for i, deal_id in enumerate(added.tolist()):
+            new.position[deal_id] = self.ids.size + i
+
+        def merge(old: np.ndarray, values: np.ndarray) -> np.ndarray:
+            merged = np.concatenate([old, values[~existing]])
+            merged[positions[existing]] = values[existing]
+            return merged
+
+        new.ids = np.concatenate([self.ids, added])
+        new.codes = {
+            name: merge(self.codes[name], new._encode(name, columns[name]))
+            for name in CATEGORY_COLUMNS
+        }
+        new.cents = merge(self.cents, _to_cents(columns["value"]))
+        new.dates = {
+            name: merge(self.dates[name], _to_datetimes(columns[name]))
+            for name in DATE_COLUMNS
+        }
+        new.alive = np.concatenate([self.alive, np.ones(added.size, dtype=bool)])
+        new.alive[positions[existing]] = True
+        removed = [
+            self.position[deal_id]
+            for deal_id in set(deal_ids) - set(columns["id"])
+            if deal_id in self.position
+        ]
+        new.alive[removed] = False
+        new.size = int(np.count_nonzero(new.alive))
+        return new
+
+    def matching_codes(self, column: str, wanted) -> list:
+        """
+        Codes of the values of `column` equal to one of `wanted`, ignoring case.
+        A name that matches nothing exactly matches the values sharing its
+        words ("Acme" -> "Acme Corp"), so names need not be spelled in full.
+        """
+        categories = self.categories[column]
+        codes = []
+        for value in wanted:
+            exact = [
+                code
+                for code, category in enumerate(categories)
+                if category.lower() == value.lower()
+            ]
+            if not exact and column != "status":
+                tokens = set(normalize_name(value))
+                exact = [
+                    code
+                    for code, category in enumerate(categories)
+                    if tokens and tokens <= set(normalize_name(category))
+                ]
+            codes.extend(exact)
+        return codes
+
+    def member(self, column: str, wanted) -> np.ndarray:
+        """Mask of the deals whose `column` matches one of `wanted`."""
+        table = np.zeros(len(self.categories[column]), dtype=bool)
+        table[self.matching_codes(column, wanted)] = True
+        return table[self.codes[column]]
+
+
+def period_range(period: str, today: datetime.date | None = None) -> tuple:
+    """First day of the calendar period and first day after it."""
+    today = today or datetime.date.today()
+    if period.endswith("month"):
+        start = today.replace(day=1)
+        if period == "last_month":
+            start = (start - datetime.timedelta(days=1)).replace(day=1)
+        end = (start + datetime.timedelta(days=32)).replace(day=1)
+    elif period.endswith("quarter"):
+        start = today.replace(month=(today.month - 1) // 3 * 3 + 1, day=1)
+        if period == "last_quarter":
+            start = (start - datetime.timedelta(days=1)).replace(day=1)
+            start = start.replace(month=(start.month - 1) // 3 * 3 + 1)
+        end = (start + datetime.timedelta(days=92)).replace(day=1)
+    elif period.endswith("year"):
+        start = today.replace(month=1, day=1)
+        if period == "last_year":
+            start = start.replace(year=start.year - 1)
+        end = start.replace(year=start.year + 1)
+    else:
+        raise ValueError(f"Unknown period '{period}'.")
+    return start, end
+
+
+def _bucket(dates: np.ndarray, bucket: str) -> tuple:
+    """Codes of the calendar period of every date, and their labels."""
+    missing = np.isnat(dates)
+    if missing.all():
+        return np.zeros(dates.size, dtype=np.int64), ["unknown"]
+    months = dates.astype("datetime64[M]").astype(np.int64)
+    keys = months // {"month": 1, "quarter": 3, "year": 12}[bucket]
+    low, high = int(keys[~missing].min()), int(keys[~missing].max())
+    # Consecutive periods from the first to the last, then "unknown".
+    codes = np.where(missing, high - low + 1, keys - low)
+    labels = []
+    for key in range(low, high + 1):
+        if bucket == "month":
+            labels.append(f"{1970 + key // 12}-{key % 12 + 1:02d}")
+        elif bucket == "quarter":
+            labels.append(f"{1970 + key // 4}-Q{key % 4 + 1}")
+        else:
+            labels.append(str(1970 + key))
+    return codes, labels + ["unknown"]
+
+
+def _compact(keys: np.ndarray, span: int) -> tuple:
+    """Distinct keys (sorted) and the index of every key among them."""
+    if span <= 4 * keys.size + 65536:
+        # Dense key range: counting is cheaper than sorting.
+        distinct = np.flatnonzero(np.bincount(keys, minlength=span))
+        lookup = np.zeros(span, dtype=np.int64)
+        lookup[distinct] = np.arange(distinct.size)
+        return distinct, lookup[keys]
+    return np.unique(keys, return_inverse=True)
+
+
+def _group_sums(groups: np.ndarray, values: np.ndarray, count: int) -> np.ndarray:
+    """Exact per-group sums of integer values."""
+    if int(np.abs(values).sum()) < 2**53:
+        # Float64 adds integers exactly below 2**53, and bincount is fast.
+        return np.rint(np.bincount(groups, weights=values, minlength=count)).astype(
+            np.int64
+        )
+    sums = np.zeros(count, dtype=np.int64)
+    np.add.at(sums, groups, values)
+    return sums
+
+
+class DealAnalytics:
+    """
+    Group-by/filter/aggregate queries over all deals of the local deal
+    snapshot, computed with NumPy over a columnar copy of it. The copy is
+    rebuilt only when the snapshot has changed since the last query, so a
+    query over 100k deals takes milliseconds.
+    """
+
+    def __init__(self, store: DealStore):
+        self.store = store
+        self._lock = threading.Lock()
+        self._columns = None
+        self._version = None
+
+    def columns(self) -> DealColumns:
+        with self._lock:
+            version = self.store.version()
+            if self._columns is not None and version != self._version:
+                # Writes made through the copilot or the sync worker touch few
+                # deals; only those are read again.
+                changed = self.store.changes_since(self._version)
+                if changed is not None and len(changed) <= max(
+                    1000, self._columns.size // 10
+                ):
+                    self._columns = self._columns.patched(
+                        self.store.columns(deal_ids=changed), changed
+                    )
+                    self._version = version
+            if self._columns is None or version != self._version:
+                self._columns = DealColumns(self.store.columns())
+                self._version = version
+            return self._columns
+
+    def aggregate(
+        self,
+        metrics=("count", "total_value"),
+        group_by=(),
+        status=(),
+        owner_name: str | None = None,
+        org_name: str | None = None,
+        currency: str | None = None,
+        min_value: float | None = None,
+        max_value: float | None = None,
+        date_field: str = "add_time",
+        date_from: datetime.date | None = None,
+        date_to: datetime.date | None = None,
+        period: str | None = None,
+        order_by: str | None = None,
+        limit: int | None = None,
+    ) -> dict:
+        """
+        Aggregates the deals matching every given filter, per group.
+
+        `date_from` and `date_to` are inclusive; `period` (e.g.
+        "this_quarter") sets both. Value metrics are split by currency when
+        the matching deals use more than one, so sums never mix currencies.
+        Groups are ordered by `order_by` (default: the first metric, and
+        added to `metrics` if missing), largest first, or chronologically when grouped by time without
+        `order_by`; only the first `limit` are returned.
+
+        Returns:
+            dict: "matched" and "total" deal counts, the "group_by" columns,
+            the number of "groups" and the "rows" of (group labels,
+            {metric: value}).
+        """
+        metrics = list(metrics)
+        if order_by and order_by not in metrics:
+            metrics.append(order_by)
+        deals = self.columns()
+        mask = deals.alive.copy()
+        filters = {
+            "status": list(status or ()),
+            "owner_name": [owner_name] if owner_name else [],
+            "org_name": [org_name] if org_name else [],
+            "currency": [currency] if currency else [],
+        }
+        for column, wanted in filters.items():
+            if wanted:
+                mask &= deals.member(column, wanted)
+        if min_value is not None:
+            mask &= deals.cents >= round(min_value * 100)
+        if max_value is not None:
+            mask &= deals.cents <= round(max_value * 100)
+
+        dates = deals.dates[date_field]
+        if period:
+            date_from, date_to = period_range(period)
+            date_to -= datetime.timedelta(days=1)
+        if date_from:
+            mask &= dates >= np.datetime64(date_from, "s")
+        if date_to:
+            mask &= dates < np.datetime64(date_to + datetime.timedelta(days=1), "s")
+
+        selected = np.flatnonzero(mask)
+        group_by = list(group_by)
+        if (
+            any(metric in VALUE_METRICS for metric in metrics)
+            and "currency" not in group_by
+            and np.count_nonzero(np.bincount(deals.codes["currency"][selected])) > 1
+        ):
+            group_by.append("currency")
+
+        # One integer key per combination of group values, then compacted.
+        keys = np.zeros(selected.size, dtype=np.int64)
+        span = 1
+        labels = []
+        for column in group_by:
+            if column in TIME_BUCKETS:
+                codes, names = _bucket(dates[selected], column)
+            else:
+                codes = deals.codes[column][selected]
+                names = deals.categories[column]
+            keys = keys * len(names) + codes
+            span *= len(names)
+            labels.append(names)
+        distinct, groups = _compact(keys, span)
+        count = distinct.size
+
+        counts = np.bincount(groups, minlength=count)
+        results = {"count": counts}
+        if any(metric in VALUE_METRICS for metric in metrics):
+            totals = _group_sums(groups, deals.cents[selected], count)
+            results["total_value"] = totals / 100
+            results["average_value"] = totals / np.maximum(counts, 1) / 100
+        if "win_rate" in metrics:
+            won = deals.member("status", ["won"])[selected]
+            lost = deals.member("status", ["lost"])[selected]
+            won = np.bincount(groups, weights=won, minlength=count)
+            closed = won + np.bincount(groups, weights=lost, minlength=count)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                results["win_rate"] = np.where(closed > 0, won / closed, np.nan)
+
+        # Groups come out in key order: chronological for time buckets.
+        order = np.arange(count)
+        if order_by or not any(column in TIME_BUCKETS for column in group_by):
+            ranked = results[order_by or metrics[0]]
+            order = np.argsort(-np.nan_to_num(ranked, nan=-np.inf), kind="stable")
+        if limit is not None:
+            order = order[:limit]
+
+        rows = []
+        for i in order.tolist():
+            key = int(distinct[i])
+            parts = []
+            for names in reversed(labels):
+                key, code = divmod(key, len(names))
+                parts.append(names[code] or "(none)")
+            values = {
+                metric: results[metric][i].item()
+                for metric in METRICS
+                if metric in metrics
+            }
+            if values.get("win_rate") is not None and np.isnan(values["win_rate"]):
+                values["win_rate"] = None
+            rows.append((tuple(reversed(parts)), values))
+        return {
+            "matched": int(selected.size),
+            "total": deals.size,
+            "group_by": group_by,
+            "groups": count,
+            "rows": rows,
+        }
+
+
+@component
+def get_deal_analytics() -> DealAnalytics:
+    return DealAnalytics(get_deal_store())
@@ -0,0 +1,25 @@
+from langchain_core.documents import Document
+
+
+def format_deal_to_document(deal: dict) -> Document:
+    """
+    Turns a Pipedrive deal into the text document that is embedded and searched.
+    Shared by ingestion and by the tools that answer from local deal data.
+    """
+    content = (
+        f"Information about the CRM deal titled '{deal.get('title', 'N/A')}' "
+        f"with Deal ID: {deal.get('id', 0)}. "
+        f"The current status of this deal is '{deal.get('status', 'N/A')}'. "
+        f"It has a value of {deal.get('value', 0)} {deal.get('currency', '')}. "
+        f"The deal is owned by {deal.get('owner_name', 'N/A')}. "
+        f"The main contact person is {deal.get('person_name', 'N/A')} "
+        f"at the organization {deal.get('org_name', 'N/A')}."
+    )
+
+    metadata = {
+        "source": "pipedrive",
+        "deal_id": deal.get("id", 0),
+        "status": deal.get("status", "N/A"),
+        "value": deal.get("value", 0),
+    }
+    return Document(page_content=content, metadata=metadata)
@@ -0,0 +1,183 @@
+import difflib
+import json
+import os
+import re
+import threading
+
+from . import config
+
+# Deal fields kept in the index (enough to answer lookups without Pipedrive).
+DEAL_FIELDS = (
+    "id",
+    "title",
+    "status",
+    "value",
+    "currency",
+    "owner_name",
+    "person_name",
+    "org_name",
+    "update_time",
+)
+# Fields whose values can be used to find a deal by name.
+NAME_FIELDS = ("title", "org_name", "person_name")
+
+_DEAL_ID_PATTERN = re.compile(
+    r"\b(?:deal\s*(?:id|number|no\.?|#)?|id)\s*[:#]?\s*(\d+)\b", re.IGNORECASE
+)
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+# Legal-form suffixes and filler words that should not affect name matching.
+_IGNORED_TOKENS = {
+    "inc",
+    "llc",
+    "ltd",
+    "limited",
+    "corp",
+    "corporation",
+    "co",
+    "company",
+    "gmbh",
+    "ag",
+    "plc",
+    "sa",
+    "the",
+    "deal",
+    "deals",
+}
+
+
+def normalize_name(text: str) -> tuple[str, ...]:
+    """Lowercased word tokens of a name, without legal suffixes and filler words."""
+    tokens = _TOKEN_PATTERN.findall((text or "").lower())
+    return tuple(token for token in tokens if token not in _IGNORED_TOKENS)
+
+
+class DealIndex:
+    """
+    An in-memory lookup structure over deals, built at ingest time.
+
+    Deals are stored in a hash map keyed by deal ID. Their titles, organization
+    names and contact names are normalized into token tuples, and an inverted
+    token index maps each token to the deals that use it. A query like "deal
+    with EmpowerMove" is matched when every token of a deal's name appears in
+    the query. Small typos are corrected against the token vocabulary with
+    difflib.
+    """
+
+    def __init__(self):
+        self.deals = {}
+        self._names = {}
+        self._token_to_ids = {}
+
+    def __len__(self):
+        return len(self.deals)
+
+    def upsert(self, deals):
+        for deal in deals:
+            deal_id = deal.get("id")
+            if deal_id is None:
+                continue
+            self.remove([deal_id])
+            record = {
+                field: deal[field]
+                for field in DEAL_FIELDS
+                if deal.get(field) is not None
+            }
+            self.deals[deal_id] = record
+            names = {normalize_name(record.get(field)) for field in NAME_FIELDS}
+            names.discard(())
+            self._names[deal_id] = names
+            for name in names:
+                for token in name:
+                    self._token_to_ids.setdefault(token, set()).add(deal_id)
+
+    def remove(self, deal_ids):
+        for deal_id in deal_ids:
+            self.deals.pop(deal_id, None)
+            for name in self._names.pop(deal_id, ()):
+                for token in name:
+                    ids = self._token_to_ids.get(token)
+                    if ids is not None:
+                        ids.discard(deal_id)
+                        if not ids:
+                            del self._token_to_ids[token]
+
+    def get(self, deal_id: int):
+        return self.deals.get(deal_id)
+
+    def find_by_name(self, query: str, limit: int = 5) -> list[dict]:
+        """
+        Deals whose title, organization or contact name is fully contained in
+        the query, longest (most specific) names first.
+        """
+        query_tokens = set(normalize_name(query))
+        corrected = set()
+        for token in query_tokens:
+            if token in self._token_to_ids or len(token) < 4:
+                corrected.add(token)
+                continue
+            matches = difflib.get_close_matches(
+                token, self._token_to_ids.keys(), n=1, cutoff=0.85
+            )
+            corrected.add(matches[0] if matches else token)
+
+        candidates = set()
+        for token in corrected:
+            candidates |= self._token_to_ids.get(token, set())
+
+        scored = []
+        for deal_id in candidates:
+            best = 0
+            for name in self._names.get(deal_id, ()):
+                if set(name) <= corrected:
+                    best = max(best, len(name))
+            if best:
+                scored.append((best, deal_id))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [self.deals[deal_id] for _, deal_id in scored[:limit]]
+
+    def lookup(self, query: str, limit: int = 5) -> list[dict]:
+        """Resolves a free-text query to deals by explicit ID first, then by name."""
+        ids = [int(match) for match in _DEAL_ID_PATTERN.findall(query)]
+        if ids:
+            return [self.deals[i] for i in ids if i in self.deals][:limit]
+        return self.find_by_name(query, limit=limit)
+
+    # --- Persistence ---
+
+    def save(self, path: str = config.DEAL_INDEX_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(list(self.deals.values()), f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = config.DEAL_INDEX_PATH) -> "DealIndex":
+        """Loads a saved index, or returns an empty one if none exists yet."""
+        index = cls()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                index.upsert(json.load(f))
+        return index
+
+
+_shared_index = None
+_shared_index_mtime = None
+_shared_index_lock = threading.Lock()
+
+
+def get_deal_index() -> DealIndex:
+    """
+    Returns the process-wide deal index, reloading it from disk whenever
+    ingestion (usually a separate process) has written a newer version.
+    """
+    global _shared_index, _shared_index_mtime
+    path = config.DEAL_INDEX_PATH
+    mtime = os.path.getmtime(path) if os.path.exists(path) else None
+    if _shared_index is not None and mtime == _shared_index_mtime:
+        return _shared_index
+    with _shared_index_lock:
+        if _shared_index is None or mtime != _shared_index_mtime:
+            _shared_index = DealIndex.load(path)
+            _shared_index_mtime = mtime
+    return _shared_index
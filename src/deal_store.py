@@ -0,0 +1,420 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+
+from . import config
+from .registry import component
+from .scheduler import BACKGROUND, request_priority
+
+# Deal fields stored in their own (indexed or aggregated) columns; the whole
+# Pipedrive payload is kept as JSON next to them.
+COLUMNS = (
+    "id",
+    "title",
+    "status",
+    "value",
+    "currency",
+    "owner_name",
+    "person_name",
+    "org_name",
+    "add_time",
+    "update_time",
+)
+INDEXED_COLUMNS = ("org_name", "owner_name", "status", "update_time", "add_time")
+
+_UPSERT = (
+    f"INSERT INTO deals ({', '.join(COLUMNS)}, data) "
+    f"VALUES ({', '.join('?' for _ in COLUMNS)}, ?) "
+    "ON CONFLICT (id) DO UPDATE SET "
+    + ", ".join(f"{column} = excluded.{column}" for column in COLUMNS[1:] + ("data",))
+    # Deals with writes in flight keep their local copy until the writes
+    # settle, and a page fetched before a write must not overwrite the newer
+    # copy Pipedrive returned for it.
+    + " WHERE deals.pending = 0 AND (deals.update_time IS NULL"
+    " OR excluded.update_time IS NULL OR excluded.update_time >= deals.update_time)"
+)
+
+_REPLACE = (
+    f"INSERT OR REPLACE INTO deals ({', '.join(COLUMNS)}, data, pending) "
+    f"VALUES ({', '.join('?' for _ in COLUMNS)}, ?, ?)"
+)
+
+
+def _row(deal: dict) -> tuple:
+    return tuple(deal.get(column) for column in COLUMNS) + (
+        json.dumps(deal, default=str),
+    )
+
+
+class DealStore:
+    """
+    Local, read-optimized snapshot of the Pipedrive deals, stored in SQLite
+    with indexes on id, organization, owner, status and update/add time.
+
+    It is kept fresh by a DealSyncWorker polling Pipedrive for changes, and
+    records when it was last synced, so readers can decide whether the
+    snapshot is recent enough or Pipedrive has to be asked (see
+    crm_connector). Writes made through the copilot are applied to it
+    optimistically before Pipedrive confirms them.
+    """
+
+    def __init__(self, path: str = config.DEAL_STORE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.RLock()
+        # Writes made through this instance, and the deal IDs touched by the
+        # latest ones; see version() and changes_since().
+        self._writes = 0
+        self._change_log = deque(maxlen=256)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS deals ("
+            " id INTEGER PRIMARY KEY, title TEXT, status TEXT, value REAL,"
+            " currency TEXT, owner_name TEXT, person_name TEXT, org_name TEXT,"
+            " add_time TEXT, update_time TEXT, data TEXT NOT NULL,"
+            " pending INTEGER NOT NULL DEFAULT 0)"
+        )
+        # Stores created before writes were tracked lack the pending column.
+        if "pending" not in {
+            row[1] for row in self._db.execute("PRAGMA table_info(deals)")
+        }:
+            self._db.execute(
+                "ALTER TABLE deals ADD COLUMN pending INTEGER NOT NULL DEFAULT 0"
+            )
+        for column in INDEXED_COLUMNS:
+            self._db.execute(
+                f"CREATE INDEX IF NOT EXISTS deals_{column} ON deals ({column})"
+            )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        self._db.commit()
+
+    # --- Reads ---
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM deals").fetchone()[0]
+
+    def get(self, deal_id: int):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data FROM deals WHERE id = ?", (deal_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_many(self, deal_ids) -> dict:
+        deal_ids = list(deal_ids)
+        found = {}
+        with self._lock:
+            # Chunked to stay under SQLite's limit on bound parameters.
+            for i in range(0, len(deal_ids), 500):
+                chunk = deal_ids[i : i + 500]
+                rows = self._db.execute(
+                    f"SELECT id, data FROM deals WHERE id IN "
+                    f"({', '.join('?' for _ in chunk)})",
+                    chunk,
+                ).fetchall()
+                found.update((deal_id, json.loads(data)) for deal_id, data in rows)
+        return found
+
+    def query(
+        self,
+        status: str | None = None,
+        owner_name: str | None = None,
+        org_name: str | None = None,
+        order_by: str = "add_time",
+        limit: int | None = None,
+    ) -> list[dict]:
+        """Deals matching every given field, newest `order_by` first."""
+        if order_by not in INDEXED_COLUMNS:
+            raise ValueError(f"Cannot order deals by '{order_by}'.")
+        filters = {"status": status, "owner_name": owner_name, "org_name": org_name}
+        where = [f"{column} = ?" for column, value in filters.items() if value]
+        params = [value for value in filters.values() if value]
+        sql = "SELECT data FROM deals"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {order_by} DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def columns(self, names=COLUMNS, deal_ids=None) -> dict:
+        """
+        Every deal (or the given ones that exist) as columns: {name: list of
+        values}, in deal ID order.
+        """
+        unknown = set(names) - set(COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown deal columns: {sorted(unknown)}")
+        sql = f"SELECT {', '.join(names)} FROM deals"
+        with self._lock:
+            if deal_ids is None:
+                rows = self._db.execute(sql + " ORDER BY id").fetchall()
+            else:
+                deal_ids = sorted(deal_ids)
+                rows = []
+                for i in range(0, len(deal_ids), 500):
+                    chunk = deal_ids[i : i + 500]
+                    rows += self._db.execute(
+                        f"{sql} WHERE id IN ({', '.join('?' for _ in chunk)})"
+                        " ORDER BY id",
+                        chunk,
+                    ).fetchall()
+        return {name: [row[i] for row in rows] for i, name in enumerate(names)}
+
+    def version(self) -> tuple:
+        """Changes whenever the deals change, in this process or another one."""
+        with self._lock:
+            # data_version only moves on commits made by other connections.
+            data_version = self._db.execute("PRAGMA data_version").fetchone()[0]
+            return self._writes, data_version
+
+    def changes_since(self, version: tuple):
+        """
+        IDs of the deals written since `version` (from version()), or None
+        when they are not known: written by another process, or too many
+        writes ago.
+        """
+        writes, data_version = version
+        with self._lock:
+            if self.version()[1] != data_version:
+                return None
+            if writes == self._writes:
+                return set()
+            if not self._change_log or self._change_log[0][0] > writes + 1:
+                return None
+            return {
+                deal_id
+                for write, deal_ids in self._change_log
+                if write > writes
+                for deal_id in deal_ids
+            }
+
+    def ids(self) -> set:
+        with self._lock:
+            return {row[0] for row in self._db.execute("SELECT id FROM deals")}
+
+    # --- Writes ---
+
+    def upsert(self, deals):
+        rows = [_row(deal) for deal in deals if deal.get("id") is not None]
+        if not rows:
+            return
+        with self._lock:
+            self._db.executemany(_UPSERT, rows)
+            self._db.commit()
+            self._changed(row[0] for row in rows)
+
+    def remove(self, deal_ids):
+        rows = [(deal_id,) for deal_id in deal_ids]
+        if not rows:
+            return
+        with self._lock:
+            self._db.executemany("DELETE FROM deals WHERE id = ?", rows)
+            self._db.commit()
+            self._changed(row[0] for row in rows)
+
+    def apply_local(self, deal_id: int, fields: dict):
+        """
+        Applies a write to the local copy of a deal before Pipedrive has
+        confirmed it, and marks the write as pending: syncs leave the deal
+        alone until `settle_local` or `revert_local` is called. Returns the
+        previous copy (None if the deal is not in the store, in which case
+        nothing is changed) for them.
+        """
+        with self._lock:
+            previous, pending = self._get_pending(deal_id)
+            if previous is not None:
+                # update_time is left as it is; Pipedrive's reply sets it.
+                self._replace({**previous, **fields}, pending + 1)
+        return previous
+
+    def settle_local(self, deal_id: int, previous, data=None):
+        """
+        Ends a write `apply_local` marked as pending, after Pipedrive has
+        confirmed it, storing the copy of the deal it returned (if any).
+        """
+        if previous is None:
+            if data is not None:
+                self.upsert([data])
+            return
+        with self._lock:
+            current, pending = self._get_pending(deal_id)
+            if current is None:
+                return
+            self._replace(data or current, max(pending - 1, 0))
+
+    def revert_local(self, deal_id: int, previous):
+        """
+        Ends a write `apply_local` marked as pending, after it failed, and
+        restores the copy it returned unless another write has settled since.
+        """
+        if previous is None:
+            return
+        with self._lock:
+            current, pending = self._get_pending(deal_id)
+            if current is None:
+                return
+            # apply_local keeps update_time, so a different update_time means
+            # another write has stored Pipedrive's copy since; keep that one.
+            if pending <= 1 and current.get("update_time") == previous.get(
+                "update_time"
+            ):
+                current = previous
+            self._replace(current, max(pending - 1, 0))
+
+    def _get_pending(self, deal_id: int):
+        """The stored copy of a deal (or None) and its number of pending writes."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data, pending FROM deals WHERE id = ?", (deal_id,)
+            ).fetchone()
+        return (json.loads(row[0]), row[1]) if row else (None, 0)
+
+    def _replace(self, deal: dict, pending: int = 0):
+        with self._lock:
+            self._db.execute(_REPLACE, _row(deal) + (pending,))
+            self._db.commit()
+            self._changed([deal["id"]])
+
+    def _changed(self, deal_ids):
+        self._writes += 1
+        self._change_log.append((self._writes, tuple(deal_ids)))
+
+    # --- Freshness ---
+
+    def _get_meta(self, key: str):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM meta WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, values: dict):
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                list(values.items()),
+            )
+            self._db.commit()
+
+    def get_watermark(self):
+        """The latest deal update_time seen by a completed sync, or None."""
+        return self._get_meta("watermark")
+
+    def mark_synced(self, watermark: str | None = None):
+        """Records a completed sync, now, and advances the watermark."""
+        values = {"synced_at": repr(time.time())}
+        current = self.get_watermark()
+        if watermark and (current is None or watermark > current):
+            values["watermark"] = watermark
+        self._set_meta(values)
+
+    def age(self) -> float:
+        """Seconds since the last completed sync (infinite before the first)."""
+        synced_at = self._get_meta("synced_at")
+        return time.time() - float(synced_at) if synced_at else float("inf")
+
+    def is_fresh(self, max_staleness: float | None = None) -> bool:
+        if max_staleness is None:
+            max_staleness = config.DEAL_STORE_MAX_STALENESS_SECONDS
+        return self.age() <= max_staleness
+
+
+@component
+def get_deal_store() -> DealStore:
+    return DealStore()
+
+
+class DealSyncWorker:
+    """
+    Background thread keeping a DealStore in sync with Pipedrive: a full
+    export when the store has never been synced, then, every `interval`
+    seconds, only the deals changed (or deleted) since the watermark. Its
+    Pipedrive calls run at background priority, so they wait behind chat
+    requests when the quota is short.
+    """
+
+    def __init__(self, store: DealStore, interval: float):
+        self.store = store
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sync_once(self) -> dict:
+        """Runs one sync. Returns the number of deals updated and removed."""
+        from .crm_connector import iter_all_deals, iter_deal_changes
+
+        with request_priority(BACKGROUND):
+            since = self.store.get_watermark()
+            if since is None:
+                return self._full_sync(iter_all_deals())
+            updated, removed = [], []
+            watermark = since
+            for deal_id, deal in iter_deal_changes(since):
+                if deal is None:
+                    removed.append(deal_id)
+                    continue
+                updated.append(deal)
+                watermark = max(watermark, deal.get("update_time") or watermark)
+            self.store.upsert(updated)
+            self.store.remove(removed)
+            self.store.mark_synced(watermark)
+            return {"updated": len(updated), "removed": len(removed)}
+
+    def _full_sync(self, deals) -> dict:
+        seen = set()
+        watermark = None
+        batch = []
+        for deal in deals:
+            seen.add(deal.get("id"))
+            update_time = deal.get("update_time")
+            if update_time and (watermark or "") < update_time:
+                watermark = update_time
+            batch.append(deal)
+            if len(batch) >= 500:
+                self.store.upsert(batch)
+                batch = []
+        self.store.upsert(batch)
+        gone = self.store.ids() - seen
+        self.store.remove(gone)
+        self.store.mark_synced(watermark)
+        return {"updated": len(seen), "removed": len(gone)}
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                stats = self.sync_once()
+                if stats["updated"] or stats["removed"]:
+                    print(
+                        f"🔄 Deal store synced: {stats['updated']} updated, "
+                        f"{stats['removed']} removed."
+                    )
+            except Exception as e:
+                print(f"⚠️ Deal store sync failed: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+
+def start_deal_sync(
+    interval: float = config.DEAL_STORE_SYNC_INTERVAL_SECONDS,
+) -> DealSyncWorker:
+    """Starts the background sync of the process-wide deal store."""
+    return DealSyncWorker(get_deal_store(), interval).start()
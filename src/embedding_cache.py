@@ -0,0 +1,283 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+from . import config, metrics, tracing
+
+# Hits are recorded in memory and written to the last_used column in batches
+# of this many keys (and before eviction), so lookups do not write to disk.
+RECENCY_FLUSH_ITEMS = 256
+
+
+def cache_key(model_name: str, text: str) -> str:
+    """Content address of an embedding: a hash of the model name and the text."""
+    digest = hashlib.sha256()
+    digest.update(model_name.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(text.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class CachedEmbeddings:
+    """
+    Wraps an embedding client with a two-tier, content-addressed cache.
+
+    Vectors are keyed by (model name, text hash). The first tier is an in-memory
+    LRU of float32 arrays; the second is a SQLite file that survives restarts,
+    so re-running ingestion over unchanged deals costs no embedding calls. The
+    disk tier is trimmed by least-recent use once it grows past `max_disk_bytes`;
+    its last-use times are updated in batches, not on every hit.
+    """
+
+    def __init__(
+        self,
+        embedder,
+        model_name: str,
+        path: str = config.EMBEDDING_CACHE_PATH,
+        memory_items: int = config.EMBEDDING_CACHE_MEMORY_ITEMS,
+        max_disk_bytes: int = config.EMBEDDING_CACHE_MAX_MB * 1024 * 1024,
+    ):
+        self.embedder = embedder
+        self.model_name = model_name
+        self.path = path
+        self.memory_items = max(0, memory_items)
+        self.max_disk_bytes = max_disk_bytes
+
+        self._memory = OrderedDict()
+        # {key: time} of hits not yet written to the disk tier's last_used.
+        self._recent = {}
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings(last_used)"
+        )
+        self._db.commit()
+        self._disk_bytes = self._db.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()[0]
+
+    # --- Memory tier ---
+
+    def _memory_get(self, key):
+        vector = self._memory.get(key)
+        if vector is not None:
+            self._memory.move_to_end(key)
+        return vector
+
+    def _memory_put(self, key, vector):
+        if not self.memory_items:
+            return
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    # --- Disk tier ---
+
+    def _select(self, columns: str, keys: list[str]) -> list[tuple]:
+        rows = []
+        # Stay well below SQLite's bound-parameter limit.
+        for i in range(0, len(keys), 500):
+            chunk = keys[i : i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows += self._db.execute(
+                f"SELECT {columns} FROM embeddings WHERE key IN ({placeholders})",
+                chunk,
+            ).fetchall()
+        return rows
+
+    def _disk_get_many(self, keys: list[str]) -> dict:
+        found = {}
+        for key, blob in self._select("key, vector", keys):
+            vector = array("f")
+            vector.frombytes(blob)
+            found[key] = vector
+        return found
+
+    def _touch(self, keys):
+        """Records a use of `keys`; written to disk once enough have piled up."""
+        now = time.time()
+        for key in keys:
+            self._recent[key] = now
+        if len(self._recent) >= RECENCY_FLUSH_ITEMS:
+            self._flush_recency()
+            self._db.commit()
+
+    def _flush_recency(self):
+        """Writes the recorded uses to last_used; the caller commits."""
+        if self._recent:
+            self._db.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                [(used, key) for key, used in self._recent.items()],
+            )
+            self._recent.clear()
+
+    def _disk_put_many(self, items: dict):
+        now = time.time()
+        rows = [(key, self.model_name, v.tobytes(), now) for key, v in items.items()]
+        # Keys stored meanwhile (by another thread or process) are replaced.
+        replaced = sum(
+            length for (length,) in self._select("LENGTH(vector)", list(items))
+        )
+        self._db.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, model, vector, last_used) "
+            "VALUES (?, ?, ?, ?)",
+            rows,
+        )
+        self._flush_recency()
+        self._db.commit()
+        self._disk_bytes += sum(len(row[2]) for row in rows) - replaced
+        if self._disk_bytes > self.max_disk_bytes:
+            self._evict_disk()
+
+    def _evict_disk(self):
+        """Deletes least-recently-used rows until the store is at 90% of its cap."""
+        self._flush_recency()
+        target = int(self.max_disk_bytes * 0.9)
+        size = self._db.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()[0]
+        rows = self._db.execute(
+            "SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_used"
+        ).fetchall()
+        to_delete = []
+        for key, length in rows:
+            if size <= target:
+                break
+            to_delete.append((key,))
+            size -= length
+        self._db.executemany("DELETE FROM embeddings WHERE key = ?", to_delete)
+        self._db.commit()
+        self._disk_bytes = size
+        print(f"--- Embedding cache evicted {len(to_delete)} entries from disk ---")
+
+    # --- Embedding interface ---
+
+    def _lookup(self, texts: list[str]):
+        """
+        Looks `texts` up in both tiers.
+
+        Returns:
+            tuple: The cache keys, the vectors found, the keys served from
+            memory and from disk, and {key: text} of distinct missing texts.
+        """
+        keys = [cache_key(self.model_name, text) for text in texts]
+        vectors = {}
+
+        with self._lock:
+            for key in keys:
+                vector = self._memory_get(key)
+                if vector is not None:
+                    vectors[key] = vector
+            memory_keys = set(vectors)
+
+            disk_keys = set()
+            pending = [key for key in dict.fromkeys(keys) if key not in vectors]
+            if pending:
+                for key, vector in self._disk_get_many(pending).items():
+                    vectors[key] = vector
+                    disk_keys.add(key)
+                    self._memory_put(key, vector)
+            if vectors:
+                self._touch(vectors)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors and key not in missing:
+                missing[key] = text
+        return keys, vectors, memory_keys, disk_keys, missing
+
+    def _store(self, missing: dict, new_vectors, vectors: dict):
+        fresh = {key: array("f", vector) for key, vector in zip(missing, new_vectors)}
+        with self._lock:
+            self._disk_put_many(fresh)
+            for key, vector in fresh.items():
+                self._memory_put(key, vector)
+        vectors.update(fresh)
+
+    def _finish(self, keys, vectors, memory_keys, disk_keys) -> list[list[float]]:
+        with self._lock:
+            memory_hits, disk_hits = self.memory_hits, self.disk_hits
+            for key in keys:
+                if key in memory_keys:
+                    self.memory_hits += 1
+                elif key in disk_keys:
+                    self.disk_hits += 1
+                else:
+                    self.misses += 1
+            memory_hits = self.memory_hits - memory_hits
+            disk_hits = self.disk_hits - disk_hits
+        misses = len(keys) - memory_hits - disk_hits
+        for result, count in (
+            ("memory_hit", memory_hits),
+            ("disk_hit", disk_hits),
+            ("miss", misses),
+        ):
+            if count:
+                metrics.EMBEDDING_CACHE.inc(count, result=result)
+
+        return [vectors[key].tolist() for key in keys]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """Returns embeddings for `texts`, calling the wrapped client only on misses."""
+        with tracing.span("embedding cache", tracing.EMBEDDING) as span:
+            keys, vectors, memory_keys, disk_keys, missing = self._lookup(texts)
+            span.set(texts=len(texts), misses=len(missing))
+            # Embed each distinct missing text once, outside the lock.
+            if missing:
+                new_vectors = self.embedder.embed_documents(list(missing.values()))
+                self._store(missing, new_vectors, vectors)
+            return self._finish(keys, vectors, memory_keys, disk_keys)
+
+    def embed_query(self, text: str) -> list[float]:
+        """Handles embedding a single text (query)."""
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        """Async version of `embed_documents` (SQLite work runs in a thread)."""
+        with tracing.span("embedding cache", tracing.EMBEDDING) as span:
+            keys, vectors, memory_keys, disk_keys, missing = await asyncio.to_thread(
+                self._lookup, texts
+            )
+            span.set(texts=len(texts), misses=len(missing))
+            if missing:
+                new_vectors = await self.embedder.aembed_documents(
+                    list(missing.values())
+                )
+                await asyncio.to_thread(self._store, missing, new_vectors, vectors)
+            return self._finish(keys, vectors, memory_keys, disk_keys)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return (await self.aembed_documents([text]))[0]
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters for both cache tiers."""
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_items": len(self._memory),
+                "disk_bytes": self._disk_bytes,
+            }
@@ -1,8 +1,21 @@
-import requests
+import asyncio
 import json
+from concurrent.futures import ThreadPoolExecutor
 
 # from src import config
-from . import config
+from . import config, http_client, metrics, tracing
+from .embedding_cache import CachedEmbeddings
+from .registry import component
+from .scheduler import bind_priority
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate used for batching (roughly 4 characters per token).
+    It only needs to be conservative enough to keep requests under the
+    server's payload limits, not exact.
+    """
+    return len(text) // 4 + 1
 
 
 # This custom class bypasses the problematic LangChain client and makes a direct,
@@ -11,16 +24,52 @@ class DirectNebiusEmbeddings:
     """
     A custom embedding client that makes a direct API call to a Nebius
     OpenAI-compatible endpoint.
+
+    Large inputs are split into micro-batches bounded by item count and by an
+    estimated token budget. Up to `max_concurrency` batches are in flight at
+    once, http_client retries each batch on its own if it fails, and the
+    embeddings are returned in the same order as the input texts.
     """
 
-    def __init__(self, model_name, api_key, api_base):
+    def __init__(
+        self,
+        model_name,
+        api_key,
+        api_base,
+        batch_size: int = config.EMBEDDING_BATCH_SIZE,
+        max_batch_tokens: int = config.EMBEDDING_MAX_BATCH_TOKENS,
+        max_concurrency: int = config.EMBEDDING_MAX_CONCURRENCY,
+    ):
         self.model_name = model_name
         self.api_key = api_key
         # Ensure the URL is correctly formed for the /embeddings endpoint
         self.url = f"{api_base.rstrip('/')}/embeddings"
+        self.batch_size = max(1, batch_size)
+        self.max_batch_tokens = max(1, max_batch_tokens)
+        self.max_concurrency = max(1, max_concurrency)
 
-    def embed_documents(self, texts: list[str]) -> list[list[float]]:
-        """Handles embedding a list of texts."""
+    def _make_batches(self, texts: list[str]) -> list[list[int]]:
+        """Groups input positions into batches that respect both size limits."""
+        batches = []
+        current = []
+        current_tokens = 0
+        for i, text in enumerate(texts):
+            tokens = estimate_tokens(text)
+            if current and (
+                len(current) >= self.batch_size
+                or current_tokens + tokens > self.max_batch_tokens
+            ):
+                batches.append(current)
+                current = []
+                current_tokens = 0
+            # A single oversized text still gets its own batch.
+            current.append(i)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    def _request_kwargs(self, texts: list[str]) -> dict:
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
@@ -28,29 +77,119 @@ class DirectNebiusEmbeddings:
 
         payload = {"input": texts, "model": self.model_name}
 
-        # We print the URL we are about to call for final debugging
-        print(f"--- Making direct API call to: {self.url} ---")
-        response = requests.post(self.url, headers=headers, data=json.dumps(payload))
+        # Embedding requests have no side effects, so they are safe to retry.
+        return {
+            "headers": headers,
+            "data": json.dumps(payload),
+            "retry_non_idempotent": True,
+            "endpoint": "nebius_embeddings",
+        }
 
+    @staticmethod
+    def _parse_response(response, count: int) -> list[list[float]]:
         # This will raise an error if the request failed
         response.raise_for_status()
 
         response_data = response.json()
 
-        embeddings = [item["embedding"] for item in response_data["data"]]
+        # OpenAI-compatible servers return an index per item; don't rely on order.
+        items = sorted(response_data["data"], key=lambda item: item.get("index", 0))
+        embeddings = [item["embedding"] for item in items]
+        if len(embeddings) != count:
+            raise ValueError(
+                f"Expected {count} embeddings from the server, got {len(embeddings)}."
+            )
         return embeddings
 
+    def _embed_batch(self, texts: list[str]) -> list[list[float]]:
+        """
+        Sends one batch to the /embeddings endpoint. http_client retries it on
+        its own with jittered backoff (honoring Retry-After) if it fails.
+        """
+        response = http_client.request("POST", self.url, **self._request_kwargs(texts))
+        return self._parse_response(response, len(texts))
+
+    async def _aembed_batch(self, texts: list[str]) -> list[list[float]]:
+        response = await http_client.arequest(
+            "POST", self.url, **self._request_kwargs(texts)
+        )
+        return self._parse_response(response, len(texts))
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """Handles embedding a list of texts."""
+        if not texts:
+            return []
+
+        batches = self._make_batches(texts)
+
+        # We print the URL we are about to call for final debugging
+        print(
+            f"--- Making direct API call to: {self.url} "
+            f"({len(texts)} texts in {len(batches)} batches) ---"
+        )
+
+        span = tracing.span(
+            self.model_name, tracing.EMBEDDING, texts=len(texts), batches=len(batches)
+        )
+        with metrics.STAGE_SECONDS.time(stage="embedding"), span:
+            if len(batches) == 1:
+                return self._embed_batch(texts)
+
+            embeddings = [None] * len(texts)
+            workers = min(self.max_concurrency, len(batches))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                embed_batch = bind_priority(self._embed_batch)
+                results = pool.map(
+                    lambda batch: embed_batch([texts[i] for i in batch]), batches
+                )
+                for batch, batch_embeddings in zip(batches, results):
+                    for i, embedding in zip(batch, batch_embeddings):
+                        embeddings[i] = embedding
+            return embeddings
+
     def embed_query(self, text: str) -> list[float]:
         """Handles embedding a single text (query)."""
         return self.embed_documents([text])[0]
 
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        """Async version of `embed_documents`; batches run as concurrent tasks."""
+        if not texts:
+            return []
+
+        batches = self._make_batches(texts)
+        slots = asyncio.Semaphore(self.max_concurrency)
+
+        async def embed(batch):
+            async with slots:
+                return await self._aembed_batch([texts[i] for i in batch])
+
+        span = tracing.span(
+            self.model_name, tracing.EMBEDDING, texts=len(texts), batches=len(batches)
+        )
+        with metrics.STAGE_SECONDS.time(stage="embedding"), span:
+            results = await asyncio.gather(*(embed(batch) for batch in batches))
+        embeddings = [None] * len(texts)
+        for batch, batch_embeddings in zip(batches, results):
+            for i, embedding in zip(batch, batch_embeddings):
+                embeddings[i] = embedding
+        return embeddings
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return (await self.aembed_documents([text]))[0]
+
 
+@component
 def get_embedding_model():
     """
-    This function now returns our reliable, direct client.
+    This function now returns our reliable, direct client, wrapped in the
+    persistent embedding cache unless EMBEDDING_CACHE_ENABLED is turned off.
+    The client is created on first use and shared by every caller.
     """
-    return DirectNebiusEmbeddings(
+    client = DirectNebiusEmbeddings(
         model_name=config.EMBEDDING_MODEL_NAME,
         api_key=config.NEBIUS_API_KEY,
         api_base=config.NEBIUS_API_BASE,
     )
+    if not config.EMBEDDING_CACHE_ENABLED:
+        return client
+    return CachedEmbeddings(client, model_name=config.EMBEDDING_MODEL_NAME)
@@ -0,0 +1,240 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from . import config
+
+AGENTS = ("Sales Agent", "Marketing Agent", "Service Agent")
+
+# Tier 1: keyword rules. A rule set only decides when exactly one agent matches.
+KEYWORD_RULES = {
+    "Sales Agent": re.compile(
+        r"\b(deals?|notes?|status|pipeline|won|lost|value|worth|owner|owns|"
+        r"contacts?|crm|stage|close date|win rate|id\s*#?\d+)\b",
+        re.IGNORECASE,
+    ),
+    "Marketing Agent": re.compile(
+        r"\b(blog|outline|marketing|newsletter|campaign|social media|"
+        r"linkedin|tweet|landing page|press release|promotional)\b",
+        re.IGNORECASE,
+    ),
+    "Service Agent": re.compile(
+        r"\b(customer'?s?|complaint|complaining|invoice|refund|support ticket|"
+        r"apologi[sz]e|apology|reply to|respond to|polite response)\b",
+        re.IGNORECASE,
+    ),
+}
+
+# A request about an explicit deal ID is always a CRM operation.
+_DEAL_ID_RULE = re.compile(r"\bdeal\s*(?:id\s*)?#?\d+\b", re.IGNORECASE)
+
+# Tier 2: labeled example utterances; each agent is represented by the centroid
+# of their embeddings.
+ROUTING_EXAMPLES = {
+    "Sales Agent": [
+        "What is the value of the deal with Acme Corp?",
+        "Show me the details of deal ID 42",
+        "Who is the owner of the Global Logistics deal?",
+        "Which deals are still open?",
+        "Add a note to deal 7 saying the client wants a discount",
+        "Mark deal 15 as won",
+        "Update the status of the Innovate Tech deal to lost",
+        "Who is the contact person for the EmpowerMove opportunity?",
+        "How much is the Northwind opportunity worth?",
+        "Log a note that we sent the contract",
+        "What is the total value of open deals by owner?",
+        "What is our win rate this quarter?",
+    ],
+    "Marketing Agent": [
+        "Draft a blog post outline about AI in sales",
+        "Write a marketing email announcing our new analytics feature",
+        "Create an outline for an article on customer retention",
+        "Write a promotional email for our spring webinar",
+        "Give me ideas for a newsletter about product updates",
+        "Draft a campaign email for our enterprise plan",
+        "Write a blog post about the benefits of automation",
+        "Create marketing copy for our new integration",
+    ],
+    "Service Agent": [
+        "Draft a polite response to a customer asking about an invoice delay",
+        "Reply to a customer who is unhappy with our support",
+        "Write a response to a client complaining about a late delivery",
+        "Help me answer a customer asking for a refund",
+        "Respond to a customer who cannot log in to their account",
+        "Draft an apology to a customer for the service outage",
+        "How should I reply to a customer asking about pricing changes?",
+        "Write a friendly answer to a customer question about onboarding",
+    ],
+}
+
+
+def normalize_utterance(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+class FastRouter:
+    """
+    Tiered intent router in front of the supervisor LLM.
+
+    1. Route cache: repeated utterances reuse their earlier decision.
+    2. Keyword rules: decide when the rules of exactly one agent match.
+    3. Nearest centroid: the utterance embedding is compared with the centroid
+       of each agent's example embeddings. The best agent is used when its
+       cosine score is at least `min_score` and beats the runner-up by at least
+       `min_margin`.
+    4. Otherwise the decision is escalated to the supervisor LLM (`escalate`).
+
+    The example embeddings go through the shared embedding client, so with the
+    embedding cache enabled they are only ever computed once.
+    """
+
+    def __init__(
+        self,
+        embedder,
+        escalate,
+        examples: dict = ROUTING_EXAMPLES,
+        rules: dict = KEYWORD_RULES,
+        min_score: float = config.FAST_ROUTER_MIN_SCORE,
+        min_margin: float = config.FAST_ROUTER_MIN_MARGIN,
+        cache_size: int = config.FAST_ROUTER_CACHE_SIZE,
+    ):
+        self.embedder = embedder
+        self.escalate = escalate
+        self.examples = examples
+        self.rules = rules
+        self.min_score = min_score
+        self.min_margin = min_margin
+        self.cache_size = cache_size
+
+        self._lock = threading.Lock()
+        self._centroids = None
+        self._labels = None
+        self._cache = OrderedDict()
+        self.decisions = {"cache": 0, "rules": 0, "embedding": 0, "llm": 0}
+        self.local_seconds = 0.0
+
+    def _get_centroids(self):
+        with self._lock:
+            if self._centroids is None:
+                labels = list(self.examples)
+                texts = [text for label in labels for text in self.examples[label]]
+                vectors = np.asarray(self.embedder.embed_documents(texts), np.float32)
+                vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+                centroids = []
+                start = 0
+                for label in labels:
+                    end = start + len(self.examples[label])
+                    centroid = vectors[start:end].mean(axis=0)
+                    centroids.append(centroid / np.linalg.norm(centroid))
+                    start = end
+                self._labels = labels
+                self._centroids = np.vstack(centroids)
+            return self._centroids, self._labels
+
+    def prepare(self):
+        """Embeds the labeled examples now instead of on the first ambiguous request."""
+        self._get_centroids()
+
+    def classify_by_rules(self, text: str):
+        """Returns the only agent whose keyword rules match, or None."""
+        if _DEAL_ID_RULE.search(text):
+            return "Sales Agent"
+        matched = [agent for agent, rule in self.rules.items() if rule.search(text)]
+        return matched[0] if len(matched) == 1 else None
+
+    def classify_by_embedding(self, text: str):
+        """
+        Returns:
+            tuple: (agent or None if not confident, best score, margin).
+        """
+        return self.classify_vector(self.embedder.embed_query(text))
+
+    def classify_vector(self, embedding):
+        """Nearest-centroid decision for an already embedded utterance."""
+        centroids, labels = self._get_centroids()
+        query = np.asarray(embedding, dtype=np.float32)
+        scores = centroids @ (query / (np.linalg.norm(query) or 1.0))
+        order = np.argsort(-scores)
+        best = float(scores[order[0]])
+        margin = best - float(scores[order[1]]) if len(order) > 1 else best
+        if best >= self.min_score and margin >= self.min_margin:
+            return labels[order[0]], best, margin
+        return None, best, margin
+
+    def _cached_or_rules(self, key: str, text: str):
+        with self._lock:
+            agent = self._cache.get(key)
+            if agent is not None:
+                self._cache.move_to_end(key)
+                return agent, "cache"
+        return self.classify_by_rules(text), "rules"
+
+    def _record(self, key: str, agent: str, tier: str, local_seconds: float):
+        with self._lock:
+            self.decisions[tier] += 1
+            self.local_seconds += local_seconds
+            if tier != "cache" and agent in AGENTS:
+                self._cache[key] = agent
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+    def route(self, text: str) -> tuple[str, str]:
+        """
+        Picks the agent for an utterance.
+
+        Returns:
+            tuple: The agent name (or "FINISH") and the tier that decided it:
+            "cache", "rules", "embedding" or "llm".
+        """
+        start = time.perf_counter()
+        key = normalize_utterance(text)
+        agent, tier = self._cached_or_rules(key, text)
+        if agent is None:
+            tier = "embedding"
+            try:
+                agent, _, _ = self.classify_by_embedding(text)
+            except Exception as e:
+                print(f"⚠️ Embedding router unavailable, escalating to the LLM: {e}")
+                agent = None
+        local_seconds = time.perf_counter() - start
+        if agent is None:
+            tier = "llm"
+            agent = self.escalate(text)
+        self._record(key, agent, tier, local_seconds)
+        return agent, tier
+
+    async def aroute(self, text: str, aescalate) -> tuple[str, str]:
+        """Async version of `route`; `aescalate` is the async LLM fallback."""
+        start = time.perf_counter()
+        key = normalize_utterance(text)
+        agent, tier = self._cached_or_rules(key, text)
+        if agent is None:
+            tier = "embedding"
+            try:
+                embedding = await self.embedder.aembed_query(text)
+                agent, _, _ = self.classify_vector(embedding)
+            except Exception as e:
+                print(f"⚠️ Embedding router unavailable, escalating to the LLM: {e}")
+                agent = None
+        local_seconds = time.perf_counter() - start
+        if agent is None:
+            tier = "llm"
+            agent = await aescalate(text)
+        self._record(key, agent, tier, local_seconds)
+        return agent, tier
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = sum(self.decisions.values())
+            avoided = total - self.decisions["llm"]
+            return {
+                **self.decisions,
+                "llm_calls_avoided": avoided,
+                "avoided_rate": round(avoided / total, 4) if total else 0.0,
+                "avg_local_ms": round(1000 * self.local_seconds / total, 3)
+                if total
+                else 0.0,
+            }
@@ -0,0 +1,314 @@
+import asyncio
+import random
+import threading
+import time
+import weakref
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import config, metrics, tracing
+from .scheduler import get_scheduler
+
+# Status codes that indicate a transient problem worth retrying.
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+# Status codes for which the server guarantees it did not process the request,
+# so even non-idempotent calls (POST) can be retried safely.
+SAFE_RETRY_STATUS_CODES = {429, 503}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+# Async clients are bound to the event loop they were created in.
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_session(url: str) -> requests.Session:
+    """
+    Returns the shared keep-alive session for the host of the given URL.
+
+    Each scheme+host gets its own session with a dedicated connection pool, so
+    repeated calls to Pipedrive or Nebius reuse open TCP/TLS connections instead
+    of doing a new handshake per request.
+    """
+    parts = urlsplit(url)
+    host_key = _host_key(url)
+
+    session = _sessions.get(host_key)
+    if session is not None:
+        return session
+
+    with _sessions_lock:
+        session = _sessions.get(host_key)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=config.HTTP_POOL_MAXSIZE,
+                max_retries=0,
+            )
+            session.mount(f"{parts.scheme}://", adapter)
+            _sessions[host_key] = session
+    return session
+
+
+def close_sessions():
+    """Closes every pooled session (e.g. on shutdown or in a forked worker)."""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+def _host_key(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def get_async_client(url: str) -> httpx.AsyncClient:
+    """
+    Returns the shared keep-alive httpx.AsyncClient for the host of the given URL
+    in the running event loop. Up to HTTP_ASYNC_MAX_CONNECTIONS requests to the
+    host can be in flight at once; the rest wait for a free connection.
+    """
+    loop = asyncio.get_running_loop()
+    clients = _async_clients.setdefault(loop, {})
+    host_key = _host_key(url)
+    client = clients.get(host_key)
+    if client is None:
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=config.HTTP_ASYNC_MAX_CONNECTIONS,
+                max_keepalive_connections=config.HTTP_POOL_MAXSIZE,
+            ),
+        )
+        clients[host_key] = client
+    return client
+
+
+async def aclose_clients():
+    """Closes the async clients of the running event loop."""
+    clients = _async_clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.aclose()
+
+
+def _retry_after_seconds(response):
+    """Parses a Retry-After header given either in seconds or as an HTTP date."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def _backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter for the given (0-based) retry attempt."""
+    ceiling = min(config.HTTP_BACKOFF_MAX, config.HTTP_BACKOFF_BASE * (2**attempt))
+    return random.uniform(0, ceiling)
+
+
+def _retry_delay(method: str, url: str, response, attempt: int, max_retries: int):
+    """Seconds to wait before retrying after a retryable response."""
+    delay = _retry_after_seconds(response)
+    if delay is None:
+        delay = _backoff_delay(attempt)
+    else:
+        delay = min(delay, config.HTTP_RETRY_AFTER_MAX)
+    print(
+        f"⚠️ {method} {urlsplit(url).netloc} returned {response.status_code}, "
+        f"retrying in {delay:.2f}s (attempt {attempt + 1}/{max_retries})."
+    )
+    return delay
+
+
+class _Observation:
+    """
+    Traces one request with all its attempts, and records its latency and
+    final status (or "error" when it raised) in the metrics.
+    """
+
+    def __init__(self, method: str, url: str, endpoint: str):
+        parts = urlsplit(url)
+        self.endpoint = endpoint or "other"
+        self.status = "error"
+        # Only the path is recorded: query strings can carry credentials.
+        self._span = tracing.span(
+            f"{method} {parts.netloc}", tracing.HTTP, path=parts.path, endpoint=endpoint
+        )
+
+    def __enter__(self):
+        self.span = self._span.__enter__()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        metrics.HTTP_SECONDS.observe(
+            time.perf_counter() - self.start, endpoint=self.endpoint
+        )
+        metrics.HTTP_RESPONSES.inc(endpoint=self.endpoint, status=self.status)
+        return self._span.__exit__(*exc_info)
+
+    def finish(self, response, attempts: int, rate_limit_wait: float):
+        self.status = str(response.status_code)
+        self.span.set(
+            status_code=response.status_code,
+            attempts=attempts,
+            rate_limit_wait_ms=round(1000 * rate_limit_wait, 1),
+        )
+
+
+def _retry_policy(method: str, max_retries, retry_non_idempotent: bool):
+    """Returns (max_retries, whether errors are retryable, retryable statuses)."""
+    if max_retries is None:
+        max_retries = config.HTTP_MAX_RETRIES
+    retryable = retry_non_idempotent or method in IDEMPOTENT_METHODS
+    retry_statuses = RETRY_STATUS_CODES if retryable else SAFE_RETRY_STATUS_CODES
+    return max_retries, retryable, retry_statuses
+
+
+def request(
+    method: str,
+    url: str,
+    *,
+    timeout=None,
+    max_retries: int | None = None,
+    retry_non_idempotent: bool = False,
+    endpoint: str | None = None,
+    **kwargs,
+) -> requests.Response:
+    """
+    Sends an HTTP request through the pooled session for the target host.
+
+    Transient failures (429/5xx responses, connection errors and timeouts) are
+    retried with jittered exponential backoff, honoring the server's Retry-After
+    header when present. POST requests are only retried on responses that
+    guarantee the request was not processed (429/503), unless
+    `retry_non_idempotent` is set.
+
+    Args:
+        method (str): The HTTP method, e.g. "GET".
+        url (str): The full request URL.
+        timeout: A (connect, read) tuple or a single number of seconds. Defaults
+            to the configured HTTP_CONNECT_TIMEOUT / HTTP_READ_TIMEOUT.
+        max_retries (int): Overrides the configured HTTP_MAX_RETRIES.
+        retry_non_idempotent (bool): Treat the call as safe to repeat.
+        endpoint (str): Name of the rate scheduler (see src/scheduler.py) every
+            attempt waits on before it is sent, e.g. "pipedrive".
+        **kwargs: Passed through to `requests.Session.request`.
+
+    Returns:
+        requests.Response: The final response. Callers are still expected to call
+        `raise_for_status()`.
+    """
+    method = method.upper()
+    if timeout is None:
+        timeout = (config.HTTP_CONNECT_TIMEOUT, config.HTTP_READ_TIMEOUT)
+    max_retries, retryable, retry_statuses = _retry_policy(
+        method, max_retries, retry_non_idempotent
+    )
+
+    session = get_session(url)
+    scheduler = get_scheduler(endpoint) if endpoint else None
+    attempt = 0
+    rate_limit_wait = 0.0
+    with _Observation(method, url, endpoint) as observation:
+        while True:
+            if scheduler is not None:
+                waited = time.perf_counter()
+                scheduler.acquire()
+                rate_limit_wait += time.perf_counter() - waited
+            try:
+                response = session.request(method, url, timeout=timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if not retryable or attempt >= max_retries:
+                    raise
+                time.sleep(_backoff_delay(attempt))
+                attempt += 1
+                continue
+
+            if response.status_code not in retry_statuses or attempt >= max_retries:
+                observation.finish(response, attempt + 1, rate_limit_wait)
+                return response
+
+            delay = _retry_delay(method, url, response, attempt, max_retries)
+            response.close()
+            time.sleep(delay)
+            attempt += 1
+
+
+async def arequest(
+    method: str,
+    url: str,
+    *,
+    timeout=None,
+    max_retries: int | None = None,
+    retry_non_idempotent: bool = False,
+    endpoint: str | None = None,
+    **kwargs,
+) -> httpx.Response:
+    """
+    Async counterpart of `request()` with the same retry behavior, sent through
+    the shared httpx.AsyncClient of the target host. Waiting (for the server or
+    for a backoff) never blocks the event loop.
+
+    Args:
+        timeout: A (connect, read) tuple or a single number of seconds.
+        endpoint (str): Name of the rate scheduler to wait on, as in `request()`.
+        **kwargs: Passed through to `httpx.AsyncClient.request` (params, json,
+            data, headers, ...).
+
+    Returns:
+        httpx.Response: The final response. Callers are still expected to call
+        `raise_for_status()`.
+    """
+    method = method.upper()
+    if timeout is None:
+        timeout = (config.HTTP_CONNECT_TIMEOUT, config.HTTP_READ_TIMEOUT)
+    if isinstance(timeout, tuple):
+        connect_timeout, read_timeout = timeout
+        timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+    # httpx expects raw bodies as `content`.
+    if isinstance(kwargs.get("data"), (str, bytes)):
+        kwargs["content"] = kwargs.pop("data")
+    max_retries, retryable, retry_statuses = _retry_policy(
+        method, max_retries, retry_non_idempotent
+    )
+
+    client = get_async_client(url)
+    scheduler = get_scheduler(endpoint) if endpoint else None
+    attempt = 0
+    rate_limit_wait = 0.0
+    with _Observation(method, url, endpoint) as observation:
+        while True:
+            if scheduler is not None:
+                waited = time.perf_counter()
+                await scheduler.aacquire()
+                rate_limit_wait += time.perf_counter() - waited
+            try:
+                response = await client.request(method, url, timeout=timeout, **kwargs)
+            except httpx.TransportError:
+                if not retryable or attempt >= max_retries:
+                    raise
+                await asyncio.sleep(_backoff_delay(attempt))
+                attempt += 1
+                continue
+
+            if response.status_code not in retry_statuses or attempt >= max_retries:
+                observation.finish(response, attempt + 1, rate_limit_wait)
+                return response
+
+            delay = _retry_delay(method, url, response, attempt, max_retries)
+            await response.aclose()
+            await asyncio.sleep(delay)
+            attempt += 1
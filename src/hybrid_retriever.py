@@ -0,0 +1,175 @@
+import asyncio
+import math
+import re
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from . import config
+from .deal_documents import format_deal_to_document
+from .deal_index import get_deal_index
+from .scheduler import bind_priority
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Shared pool for running the two retrieval arms side by side.
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hybrid-retriever")
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a fixed list of documents, backed by an inverted index
+    (token -> list of (document position, term frequency)).
+    """
+
+    def __init__(self, documents: list[Document], k1: float = 1.5, b: float = 0.75):
+        self.documents = documents
+        self.k1 = k1
+        self.b = b
+        self.postings = {}
+        self.doc_lengths = []
+        for position, document in enumerate(documents):
+            counts = Counter(tokenize(document.page_content))
+            self.doc_lengths.append(sum(counts.values()))
+            for token, tf in counts.items():
+                self.postings.setdefault(token, []).append((position, tf))
+        n = len(documents)
+        self.avg_length = (sum(self.doc_lengths) / n) if n else 0.0
+        self.idf = {
+            token: math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            for token, docs in self.postings.items()
+        }
+
+    def search(self, query: str, k: int = 4) -> list[tuple[Document, float]]:
+        scores = {}
+        for token in set(tokenize(query)):
+            idf = self.idf.get(token)
+            if idf is None:
+                continue
+            for position, tf in self.postings[token]:
+                length_norm = (
+                    1
+                    - self.b
+                    + self.b * self.doc_lengths[position] / (self.avg_length or 1.0)
+                )
+                score = idf * tf * (self.k1 + 1) / (tf + self.k1 * length_norm)
+                scores[position] = scores.get(position, 0.0) + score
+        best = sorted(scores.items(), key=lambda item: -item[1])[:k]
+        return [(self.documents[position], score) for position, score in best]
+
+
+_bm25_cache = {"source": None, "index": None}
+_bm25_lock = threading.Lock()
+
+
+def get_deal_bm25_index() -> BM25Index:
+    """
+    BM25 index over the same documents ingestion embeds (one per deal in the
+    local deal index). It is rebuilt only when the deal index is reloaded.
+    """
+    deal_index = get_deal_index()
+    if _bm25_cache["source"] is deal_index:
+        return _bm25_cache["index"]
+    with _bm25_lock:
+        if _bm25_cache["source"] is not deal_index:
+            documents = [
+                format_deal_to_document(deal) for deal in deal_index.deals.values()
+            ]
+            _bm25_cache["index"] = BM25Index(documents)
+            _bm25_cache["source"] = deal_index
+    return _bm25_cache["index"]
+
+
+class DealBM25Retriever(BaseRetriever):
+    """Keyword retriever over the local deal documents."""
+
+    k: int = 4
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        return [doc for doc, _ in get_deal_bm25_index().search(query, k=self.k)]
+
+
+def _fusion_key(document: Document):
+    # Several chunks of the same deal count as one hit.
+    deal_id = document.metadata.get("deal_id")
+    return ("deal", deal_id) if deal_id is not None else ("text", document.page_content)
+
+
+def reciprocal_rank_fusion(
+    result_lists: list[list[Document]], k: int, rrf_k: int = 60
+) -> list[Document]:
+    """Merges ranked lists by summing 1 / (rrf_k + rank) for every appearance."""
+    scores = {}
+    first_seen = {}
+    for results in result_lists:
+        for rank, document in enumerate(results, start=1):
+            key = _fusion_key(document)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            first_seen.setdefault(key, document)
+    ranked = sorted(scores, key=lambda key: -scores[key])[:k]
+    return [first_seen[key] for key in ranked]
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Runs a dense (vector) retriever and a BM25 keyword retriever concurrently
+    and fuses their rankings with reciprocal-rank fusion. Keyword matching
+    recovers exact company names and deal IDs that dense search tends to miss,
+    so fewer documents need to be sent to the LLM.
+    """
+
+    vector_retriever: BaseRetriever
+    keyword_retriever: BaseRetriever
+    k: int = 4
+    rrf_k: int = 60
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        callbacks = run_manager.get_child()
+        # Run at the caller's priority and inside its trace span.
+        vector_future = _executor.submit(
+            bind_priority(self.vector_retriever.invoke), query, {"callbacks": callbacks}
+        )
+        keyword_docs = self.keyword_retriever.invoke(query, {"callbacks": callbacks})
+        return reciprocal_rank_fusion(
+            [vector_future.result(), keyword_docs], k=self.k, rrf_k=self.rrf_k
+        )
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager):
+        callbacks = run_manager.get_child()
+        vector_docs, keyword_docs = await asyncio.gather(
+            self.vector_retriever.ainvoke(query, {"callbacks": callbacks}),
+            self.keyword_retriever.ainvoke(query, {"callbacks": callbacks}),
+        )
+        return reciprocal_rank_fusion(
+            [vector_docs, keyword_docs], k=self.k, rrf_k=self.rrf_k
+        )
+
+
+def get_retriever(vectorstore) -> BaseRetriever:
+    """
+    Returns the retriever used by the RAG chain: hybrid BM25 + vector search by
+    default, or plain vector search if RAG_RETRIEVAL_MODE is "vector".
+    """
+    vector_retriever = vectorstore.as_retriever(
+        search_kwargs={"k": config.RAG_VECTOR_K}
+    )
+    if config.RAG_RETRIEVAL_MODE != "hybrid":
+        return vector_retriever
+    return HybridRetriever(
+        vector_retriever=vector_retriever,
+        keyword_retriever=DealBM25Retriever(k=config.RAG_BM25_K),
+        k=config.RAG_FUSED_K,
+        rrf_k=config.RAG_RRF_K,
+    )
@@ -1,13 +1,26 @@
-from langchain_openai import ChatOpenAI
-
 # import config
 from . import config
+from .registry import component
+from .scheduler import SchedulerRateLimiter, get_scheduler
+
+# Tag for LLM calls whose output is shown to the user verbatim. Their tokens are
+# streamed to the chat UI as they are generated (see supervisor.astream_reply).
+USER_FACING_TAG = "user_facing"
 
 
-def get_llm(temperature: float = 0.0):
+def get_llm(temperature: float = 0.0, model_name: str | None = None):
     """
-    Initializes and returns the LLM client configured for Nebius AI Studio.
+    Returns the LLM client configured for Nebius AI Studio.
+
+    Clients are created on first use and shared per (model, temperature), so
+    every chain and agent asking for the same settings reuses one client and
+    its connection pool.
     """
+    return _build_llm(model_name or config.LLM_MODEL_NAME, float(temperature))
+
+
+@component
+def _build_llm(model_name: str, temperature: float):
     # --- START DEBUGGING BLOCK ---
     print("--- Debugging Information ---")
     print(f"Attempting to connect to API Base: '{config.NEBIUS_API_BASE}'")
@@ -16,17 +29,25 @@ def get_llm(temperature: float = 0.0):
         print(f"Using API Key starting with: '{config.NEBIUS_API_KEY[:8]}...'")
     else:
         print("API Key is NOT loaded.")
-    print(f"Using Model Name: '{config.LLM_MODEL_NAME}'")
+    print(f"Using Model Name: '{model_name}' (temperature={temperature})")
     print("---------------------------")
     # --- END DEBUGGING BLOCK ---
 
+    # Imported here rather than at module level: the OpenAI SDK takes most of a
+    # second to import, which every process would otherwise pay at startup.
+    from langchain_openai import ChatOpenAI
+
     # This works because Nebius provides an OpenAI-compatible API endpoint.
     llm = ChatOpenAI(
         # Using the latest parameter names for consistency
-        model_name=config.LLM_MODEL_NAME,
+        model_name=model_name,
         openai_api_key=config.NEBIUS_API_KEY,
         openai_api_base=config.NEBIUS_API_BASE,
         temperature=temperature,
+        # Ask for token usage on streamed completions too (it is traced).
+        stream_usage=True,
+        # Every chat completion waits for a token of the Nebius LLM quota.
+        rate_limiter=SchedulerRateLimiter(get_scheduler("nebius_llm")),
     )
     return llm
 
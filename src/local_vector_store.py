@@ -0,0 +1,377 @@
+import json
+import os
+import uuid
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from . import config
+from .ann_index import IVFIndex, _normalize, _top_k
+
+# Metadata fields kept as NumPy columns so filters on them are vectorized.
+INDEXED_FIELDS = ("deal_id", "status", "value")
+
+_COMPARATORS = {
+    "$eq": np.equal,
+    "$ne": np.not_equal,
+    "$gt": np.greater,
+    "$gte": np.greater_equal,
+    "$lt": np.less,
+    "$lte": np.less_equal,
+}
+
+
+class LocalVectorStore(VectorStore):
+    """
+    An in-process vector store built on NumPy, usable instead of Pinecone.
+
+    Vectors live in one contiguous float32 matrix and are L2-normalized when they
+    are inserted, so cosine similarity is a single matrix-vector product and top-k
+    selection uses `argpartition`. Metadata filters use a subset of Pinecone's
+    syntax (`{"status": "open"}`, `{"value": {"$gte": 1000}}`, `$in`, `$nin`,
+    `$and`, `$or`) and are vectorized for the deal_id/status/value fields.
+
+    The store is persisted to a directory: `vectors.npy` is memory-mapped on load
+    (copy-on-write, so the file is only changed by `persist()`), and the ids,
+    texts and metadata are kept in `records.json`.
+
+    For large collections an IVF approximate index can be built with
+    `build_ann_index()`. It is used for searches as long as the store has not
+    been modified since the index was built; otherwise search falls back to the
+    exact scan.
+    """
+
+    def __init__(self, embedding, persist_path: str | None = None):
+        self.embedding = embedding
+        self.persist_path = persist_path
+        self.ann_nprobe = config.LOCAL_ANN_NPROBE
+        self.ann_rerank = config.LOCAL_ANN_RERANK
+        self._reset()
+
+    def _reset(self):
+        # Bumped on every write so a stale ANN index is never used.
+        self._revision = getattr(self, "_revision", 0) + 1
+        self.ann_index = None
+        self._matrix = None
+        self._size = 0
+        self._ids = []
+        self._id_to_row = {}
+        self._texts = []
+        self._metadatas = []
+        self._columns = {field: [] for field in INDEXED_FIELDS}
+        self._column_cache = None
+
+    @property
+    def embeddings(self):
+        return self.embedding
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """The normalized float32 vectors currently stored (a view, not a copy)."""
+        if self._matrix is None:
+            return np.zeros((0, 0), dtype=np.float32)
+        return self._matrix[: self._size]
+
+    # --- Writes ---
+
+    def _ensure_capacity(self, dim: int, extra: int):
+        if self._matrix is None:
+            self._matrix = np.zeros((max(extra, 1024), dim), dtype=np.float32)
+            return
+        if self._matrix.shape[1] != dim:
+            raise ValueError(
+                f"Vector dimension {dim} does not match the store ({self._matrix.shape[1]})."
+            )
+        needed = self._size + extra
+        if needed > self._matrix.shape[0] or not self._matrix.flags.writeable:
+            capacity = max(needed, self._matrix.shape[0] * 2)
+            grown = np.zeros((capacity, dim), dtype=np.float32)
+            grown[: self._size] = self._matrix[: self._size]
+            self._matrix = grown
+
+    def add_vectors(self, vectors, texts, metadatas=None, ids=None) -> list[str]:
+        """Inserts (or overwrites, for existing ids) precomputed embeddings."""
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+        metadatas = metadatas or [{} for _ in texts]
+        ids = list(ids) if ids else [str(uuid.uuid4()) for _ in texts]
+        self._ensure_capacity(vectors.shape[1], len(ids))
+
+        for vector, text, metadata, doc_id in zip(vectors, texts, metadatas, ids):
+            row = self._id_to_row.get(doc_id)
+            if row is None:
+                row = self._size
+                self._size += 1
+                self._id_to_row[doc_id] = row
+                self._ids.append(doc_id)
+                self._texts.append(text)
+                self._metadatas.append(dict(metadata))
+                for field in INDEXED_FIELDS:
+                    self._columns[field].append(metadata.get(field))
+            else:
+                self._texts[row] = text
+                self._metadatas[row] = dict(metadata)
+                for field in INDEXED_FIELDS:
+                    self._columns[field][row] = metadata.get(field)
+            self._matrix[row] = vector
+        self._column_cache = None
+        self._revision += 1
+        return ids
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs) -> list[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        vectors = self.embedding.embed_documents(texts)
+        return self.add_vectors(vectors, texts, metadatas, ids)
+
+    def delete(self, ids=None, delete_all: bool = False, **kwargs):
+        """Deletes vectors by id (or everything). Rows are compacted in place."""
+        if delete_all:
+            self._reset()
+            return True
+        for doc_id in ids or []:
+            row = self._id_to_row.pop(doc_id, None)
+            if row is None:
+                continue
+            last = self._size - 1
+            if row != last:
+                # Move the last row into the hole to keep the matrix contiguous.
+                self._matrix[row] = self._matrix[last]
+                moved_id = self._ids[last]
+                self._ids[row] = moved_id
+                self._id_to_row[moved_id] = row
+                self._texts[row] = self._texts[last]
+                self._metadatas[row] = self._metadatas[last]
+                for field in INDEXED_FIELDS:
+                    self._columns[field][row] = self._columns[field][last]
+            self._ids.pop()
+            self._texts.pop()
+            self._metadatas.pop()
+            for field in INDEXED_FIELDS:
+                self._columns[field].pop()
+            self._size -= 1
+        self._column_cache = None
+        self._revision += 1
+        return True
+
+    def get_by_ids(self, ids) -> list[Document]:
+        rows = [self._id_to_row[i] for i in ids if i in self._id_to_row]
+        return [self._document(row) for row in rows]
+
+    # --- Filters ---
+
+    def _column(self, field: str) -> np.ndarray:
+        if self._column_cache is None:
+            self._column_cache = {}
+        column = self._column_cache.get(field)
+        if column is None:
+            if field in self._columns:
+                values = self._columns[field]
+            else:
+                values = [metadata.get(field) for metadata in self._metadatas]
+            column = np.array(values, dtype=object)
+            if all(
+                isinstance(v, (int, float)) and not isinstance(v, bool) for v in values
+            ):
+                column = column.astype(np.float64)
+            self._column_cache[field] = column
+        return column
+
+    def _filter_mask(self, filter: dict) -> np.ndarray:
+        mask = np.ones(self._size, dtype=bool)
+        for key, condition in filter.items():
+            if key == "$and":
+                for sub in condition:
+                    mask &= self._filter_mask(sub)
+                continue
+            if key == "$or":
+                any_mask = np.zeros(self._size, dtype=bool)
+                for sub in condition:
+                    any_mask |= self._filter_mask(sub)
+                mask &= any_mask
+                continue
+
+            column = self._column(key)
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for op, value in condition.items():
+                if op == "$in":
+                    mask &= np.isin(column, list(value))
+                elif op == "$nin":
+                    mask &= ~np.isin(column, list(value))
+                elif op in _COMPARATORS:
+                    try:
+                        mask &= _COMPARATORS[op](column, value).astype(bool)
+                    except TypeError:
+                        mask &= np.array(
+                            [_safe_compare(op, v, value) for v in column], dtype=bool
+                        )
+                else:
+                    raise ValueError(f"Unsupported filter operator: {op}")
+        return mask
+
+    # --- Search ---
+
+    def _document(self, row: int) -> Document:
+        return Document(
+            id=self._ids[row],
+            page_content=self._texts[row],
+            metadata=self._metadatas[row],
+        )
+
+    def search_vectors(self, queries, k: int = 4, filter: dict | None = None):
+        """
+        Batched cosine top-k for one or more query vectors.
+
+        Returns:
+            list: One list of (row, score) pairs per query, best first.
+        """
+        queries = _normalize(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        if not self._size:
+            return [[] for _ in queries]
+
+        mask = self._filter_mask(filter) if filter else None
+        if mask is not None and not mask.any():
+            return [[] for _ in queries]
+
+        index = self.ann_index
+        # A very selective filter is cheaper (and exact) as a direct scan.
+        if (
+            index is not None
+            and index.revision == self._revision
+            and (mask is None or mask.sum() > config.LOCAL_ANN_EXACT_THRESHOLD)
+        ):
+            return index.search(
+                queries,
+                k=k,
+                nprobe=self.ann_nprobe,
+                rerank=self.ann_rerank,
+                exact_vectors=self.vectors,
+                allowed=mask,
+            )
+
+        candidates = None
+        matrix = self.vectors
+        if mask is not None:
+            candidates = np.flatnonzero(mask)
+            matrix = matrix[candidates]
+
+        scores = queries @ matrix.T
+        results = []
+        for query_scores in scores:
+            best = _top_k(query_scores, k)
+            rows = candidates[best] if candidates is not None else best
+            results.append(list(zip(rows.tolist(), query_scores[best].tolist())))
+        return results
+
+    def build_ann_index(
+        self,
+        nlist: int = config.LOCAL_ANN_NLIST,
+        dtype: str = config.LOCAL_ANN_DTYPE,
+    ) -> IVFIndex:
+        """Builds (or rebuilds) the IVF index over the current vectors."""
+        self.ann_index = IVFIndex.build(
+            self.vectors, nlist=nlist or None, dtype=dtype, revision=self._revision
+        )
+        return self.ann_index
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4, filter=None):
+        (hits,) = self.search_vectors([embedding], k=k, filter=filter)
+        return [(self._document(row), score) for row, score in hits]
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None, **kwargs):
+        hits = self.similarity_search_with_score_by_vector(embedding, k, filter)
+        return [doc for doc, _ in hits]
+
+    def similarity_search_with_score(self, query, k=4, filter=None, **kwargs):
+        embedding = self.embedding.embed_query(query)
+        return self.similarity_search_with_score_by_vector(embedding, k, filter)
+
+    def similarity_search(self, query, k=4, filter=None, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    async def asimilarity_search_with_score(self, query, k=4, filter=None, **kwargs):
+        # Only the query embedding involves I/O; the search itself is in-memory.
+        embedding = await self.embedding.aembed_query(query)
+        return self.similarity_search_with_score_by_vector(embedding, k, filter)
+
+    async def asimilarity_search(self, query, k=4, filter=None, **kwargs):
+        hits = await self.asimilarity_search_with_score(query, k, filter)
+        return [doc for doc, _ in hits]
+
+    def _select_relevance_score_fn(self):
+        # Cosine similarity in [-1, 1] mapped to a [0, 1] relevance score.
+        return lambda score: min(1.0, max(0.0, (score + 1.0) / 2.0))
+
+    # --- Persistence ---
+
+    def persist(self, path: str | None = None):
+        """Writes the store to `path` (or the path it was loaded from)."""
+        path = path or self.persist_path
+        if not path:
+            raise ValueError("No persist_path configured for the local vector store.")
+        os.makedirs(path, exist_ok=True)
+
+        vectors_tmp = os.path.join(path, "vectors.tmp.npy")
+        records_tmp = os.path.join(path, "records.tmp.json")
+        np.save(vectors_tmp, np.ascontiguousarray(self.vectors))
+        with open(records_tmp, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "ids": self._ids,
+                    "texts": self._texts,
+                    "metadatas": self._metadatas,
+                    "revision": self._revision,
+                },
+                f,
+            )
+        # Swap both files in only once they are completely written.
+        os.replace(vectors_tmp, os.path.join(path, "vectors.npy"))
+        os.replace(records_tmp, os.path.join(path, "records.json"))
+        if self.ann_index is not None and self.ann_index.revision == self._revision:
+            self.ann_index.save(os.path.join(path, "ann"))
+        self.persist_path = path
+
+    @classmethod
+    def load(cls, path: str, embedding, mmap: bool = True) -> "LocalVectorStore":
+        """Loads a persisted store, or returns an empty one if nothing is there yet."""
+        store = cls(embedding, persist_path=path)
+        vectors_path = os.path.join(path, "vectors.npy")
+        records_path = os.path.join(path, "records.json")
+        if not (os.path.exists(vectors_path) and os.path.exists(records_path)):
+            return store
+
+        with open(records_path, encoding="utf-8") as f:
+            records = json.load(f)
+        matrix = np.load(vectors_path, mmap_mode="c" if mmap else None)
+        store._matrix = matrix
+        store._size = len(records["ids"])
+        store._ids = records["ids"]
+        store._texts = records["texts"]
+        store._metadatas = records["metadatas"]
+        store._id_to_row = {doc_id: row for row, doc_id in enumerate(store._ids)}
+        store._columns = {
+            field: [metadata.get(field) for metadata in store._metadatas]
+            for field in INDEXED_FIELDS
+        }
+        store._revision = records.get("revision", store._revision)
+        store.ann_index = IVFIndex.load(os.path.join(path, "ann"), mmap=mmap)
+        return store
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, **kwargs):
+        store = cls(embedding, persist_path=kwargs.get("persist_path"))
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
+
+
+def _safe_compare(op: str, left, right) -> bool:
+    """Element-wise fallback for columns holding mixed or missing values."""
+    try:
+        return bool(_COMPARATORS[op](left, right))
+    except TypeError:
+        return op == "$ne"
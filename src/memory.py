@@ -0,0 +1,267 @@
+import asyncio
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from . import config
+from .registry import component
+
+# A request that refers back to something said earlier in the conversation.
+_FOLLOW_UP = re.compile(
+    r"\b(it|its|that|this|them|those|these|he|she|him|her|they|the same|the above"
+    r"|the (?:deal|customer|client|contact|company|organization|email|note|draft"
+    r"|reply|one))\b",
+    re.IGNORECASE,
+)
+
+SUMMARY_PROMPT = (
+    "You keep the running summary of a conversation between a user and Breeze "
+    "AI, a CRM copilot. Update the summary with the new messages below. Keep "
+    "every deal ID, name, amount, status and open task the user may refer to "
+    "later; drop small talk. Answer with the summary only, in at most {words} "
+    "words.\n\nCurrent summary:\n{summary}\n\nNew messages:\n{messages}"
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token), good enough for budgets."""
+    return len(text) // 4 + 1
+
+
+def _speaker(message) -> str:
+    return "User" if message.type == "human" else (message.name or "Assistant")
+
+
+def _turns(messages) -> list:
+    """
+    Splits the messages into turns: [index of the request, request, final
+    reply]. A turn is remembered as its request and its final reply; the step
+    replies of a multi-step turn are part of its merged reply.
+    """
+    turns = []
+    for i, message in enumerate(messages):
+        if isinstance(message, HumanMessage):
+            turns.append([i, message, None])
+        elif turns:
+            turns[-1][2] = message
+    return turns
+
+
+def _turn_tokens(turn) -> int:
+    return sum(estimate_tokens(m.content) for m in turn[1:] if m is not None)
+
+
+def format_turns(turns) -> str:
+    return "\n".join(
+        f"{_speaker(m)}: {m.content}" for turn in turns for m in turn[1:] if m
+    )
+
+
+def refers_back(text: str) -> bool:
+    return bool(_FOLLOW_UP.search(text))
+
+
+def conversation_context(state, request: str) -> str:
+    """
+    The earlier turns of the conversation (running summary and recent
+    messages) for an agent working on `request`, or "" when the request stands
+    on its own. Self-contained requests get no context, so their prompts stay
+    short and the retrieval and answer caches keep working for them.
+    """
+    # Every turn before the current one.
+    earlier = _turns(state.get("messages") or ())[:-1]
+    summary = state.get("summary") or ""
+    if not (earlier or summary) or not refers_back(request):
+        return ""
+    parts = []
+    if summary:
+        parts.append(f"Summary of the earlier conversation:\n{summary}")
+    if earlier:
+        parts.append(f"Recent messages:\n{format_turns(earlier)}")
+    return "\n\n".join(parts)
+
+
+def _compaction(state, budget: int | None = None):
+    """
+    Returns (number of messages to drop, prompt) when the conversation no
+    longer fits in the token budget, else None. The newest turns filling up to
+    half the budget (at least the latest one) are kept; the older ones are
+    folded into the summary.
+    """
+    budget = budget or config.MEMORY_TOKEN_BUDGET
+    turns = _turns(state.get("messages") or ())
+    sizes = [_turn_tokens(turn) for turn in turns]
+    if sum(sizes) <= budget:
+        return None
+    first_kept = len(turns) - 1
+    kept_tokens = sizes[-1]
+    while first_kept > 0 and kept_tokens + sizes[first_kept - 1] <= budget // 2:
+        first_kept -= 1
+        kept_tokens += sizes[first_kept]
+    if first_kept == 0:
+        return None
+    prompt = SUMMARY_PROMPT.format(
+        words=config.MEMORY_SUMMARY_WORDS,
+        summary=state.get("summary") or "(none yet)",
+        messages=format_turns(turns[:first_kept]),
+    )
+    return turns[first_kept][0], prompt
+
+
+def _compacted(state, drop: int, summary) -> dict:
+    if summary is None:
+        # Without a new summary the window still has to stay bounded.
+        summary = state.get("summary") or ""
+    # Writing a number drops that many of the oldest messages (see
+    # supervisor._merge_messages).
+    return {"messages": drop, "summary": summary}
+
+
+def compact_memory(state) -> dict:
+    """
+    State update of the memory node at the end of every turn: folds the
+    oldest turns into the running summary once the conversation exceeds
+    MEMORY_TOKEN_BUDGET tokens, so prompts stay bounded however long it gets.
+    """
+    compaction = _compaction(state)
+    if compaction is None:
+        return {}
+    drop, prompt = compaction
+    try:
+        summary = _get_summary_llm().invoke(prompt).content
+    except Exception as e:
+        print(f"⚠️ Could not summarize the conversation: {e}")
+        summary = None
+    return _compacted(state, drop, summary)
+
+
+async def acompact_memory(state) -> dict:
+    compaction = _compaction(state)
+    if compaction is None:
+        return {}
+    drop, prompt = compaction
+    try:
+        summary = (await _get_summary_llm().ainvoke(prompt)).content
+    except Exception as e:
+        print(f"⚠️ Could not summarize the conversation: {e}")
+        summary = None
+    return _compacted(state, drop, summary)
+
+
+def _get_summary_llm():
+    from .llm_connector import get_llm
+
+    return get_llm(temperature=0.0)
+
+
+class _SqliteCheckpointer(SqliteSaver):
+    """
+    SqliteSaver that also serves the graph's async path, by running its
+    (short, locked) SQLite calls in a worker thread.
+    """
+
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        checkpoints = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for checkpoint in checkpoints:
+            yield checkpoint
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(
+            self.put, config, checkpoint, metadata, new_versions
+        )
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id):
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+class ConversationMemory:
+    """
+    Per-session conversation state, stored in SQLite: the LangGraph
+    checkpointer of the conversation graph, plus the time each session was
+    last active. Sessions idle for longer than `idle_ttl` seconds are deleted,
+    checked at most every `evict_interval` seconds as turns come in.
+    """
+
+    def __init__(
+        self,
+        path: str = config.MEMORY_PATH,
+        idle_ttl: float = config.MEMORY_IDLE_TTL_SECONDS,
+        evict_interval: float = 60.0,
+    ):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.idle_ttl = idle_ttl
+        self.evict_interval = evict_interval
+        self._last_eviction = 0.0
+        self._eviction_lock = threading.Lock()
+        db = sqlite3.connect(path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        # Losing the last turn on power loss is fine; an fsync per turn is not.
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " thread_id TEXT PRIMARY KEY, last_seen REAL NOT NULL)"
+        )
+        db.execute(
+            "CREATE INDEX IF NOT EXISTS sessions_last_seen ON sessions (last_seen)"
+        )
+        db.commit()
+        self.checkpointer = _SqliteCheckpointer(db)
+
+    def touch(self, session_id: str):
+        """Records activity of a session and evicts idle ones when due."""
+        with self.checkpointer.cursor() as cur:
+            cur.execute(
+                "INSERT OR REPLACE INTO sessions (thread_id, last_seen) VALUES (?, ?)",
+                (str(session_id), time.time()),
+            )
+        now = time.monotonic()
+        if (
+            self.idle_ttl > 0
+            and now - self._last_eviction >= self.evict_interval
+            and self._eviction_lock.acquire(blocking=False)
+        ):
+            try:
+                self._last_eviction = now
+                self.evict_idle()
+            finally:
+                self._eviction_lock.release()
+
+    def evict_idle(self) -> int:
+        """Deletes the sessions idle for longer than the TTL. Returns how many."""
+        cutoff = time.time() - self.idle_ttl
+        with self.checkpointer.cursor() as cur:
+            idle = [
+                row[0]
+                for row in cur.execute(
+                    "SELECT thread_id FROM sessions WHERE last_seen < ?", (cutoff,)
+                )
+            ]
+        for thread_id in idle:
+            self.forget(thread_id)
+        if idle:
+            print(f"🧹 Evicted {len(idle)} idle chat session(s).")
+        return len(idle)
+
+    def forget(self, session_id: str):
+        """Deletes everything remembered about a session."""
+        self.checkpointer.delete_thread(str(session_id))
+        with self.checkpointer.cursor() as cur:
+            cur.execute("DELETE FROM sessions WHERE thread_id = ?", (str(session_id),))
+
+
+@component
+def get_conversation_memory() -> ConversationMemory:
+    return ConversationMemory()
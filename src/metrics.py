@@ -0,0 +1,424 @@
+import bisect
+import contextvars
+import operator
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.tracers.context import register_configure_hook
+
+# Latency buckets in seconds, from local lookups up to long generations.
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+_metrics = []
+
+
+class _ShardOwner:
+    """Lives only in a thread's local storage, so it is collected with the thread."""
+
+
+class _Metric:
+    """
+    Base of the metric types. Every thread records into its own shard (a dict
+    from label values to the value), so recording takes no lock and never
+    contends with other threads. Scrapes sum the shards; the shards of
+    finished threads are folded into one retired shard, so short-lived worker
+    threads do not pile up.
+    """
+
+    kind = None
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        # Label values as one key; a scalar for a single label, () for none.
+        self._key = operator.itemgetter(*labels) if labels else lambda labels: ()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []
+        self._finished = []
+        self._retired = {}
+        _metrics.append(self)
+
+    def _shard(self) -> dict:
+        try:
+            return self._local.shard
+        except AttributeError:
+            pass
+        shard = {}
+        owner = _ShardOwner()
+        self._local.shard = shard
+        self._local.owner = owner
+        with self._lock:
+            self._fold_finished()
+            self._shards.append(shard)
+        # The finalizer can run during garbage collection in any thread, even
+        # one holding the lock, so it only queues the shard (list.append is
+        # atomic); it is folded in the next time the lock is taken.
+        weakref.finalize(owner, self._finished.append, shard)
+        return shard
+
+    def _fold_finished(self):
+        """Merges the shards of finished threads into the retired shard (lock held)."""
+        while self._finished:
+            shard = self._finished.pop()
+            self._shards = [s for s in self._shards if s is not shard]
+            self._add(self._retired, shard)
+
+    def _add(self, total: dict, shard: dict):
+        for key, value in shard.items():
+            total[key] = total.get(key, 0) + value
+
+    def collect(self) -> dict:
+        """Returns {tuple of label values: value} summed over every thread."""
+        with self._lock:
+            self._fold_finished()
+            shards = [shard.copy() for shard in self._shards]
+            total = {}
+            self._add(total, self._retired)
+        for shard in shards:
+            self._add(total, shard)
+        single = len(self.labels) == 1
+        return {
+            tuple(map(str, (key,) if single else key)): value
+            for key, value in total.items()
+        }
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        for key, value in sorted(self.collect().items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """
+    A value that goes up and down (`inc`/`dec`), or that is read from
+    `function` at scrape time, which returns {label values: value}.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labels=(), function=None):
+        super().__init__(name, documentation, labels)
+        self.function = function
+
+    def inc(self, amount: float = 1, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def collect(self) -> dict:
+        if self.function is None:
+            return super().collect()
+        try:
+            return {
+                tuple(str(v) for v in key): value
+                for key, value in self.function().items()
+            }
+        except Exception as e:
+            print(f"⚠️ Could not read gauge {self.name}: {e}")
+            return {}
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        state = shard.get(key)
+        if state is None:
+            # Per-bucket counts (the last one is +Inf), sum, count.
+            state = shard[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        state[0][bisect.bisect_left(self.buckets, value)] += 1
+        state[1] += value
+        state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes the duration of the block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _add(self, total: dict, shard: dict):
+        for key, (counts, value_sum, count) in shard.items():
+            merged = total.get(key)
+            if merged is None:
+                merged = total[key] = [[0] * len(counts), 0.0, 0]
+            merged[0] = [a + b for a, b in zip(merged[0], counts)]
+            merged[1] += value_sum
+            merged[2] += count
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        names = self.labels + ("le",)
+        for key, (counts, value_sum, count) in sorted(self.collect().items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                labels = _format_labels(names, key + (_format_bound(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {value_sum}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+def _format_bound(bound) -> str:
+    return bound if isinstance(bound, str) else repr(float(bound))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- The copilot's metrics ---
+REQUESTS = Counter(
+    "copilot_requests_total", "Chat turns answered, by outcome.", ("status",)
+)
+REQUEST_SECONDS = Histogram(
+    "copilot_request_seconds", "End-to-end latency of a chat turn."
+)
+ACTIVE_SESSIONS = Gauge(
+    "copilot_active_sessions", "Chat turns currently being answered."
+)
+ROUTES = Counter(
+    "copilot_routes_total",
+    "Requests (or sub-tasks) routed to each agent, by the router tier that decided.",
+    ("agent", "tier"),
+)
+STAGE_SECONDS = Histogram(
+    "copilot_stage_seconds",
+    "Latency of each stage of a turn: graph nodes, tools, retrieval, LLM calls "
+    "and embedding calls.",
+    ("stage",),
+)
+LLM_TOKENS = Counter(
+    "copilot_llm_tokens_total",
+    "LLM tokens, by model and direction (prompt or completion).",
+    ("model", "direction"),
+)
+LLM_ERRORS = Counter("copilot_llm_errors_total", "Failed LLM calls.", ("model",))
+EMBEDDING_CACHE = Counter(
+    "copilot_embedding_cache_lookups_total",
+    "Embedding cache lookups, by result (memory_hit, disk_hit or miss).",
+    ("result",),
+)
+ANSWER_CACHE = Counter(
+    "copilot_answer_cache_lookups_total",
+    "Semantic answer cache lookups, by result (hit or miss).",
+    ("result",),
+)
+DEAL_READS = Counter(
+    "copilot_deal_reads_total",
+    "Deal reads, by where they were served from (snapshot or pipedrive).",
+    ("source",),
+)
+HTTP_RESPONSES = Counter(
+    "copilot_http_responses_total",
+    "Upstream HTTP requests by endpoint and final status code ('error' when no "
+    "response arrived), after retries.",
+    ("endpoint", "status"),
+)
+HTTP_SECONDS = Histogram(
+    "copilot_http_request_seconds",
+    "Latency of upstream HTTP requests, retries and rate-limit waits included.",
+    ("endpoint",),
+)
+
+
+def _rate_limit_waiting() -> dict:
+    from .scheduler import scheduler_stats
+
+    return {(name,): stats["waiting"] for name, stats in scheduler_stats().items()}
+
+
+RATE_LIMIT_WAITING = Gauge(
+    "copilot_rate_limit_waiting",
+    "Calls waiting for a token of an endpoint's rate limit.",
+    ("endpoint",),
+    function=_rate_limit_waiting,
+)
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """
+    Records the LangChain side of a turn: the latency of every graph node,
+    tool, retriever and LLM call, and the LLM's token usage. It is installed
+    on every LangChain run in the process.
+    """
+
+    # Only bookkeeping, so it runs inline rather than in an executor.
+    run_inline = True
+    raise_error = False
+
+    def __init__(self):
+        self._starts = {}
+
+    def _start(self, run_id, stage: str):
+        self._starts[run_id] = (stage, time.perf_counter())
+
+    def _end(self, run_id):
+        started = self._starts.pop(run_id, None)
+        if started is not None:
+            stage, start = started
+            STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+        return started
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+        name = kwargs.get("name")
+        if name and (metadata or {}).get("langgraph_node") == name:
+            self._start(run_id, f"node:{name}")
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start_llm(run_id, kwargs)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start_llm(run_id, kwargs)
+
+    def _start_llm(self, run_id, kwargs):
+        model = (kwargs.get("metadata") or {}).get("ls_model_name") or "llm"
+        self._starts[run_id] = (model, time.perf_counter())
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        started = self._starts.pop(run_id, None)
+        if started is None:
+            return
+        model, start = started
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage="llm")
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt, completion = usage.get("prompt_tokens"), usage.get("completion_tokens")
+        if prompt is None:
+            for generations in response.generations:
+                for generation in generations:
+                    message = getattr(generation, "message", None)
+                    metadata = getattr(message, "usage_metadata", None) or {}
+                    prompt = (prompt or 0) + metadata.get("input_tokens", 0)
+                    completion = (completion or 0) + metadata.get("output_tokens", 0)
+        if prompt:
+            LLM_TOKENS.inc(prompt, model=model, direction="prompt")
+        if completion:
+            LLM_TOKENS.inc(completion, model=model, direction="completion")
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        started = self._starts.pop(run_id, None)
+        LLM_ERRORS.inc(model=started[0] if started else "llm")
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._start(run_id, "tool")
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_retriever_start(self, serialized, query, *, run_id, **kwargs):
+        self._start(run_id, "retrieval")
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self._end(run_id)
+
+
+# One handler for the process, created here and shared by every context: it
+# is the default of its context variable, so LangChain adds it to every run
+# without callbacks being passed around.
+_handler = MetricsCallbackHandler()
+_handler_var = contextvars.ContextVar("metrics_callback_handler", default=_handler)
+register_configure_hook(_handler_var, inheritable=True)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """
+    Serves GET /metrics on host:port from a daemon thread, next to the UI.
+
+    Returns:
+        ThreadingHTTPServer: The server (call `.shutdown()` to stop it).
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -1,21 +1,84 @@
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough
+import time
+
 from langchain_core.output_parsers import StrOutputParser
-from langchain_pinecone import PineconeVectorStore
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import (
+    RunnableLambda,
+    RunnableParallel,
+    RunnablePassthrough,
+)
 
-from src.llm_connector import get_llm
+from src import config, metrics
+from src.deal_index import get_deal_index
 from src.embedding_client import get_embedding_model
-from src.config import PINECONE_INDEX_NAME
+from src.hybrid_retriever import get_retriever
+from src.llm_connector import USER_FACING_TAG, get_llm
+from src.registry import component
+from src.semantic_cache import get_answer_cache
+from src.vector_store_connector import get_vector_store
+
+
+def with_answer_cache(rag_chain_with_sources, embedding_model, cache):
+    """
+    Puts the semantic answer cache in front of a chain that returns
+    {"context": documents, "question": ..., "answer": ...}.
+
+    The query embedding is computed once here; the retriever's own embedding of
+    the same question is then served by the embedding cache.
+    """
+
+    def entity_key(question: str) -> frozenset:
+        return frozenset(deal["id"] for deal in get_deal_index().lookup(question))
 
+    def remember(result: dict, embedding, key: frozenset, start: float) -> str:
+        deal_ids = [
+            doc.metadata["deal_id"]
+            for doc in result["context"]
+            if doc.metadata.get("deal_id") is not None
+        ]
+        cache.add(
+            embedding,
+            result["answer"],
+            deal_ids=deal_ids,
+            entity_key=key,
+            cost=time.perf_counter() - start,
+        )
+        return result["answer"]
 
+    def answer(question: str) -> str:
+        start = time.perf_counter()
+        embedding = embedding_model.embed_query(question)
+        key = entity_key(question)
+        cached = cache.lookup(embedding, key)
+        metrics.ANSWER_CACHE.inc(result="miss" if cached is None else "hit")
+        if cached is not None:
+            return cached
+        result = rag_chain_with_sources.invoke(question)
+        return remember(result, embedding, key, start)
+
+    async def aanswer(question: str) -> str:
+        start = time.perf_counter()
+        embedding = await embedding_model.aembed_query(question)
+        key = entity_key(question)
+        cached = cache.lookup(embedding, key)
+        metrics.ANSWER_CACHE.inc(result="miss" if cached is None else "hit")
+        if cached is not None:
+            return cached
+        result = await rag_chain_with_sources.ainvoke(question)
+        return remember(result, embedding, key, start)
+
+    return RunnableLambda(answer, afunc=aanswer, name="CachedRAGChain")
+
+
+@component
 def get_rag_chain():
     """
     Initializes and returns a fully configured RAG chain for CRM Q&A.
+    The chain is built on first use and shared afterwards.
     """
-    vectorstore = PineconeVectorStore(
-        index_name=PINECONE_INDEX_NAME, embedding=get_embedding_model()
-    )
-    retriever = vectorstore.as_retriever()
+    embedding_model = get_embedding_model()
+    vectorstore = get_vector_store(embedding_model)
+    retriever = get_retriever(vectorstore)
 
     template = """
     You are an expert assistant for Breeze AI, a CRM Copilot.
@@ -34,17 +97,25 @@ def get_rag_chain():
     prompt = ChatPromptTemplate.from_template(template)
 
     # --- THIS IS THE CRITICAL FIX ---
-    llm = get_llm(temperature=0.0)
-
-    # The rest of the chain is the same
-    rag_chain = (
-        {"context": retriever, "question": RunnablePassthrough()}
-        | prompt
-        | llm
-        | StrOutputParser()
-    )
+    # The answer is returned as generated, so its tokens can be streamed.
+    llm = get_llm(temperature=0.0).with_config(tags=[USER_FACING_TAG])
 
-    return rag_chain
+    if not config.RAG_CACHE_ENABLED:
+        return (
+            {"context": retriever, "question": RunnablePassthrough()}
+            | prompt
+            | llm
+            | StrOutputParser()
+        )
+
+    # Keep the retrieved documents next to the answer, so the cache knows
+    # which deals each answer depends on.
+    rag_chain_with_sources = RunnableParallel(
+        context=retriever, question=RunnablePassthrough()
+    ).assign(answer=prompt | llm | StrOutputParser())
+    return with_answer_cache(
+        rag_chain_with_sources, embedding_model, get_answer_cache()
+    )
 
 
 # The direct test block remains the same
@@ -58,3 +129,6 @@ if __name__ == "__main__":
     print("\n--- RAG Chain Answer ---")
     print(answer)
     print("------------------------")
+    if config.RAG_CACHE_ENABLED:
+        chain.invoke(test_question)
+        print(f"Answer cache: {get_answer_cache().stats()}")
@@ -0,0 +1,86 @@
+import os
+import sqlite3
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Token bucket held in this process: `rate` tokens per second, bursts of up
+    to `burst`. Not thread-safe on its own; RateScheduler (src/scheduler.py)
+    calls it under its lock.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+
+    def try_take(self, rank: int, reserve: float = 0.0) -> float:
+        """
+        Takes one token if more than `rank + reserve` are available (`rank`
+        callers are ahead in the queue). Returns 0 on success, else the seconds
+        until enough tokens will be.
+        """
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        needed = rank + 1 + reserve
+        if self._tokens >= needed:
+            self._tokens -= 1
+            return 0.0
+        return (needed - self._tokens) / self.rate
+
+
+class SharedTokenBucket:
+    """
+    Token bucket stored in a SQLite file, so every process on the host that
+    points at the same file shares one quota. Each take is one IMMEDIATE
+    transaction, which SQLite serializes across processes; a lock serializes
+    the threads sharing the connection.
+    """
+
+    def __init__(self, name: str, rate: float, burst: float, path: str):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(
+            path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            " name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        self._lock = threading.Lock()
+
+    def try_take(self, rank: int, reserve: float = 0.0) -> float:
+        with self._lock:
+            return self._try_take(rank, reserve)
+
+    def _try_take(self, rank: int, reserve: float) -> float:
+        now = time.time()
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._db.execute(
+                "SELECT tokens, updated FROM buckets WHERE name = ?", (self.name,)
+            ).fetchone()
+            tokens, updated = row if row else (self.burst, now)
+            tokens = min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+            needed = rank + 1 + reserve
+            wait = 0.0
+            if tokens >= needed:
+                tokens -= 1
+            else:
+                wait = (needed - tokens) / self.rate
+            self._db.execute(
+                "INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                (self.name, tokens, now),
+            )
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        return wait
@@ -0,0 +1,69 @@
+import functools
+import threading
+import time
+
+# Built components, keyed by (builder name, args).
+_components = {}
+# Seconds each component took to build, in build order.
+_build_times = {}
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _key_lock(key) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(key, threading.Lock())
+
+
+def component(builder):
+    """
+    Decorator for functions that build expensive, reusable objects (LLM clients,
+    chains, agents). Nothing is built at import time: the first call builds the
+    object and later calls with the same arguments return the same instance.
+
+    Each distinct argument tuple has its own lock, so a component can be built
+    while another one is being built (e.g. the RAG chain building its LLM), and
+    two threads never build the same component twice.
+    """
+
+    @functools.wraps(builder)
+    def get(*args, **kwargs):
+        key = (builder.__qualname__, args, tuple(sorted(kwargs.items())))
+        try:
+            return _components[key]
+        except KeyError:
+            pass
+        with _key_lock(key):
+            if key not in _components:
+                start = time.perf_counter()
+                _components[key] = builder(*args, **kwargs)
+                _build_times[_describe(key)] = time.perf_counter() - start
+        return _components[key]
+
+    get.build = builder
+    return get
+
+
+def _describe(key) -> str:
+    name, args, kwargs = key
+    params = [_short_repr(arg) for arg in args]
+    params += [f"{k}={_short_repr(v)}" for k, v in kwargs]
+    return f"{name}({', '.join(params)})"
+
+
+def _short_repr(value, limit: int = 40) -> str:
+    text = repr(value)
+    return text if len(text) <= limit else text[: limit - 3] + "..."
+
+
+def build_times() -> dict:
+    """Seconds spent building each component so far, e.g. for cold-start reports."""
+    return dict(_build_times)
+
+
+def reset():
+    """Forgets every built component (mainly for benchmarks and tests)."""
+    with _locks_guard:
+        _components.clear()
+        _build_times.clear()
+        _locks.clear()
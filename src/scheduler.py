@@ -0,0 +1,239 @@
+import asyncio
+import bisect
+import contextvars
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+from langchain_core.rate_limiters import BaseRateLimiter
+
+from . import config
+from .rate_limiter import SharedTokenBucket, TokenBucket
+
+# Request priorities: lower values are served first.
+INTERACTIVE = 0
+BACKGROUND = 1
+
+_default_priority = INTERACTIVE
+_priority = contextvars.ContextVar("request_priority", default=None)
+
+
+def set_default_priority(priority: int):
+    """Sets the priority of every request in this process (e.g. BACKGROUND in ingestion)."""
+    global _default_priority
+    _default_priority = priority
+
+
+def current_priority() -> int:
+    priority = _priority.get()
+    return _default_priority if priority is None else priority
+
+
+@contextmanager
+def request_priority(priority: int):
+    """Runs the requests made inside the block (in this thread/task) at `priority`."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def bind_priority(fn):
+    """
+    Wraps `fn` to run in the caller's context, e.g. in a worker thread: at its
+    priority, and inside its trace span (src/tracing.py).
+    """
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        # A context can only be entered by one thread at a time.
+        return context.copy().run(fn, *args, **kwargs)
+
+    return run
+
+
+class RateScheduler:
+    """
+    Admission control for one upstream endpoint: a token bucket of `rate`
+    requests per second with bursts of up to `burst`, and a priority queue of
+    the callers waiting for a token.
+
+    Callers wait in (priority, arrival) order, so interactive chat requests are
+    served ahead of background ingestion whenever the quota is the bottleneck.
+    Each waiter sleeps until the bucket should have a token for its place in the
+    queue and then checks again, so no thread or task has to hand tokens out.
+    Threads (`acquire`) and event loops (`aacquire`) share the same queue.
+
+    With `shared_path`, the bucket lives in a SQLite file and is shared by
+    every process using that file; the priority queue stays per process.
+    Background callers also leave `interactive_reserve` (a fraction of the
+    burst) in the bucket, so chat traffic in another process still finds
+    tokens while ingestion runs. A rate of 0 or less disables the limit.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: float,
+        burst: float | None = None,
+        shared_path: str | None = None,
+        interactive_reserve: float = config.RATE_LIMIT_INTERACTIVE_RESERVE,
+    ):
+        self.name = name
+        self.rate = rate
+        self.burst = max(1.0, burst if burst is not None else rate)
+        self.background_reserve = interactive_reserve * self.burst
+        self._shared = rate > 0 and bool(shared_path)
+        if self._shared:
+            self._bucket = SharedTokenBucket(name, rate, self.burst, shared_path)
+        else:
+            self._bucket = TokenBucket(rate, self.burst)
+        self._lock = threading.Lock()
+        self._queue = []
+        self._arrivals = itertools.count()
+        self.granted = {INTERACTIVE: 0, BACKGROUND: 0}
+        self.wait_seconds = {INTERACTIVE: 0.0, BACKGROUND: 0.0}
+
+    def _enqueue(self, priority: int):
+        key = (priority, next(self._arrivals))
+        with self._lock:
+            bisect.insort(self._queue, key)
+        return key
+
+    def _poll(self, key) -> float:
+        """Takes a token for `key` if it is its turn, else returns the wait."""
+        reserve = self.background_reserve if key[0] > INTERACTIVE else 0.0
+        with self._lock:
+            rank = bisect.bisect_left(self._queue, key)
+            if not self._shared:
+                wait = self._bucket.try_take(rank, reserve)
+                if not wait:
+                    self._queue.pop(rank)
+                # Never sleep so long that a change in the queue goes unnoticed.
+                return min(wait, 1.0)
+        # The shared bucket waits for the SQLite file lock, which may be held
+        # by another process, so it is not taken under the queue lock.
+        wait = self._bucket.try_take(rank, reserve)
+        if not wait:
+            with self._lock:
+                self._queue.pop(bisect.bisect_left(self._queue, key))
+        return min(wait, 1.0)
+
+    def _leave(self, key, priority: int, start: float, granted: bool):
+        with self._lock:
+            if not granted:
+                index = bisect.bisect_left(self._queue, key)
+                if index < len(self._queue) and self._queue[index] == key:
+                    self._queue.pop(index)
+                return
+            self.granted[priority] = self.granted.get(priority, 0) + 1
+            self.wait_seconds[priority] = (
+                self.wait_seconds.get(priority, 0.0) + time.monotonic() - start
+            )
+
+    def acquire(self, priority: int | None = None):
+        """Blocks until the caller may send one request."""
+        if self.rate <= 0:
+            return
+        priority = current_priority() if priority is None else priority
+        start = time.monotonic()
+        key = self._enqueue(priority)
+        granted = False
+        try:
+            while True:
+                wait = self._poll(key)
+                if not wait:
+                    granted = True
+                    return
+                time.sleep(wait)
+        finally:
+            self._leave(key, priority, start, granted)
+
+    async def aacquire(self, priority: int | None = None):
+        """Async version of `acquire`; waiting never blocks the event loop."""
+        if self.rate <= 0:
+            return
+        priority = current_priority() if priority is None else priority
+        start = time.monotonic()
+        key = self._enqueue(priority)
+        granted = False
+        try:
+            while True:
+                if self._shared:
+                    wait = await asyncio.to_thread(self._poll, key)
+                else:
+                    wait = self._poll(key)
+                if not wait:
+                    granted = True
+                    return
+                await asyncio.sleep(wait)
+        finally:
+            self._leave(key, priority, start, granted)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "rate": self.rate,
+                "burst": self.burst,
+                "waiting": len(self._queue),
+                "granted": dict(self.granted),
+                "avg_wait_s": {
+                    priority: round(self.wait_seconds[priority] / count, 4)
+                    for priority, count in self.granted.items()
+                    if count
+                },
+            }
+
+
+class SchedulerRateLimiter(BaseRateLimiter):
+    """Lets LangChain chat models (`rate_limiter=`) wait on a RateScheduler."""
+
+    def __init__(self, scheduler: RateScheduler):
+        self.scheduler = scheduler
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        self.scheduler.acquire()
+        return True
+
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        await self.scheduler.aacquire()
+        return True
+
+
+# Quotas of the endpoints the copilot calls: (requests per second, burst).
+ENDPOINT_QUOTAS = {
+    "pipedrive": (config.PIPEDRIVE_RATE_LIMIT, config.PIPEDRIVE_RATE_BURST),
+    "nebius_llm": (config.NEBIUS_LLM_RATE_LIMIT, config.NEBIUS_LLM_RATE_BURST),
+    "nebius_embeddings": (
+        config.NEBIUS_EMBEDDING_RATE_LIMIT,
+        config.NEBIUS_EMBEDDING_RATE_BURST,
+    ),
+}
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(endpoint: str) -> RateScheduler:
+    """
+    Returns the process-wide scheduler of an endpoint in ENDPOINT_QUOTAS. With
+    RATE_LIMIT_SHARED_PATH set, its bucket is shared with other processes.
+    """
+    scheduler = _schedulers.get(endpoint)
+    if scheduler is not None:
+        return scheduler
+    with _schedulers_lock:
+        if endpoint not in _schedulers:
+            rate, burst = ENDPOINT_QUOTAS[endpoint]
+            _schedulers[endpoint] = RateScheduler(
+                endpoint, rate, burst, shared_path=config.RATE_LIMIT_SHARED_PATH
+            )
+        return _schedulers[endpoint]
+
+
+def scheduler_stats() -> dict:
+    with _schedulers_lock:
+        schedulers = dict(_schedulers)
+    return {name: scheduler.stats() for name, scheduler in schedulers.items()}
@@ -0,0 +1,211 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from . import config
+from .registry import component
+from .sync_state import SyncState
+
+
+class _Entry:
+    __slots__ = ("answer", "cost", "created", "deal_versions", "entity_key", "slot")
+
+    def __init__(self, slot, answer, deal_versions, entity_key, created, cost):
+        self.slot = slot
+        self.answer = answer
+        self.deal_versions = deal_versions
+        self.entity_key = entity_key
+        self.created = created
+        self.cost = cost
+
+
+class SemanticAnswerCache:
+    """
+    In-memory cache of RAG answers keyed by the meaning of the question.
+
+    Each entry holds the normalized query embedding, the answer, and the
+    version (ingestion content hash) of every deal the answer was built from.
+    A new question is served from the cache when its embedding has cosine
+    similarity of at least `threshold` with a stored one and:
+      - both questions name the same deals (`entity_key`), so "value of the
+        Acme deal" never returns the answer about "value of the Globex deal";
+      - the entry is younger than `ttl_seconds`;
+      - none of its source deals changed since (checked with `get_versions`).
+    Entries are evicted least-recently-used once `max_entries` is reached.
+    """
+
+    def __init__(
+        self,
+        threshold: float = config.RAG_CACHE_SIMILARITY,
+        ttl_seconds: float = config.RAG_CACHE_TTL_SECONDS,
+        max_entries: int = config.RAG_CACHE_MAX_ENTRIES,
+        get_versions=None,
+    ):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self.get_versions = get_versions
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._vectors = None
+        self._active = np.zeros(self.max_entries, dtype=bool)
+        self._free_slots = list(range(self.max_entries - 1, -1, -1))
+        self._deal_to_slots = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.latency_saved = 0.0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, slot: int):
+        entry = self._entries.pop(slot)
+        self._active[slot] = False
+        self._free_slots.append(slot)
+        for deal_id in entry.deal_versions:
+            slots = self._deal_to_slots.get(deal_id)
+            if slots is not None:
+                slots.discard(slot)
+                if not slots:
+                    del self._deal_to_slots[deal_id]
+
+    def _is_stale(self, entry: _Entry) -> bool:
+        if not entry.deal_versions or self.get_versions is None:
+            return False
+        current = self.get_versions(list(entry.deal_versions))
+        return any(
+            current.get(deal_id) != version
+            for deal_id, version in entry.deal_versions.items()
+        )
+
+    def lookup(self, embedding, entity_key=frozenset()):
+        """
+        Returns a cached answer for a query embedding, or None on a miss.
+        """
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        with self._lock:
+            if self._vectors is None or not self._entries or not norm:
+                self.misses += 1
+                return None
+            scores = self._vectors @ (query / norm)
+            scores[~self._active] = -np.inf
+            candidates = np.flatnonzero(scores >= self.threshold)
+            now = time.monotonic()
+            for slot in candidates[np.argsort(-scores[candidates])].tolist():
+                entry = self._entries[slot]
+                if now - entry.created > self.ttl_seconds:
+                    self._remove(slot)
+                    self.expirations += 1
+                    continue
+                if entry.entity_key != entity_key:
+                    continue
+                if self._is_stale(entry):
+                    self._remove(slot)
+                    self.invalidations += 1
+                    continue
+                self._entries.move_to_end(slot)
+                self.hits += 1
+                self.latency_saved += entry.cost
+                return entry.answer
+            self.misses += 1
+            return None
+
+    def add(
+        self,
+        embedding,
+        answer: str,
+        deal_ids=(),
+        entity_key=frozenset(),
+        cost: float = 0.0,
+    ):
+        """
+        Stores an answer.
+
+        Args:
+            embedding: The query embedding.
+            answer (str): The generated answer.
+            deal_ids: IDs of the deals whose documents the answer was built from.
+            entity_key: The deals named in the question (see the class docstring).
+            cost (float): Seconds the uncached answer took, reported as
+                latency saved on every hit.
+        """
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if not norm:
+            return
+        deal_ids = list(dict.fromkeys(deal_ids))
+        versions = self.get_versions(deal_ids) if self.get_versions else {}
+        deal_versions = {deal_id: versions.get(deal_id) for deal_id in deal_ids}
+
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros(
+                    (self.max_entries, query.shape[0]), dtype=np.float32
+                )
+            if not self._free_slots:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+            slot = self._free_slots.pop()
+            self._vectors[slot] = query / norm
+            self._active[slot] = True
+            self._entries[slot] = _Entry(
+                slot, answer, deal_versions, entity_key, time.monotonic(), cost
+            )
+            for deal_id in deal_versions:
+                self._deal_to_slots.setdefault(deal_id, set()).add(slot)
+
+    def invalidate_deals(self, deal_ids) -> int:
+        """Drops every answer built from any of the given deals. Returns the count."""
+        with self._lock:
+            slots = set()
+            for deal_id in deal_ids:
+                slots |= self._deal_to_slots.get(deal_id, set())
+            for slot in slots:
+                self._remove(slot)
+            self.invalidations += len(slots)
+            return len(slots)
+
+    def clear(self):
+        with self._lock:
+            for slot in list(self._entries):
+                self._remove(slot)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "latency_saved_s": round(self.latency_saved, 3),
+                "entries": len(self._entries),
+                "invalidations": self.invalidations,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+            }
+
+
+@component
+def get_answer_cache() -> SemanticAnswerCache:
+    """
+    Returns the process-wide answer cache. Source deal versions are read from
+    the ingestion sync state, so answers about a deal stop being served as
+    soon as ingestion re-embeds it.
+    """
+    state = SyncState()
+
+    def get_versions(deal_ids):
+        return {
+            deal_id: content_hash
+            for deal_id, (content_hash, _) in state.get_deals(deal_ids).items()
+        }
+
+    return SemanticAnswerCache(get_versions=get_versions)
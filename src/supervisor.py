@@ -1,60 +1,120 @@
-import operator
-from typing import TypedDict, Annotated, Sequence
-from langchain_core.messages import BaseMessage, HumanMessage
-from langgraph.graph import StateGraph, END
+import asyncio
+import time
+from typing import Annotated, Sequence, TypedDict
+
+from langchain_core.messages import AIMessageChunk, BaseMessage, HumanMessage
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda
+from langgraph.graph import END, StateGraph
+from langgraph.types import Send
 
-from src.agents.sales_agent import get_sales_agent
+from src import config, metrics, tracing
 from src.agents.marketing_agent import get_marketing_agent
+from src.agents.sales_agent import get_sales_agent
 from src.agents.service_agent import get_service_agent
-from src.llm_connector import get_llm
+from src.embedding_client import get_embedding_model
+from src.fast_router import FastRouter
+from src.llm_connector import USER_FACING_TAG, get_llm
+from src.memory import (
+    acompact_memory,
+    compact_memory,
+    conversation_context,
+    get_conversation_memory,
+)
+from src.registry import component
+from src.task_planner import (
+    aplan_request,
+    format_result,
+    merge_results,
+    plan_request,
+    ready_steps,
+    task_with_context,
+)
+
+
+def _merge_results(current, update):
+    # The supervisor starts every turn with an empty list by writing None.
+    if update is None:
+        return []
+    return (current or []) + update
+
+
+def _merge_messages(current, update):
+    # The memory node drops the oldest messages, once they are summarized, by
+    # writing how many to drop.
+    if isinstance(update, int):
+        return list(current or [])[update:]
+    return list(current or []) + list(update)
 
 
 class AgentState(TypedDict):
-    messages: Annotated[Sequence[BaseMessage], operator.add]
+    messages: Annotated[Sequence[BaseMessage], _merge_messages]
     next: str
+    # Running summary of the turns that no longer fit in the memory window.
+    summary: str
+    # Sub-tasks of the current request (see task_planner.plan_request) and the
+    # results of those that have finished, as {"step": id, "content": text}.
+    plan: list
+    results: Annotated[list, _merge_results]
 
 
-# Initialize the agents
-sales_agent = get_sales_agent()
-marketing_agent = get_marketing_agent()
-service_agent = get_service_agent()
+# The agents are built lazily by their getters, on the first request they serve.
 
 
 def get_last_human_message(state):
     return state["messages"][-1].content
 
 
-# --- NO CHANGE NEEDED: The Sales Agent still returns a dictionary ---
-def sales_agent_node(state):
-    result = sales_agent.invoke({"input": get_last_human_message(state)})
+def agent_input(state) -> str:
+    """The agent's request, after the earlier conversation when it refers to it."""
+    message = get_last_human_message(state)
+    context = state.get("context")
+    if context:
+        return f"{context}\n\nCurrent request: {message}"
+    return message
+
+
+def agent_reply(state, agent: str, content: str) -> dict:
+    """The state update of an agent node: its message and its step result."""
     return {
-        "messages": [
-            BaseMessage(content=result["output"], type="assistant", name="Sales Agent")
-        ]
+        "messages": [BaseMessage(content=content, type="assistant", name=agent)],
+        "results": [{"step": state.get("step", 0), "content": content}],
     }
 
 
+# --- NO CHANGE NEEDED: The Sales Agent still returns a dictionary ---
+def sales_agent_node(state):
+    result = get_sales_agent().invoke({"input": agent_input(state)})
+    return agent_reply(state, "Sales Agent", result["output"])
+
+
+async def asales_agent_node(state):
+    result = await get_sales_agent().ainvoke({"input": agent_input(state)})
+    return agent_reply(state, "Sales Agent", result["output"])
+
+
 # --- FIX 1: The result from the new Marketing Agent is now a direct string ---
 def marketing_agent_node(state):
-    result = marketing_agent.invoke({"input": get_last_human_message(state)})
+    result = get_marketing_agent().invoke({"input": agent_input(state)})
     # The result is the final string content, so we use it directly.
-    return {
-        "messages": [
-            BaseMessage(content=result, type="assistant", name="Marketing Agent")
-        ]
-    }
+    return agent_reply(state, "Marketing Agent", result)
+
+
+async def amarketing_agent_node(state):
+    result = await get_marketing_agent().ainvoke({"input": agent_input(state)})
+    return agent_reply(state, "Marketing Agent", result)
 
 
 # --- FIX 2: Same fix for the new Service Agent node ---
 def service_agent_node(state):
-    result = service_agent.invoke({"input": get_last_human_message(state)})
+    result = get_service_agent().invoke({"input": agent_input(state)})
     # The result is the final string content, so we use it directly.
-    return {
-        "messages": [
-            BaseMessage(content=result, type="assistant", name="Service Agent")
-        ]
-    }
+    return agent_reply(state, "Service Agent", result)
+
+
+async def aservice_agent_node(state):
+    result = await get_service_agent().ainvoke({"input": agent_input(state)})
+    return agent_reply(state, "Service Agent", result)
 
 
 # --- Supervisor Chain (NO CHANGES NEEDED) ---
@@ -79,44 +139,279 @@ function_def = {
 prompt = ChatPromptTemplate.from_messages(
     [("system", system_prompt), ("human", "{messages}")]
 )
-llm = get_llm(temperature=0.0)
-supervisor_chain = prompt | llm.with_structured_output(function_def)
 
 
-def router(state):
-    last_message = state["messages"][-1].content
-    route = supervisor_chain.invoke(
+@component
+def get_supervisor_chain():
+    llm = get_llm(temperature=0.0)
+    return prompt | llm.with_structured_output(function_def)
+
+
+def warm_up():
+    """
+    Builds the supervisor chain and the agents ahead of the first request.
+    Meant to run in a background thread while the UI/CLI starts up.
+    """
+    get_supervisor_chain()
+    if config.FAST_ROUTER_ENABLED:
+        get_fast_router().prepare()
+    get_sales_agent()
+    get_marketing_agent()
+    get_service_agent()
+
+
+def ask_supervisor_llm(message: str) -> str:
+    route = get_supervisor_chain().invoke(
         {
             "members": ", ".join(members),
-            "messages": [HumanMessage(content=last_message)],
+            "messages": [HumanMessage(content=message)],
         }
     )
-    print(f"\n--- SUPERVISOR DECISION ---\nRoute: {route}\n--- END DECISION ---\n")
-    return {"next": route["next"]}
+    return route["next"]
+
+
+async def aask_supervisor_llm(message: str) -> str:
+    route = await get_supervisor_chain().ainvoke(
+        {
+            "members": ", ".join(members),
+            "messages": [HumanMessage(content=message)],
+        }
+    )
+    return route["next"]
+
+
+@component
+def get_fast_router():
+    return FastRouter(get_embedding_model(), escalate=ask_supervisor_llm)
+
+
+def _print_decision(route: str, tier: str, task: str | None = None):
+    task_line = f"\nTask: {task}" if task else ""
+    print(
+        f"\n--- SUPERVISOR DECISION ---{task_line}\nRoute: {route} (decided by: {tier})"
+        "\n--- END DECISION ---\n"
+    )
+
+
+def route_request(message: str, task: str | None = None) -> str:
+    """Picks the agent for one request (or one sub-task of it)."""
+    with tracing.span("route", tracing.ROUTER) as span:
+        if config.FAST_ROUTER_ENABLED:
+            route, tier = get_fast_router().route(message)
+        else:
+            route, tier = ask_supervisor_llm(message), "llm"
+        span.set(agent=route, tier=tier)
+    metrics.ROUTES.inc(agent=route, tier=tier)
+    _print_decision(route, tier, task)
+    return route
+
+
+async def aroute_request(message: str, task: str | None = None) -> str:
+    with tracing.span("route", tracing.ROUTER) as span:
+        if config.FAST_ROUTER_ENABLED:
+            route, tier = await get_fast_router().aroute(message, aask_supervisor_llm)
+        else:
+            route, tier = await aask_supervisor_llm(message), "llm"
+        span.set(agent=route, tier=tier)
+    metrics.ROUTES.inc(agent=route, tier=tier)
+    _print_decision(route, tier, task)
+    return route
+
+
+def _plan_update(plan: list[dict]) -> dict:
+    return {
+        "next": plan[0]["agent"] if plan else "FINISH",
+        "plan": plan,
+        "results": None,
+    }
+
+
+def router(state):
+    """
+    Splits the request into sub-tasks and routes each of them. A plain request
+    becomes a one-step plan.
+    """
+    last_message = state["messages"][-1].content
+    plan = plan_request(last_message, lambda task: route_request(task, task))
+    return _plan_update(plan)
+
+
+async def arouter(state):
+    last_message = state["messages"][-1].content
+    plan = await aplan_request(last_message, lambda task: aroute_request(task, task))
+    return _plan_update(plan)
+
+
+def dispatch(state):
+    """
+    Sends every sub-task whose prerequisites have finished to its agent; those
+    run in parallel. Once the plan is done, multi-step results are merged.
+
+    Sub-tasks that refer to the earlier conversation ("add a note to that
+    deal") get it as context; see memory.conversation_context.
+    """
+    plan, results = state.get("plan") or [], state.get("results") or []
+    steps = ready_steps(plan, results)
+    if steps:
+        return [
+            Send(
+                step["agent"],
+                {
+                    "messages": [
+                        HumanMessage(content=task_with_context(step, results))
+                    ],
+                    "step": step["id"],
+                    "context": conversation_context(state, step["task"]),
+                },
+            )
+            for step in steps
+        ]
+    return "merge" if len(plan) > 1 else "memory"
 
 
-# --- Graph Definition (NO CHANGES NEEDED) ---
+# Name of the message that combines the replies of a multi-step plan.
+MERGED_REPLY_NAME = "Breeze AI"
+
+
+def merge_node(state):
+    reply = merge_results(state["plan"], state["results"])
+    return {
+        "messages": [
+            BaseMessage(content=reply, type="assistant", name=MERGED_REPLY_NAME)
+        ]
+    }
+
+
+# --- Graph Definition ---
+# Every node has a sync and an async implementation: `invoke`/`stream` on the
+# graph use the former, `ainvoke`/`astream` the latter, so the async path never
+# blocks the event loop on an LLM, embedding or Pipedrive call.
+#
+# The supervisor plans the request; `dispatch` fans the ready sub-tasks out to
+# the agent nodes with `Send`, and runs again in `collect` after every wave, so
+# independent sub-tasks run concurrently and dependent ones in order.
 graph = StateGraph(AgentState)
-graph.add_node("supervisor", router)
-graph.add_node("Sales Agent", sales_agent_node)
-graph.add_node("Marketing Agent", marketing_agent_node)
-graph.add_node("Service Agent", service_agent_node)
+graph.add_node("supervisor", RunnableLambda(router, afunc=arouter))
+graph.add_node("Sales Agent", RunnableLambda(sales_agent_node, afunc=asales_agent_node))
+graph.add_node(
+    "Marketing Agent",
+    RunnableLambda(marketing_agent_node, afunc=amarketing_agent_node),
+)
+graph.add_node(
+    "Service Agent", RunnableLambda(service_agent_node, afunc=aservice_agent_node)
+)
+graph.add_node("collect", lambda state: {})
+graph.add_node("merge", merge_node)
+graph.add_node("memory", RunnableLambda(compact_memory, afunc=acompact_memory))
 
 graph.set_entry_point("supervisor")
 
-graph.add_conditional_edges(
-    "supervisor",
-    lambda state: state["next"],
-    {
-        "Sales Agent": "Sales Agent",
-        "Marketing Agent": "Marketing Agent",
-        "Service Agent": "Service Agent",
-        "FINISH": END,
-    },
-)
+dispatch_targets = members + ["merge", "memory"]
+graph.add_conditional_edges("supervisor", dispatch, dispatch_targets)
+graph.add_conditional_edges("collect", dispatch, dispatch_targets)
 
-graph.add_edge("Sales Agent", END)
-graph.add_edge("Marketing Agent", END)
-graph.add_edge("Service Agent", END)
+graph.add_edge("Sales Agent", "collect")
+graph.add_edge("Marketing Agent", "collect")
+graph.add_edge("Service Agent", "collect")
+graph.add_edge("merge", "memory")
+graph.add_edge("memory", END)
 
+# Stateless: every call is a new conversation.
 supervisor_graph = graph.compile()
+
+
+@component
+def get_conversation_graph():
+    """
+    The same graph with a checkpointer, for chat sessions: each call with a
+    `thread_id` continues that session's conversation (see src/memory.py).
+    """
+    return graph.compile(checkpointer=get_conversation_memory().checkpointer)
+
+
+# Agents whose reply is exactly the text of their user-facing LLM call, so its
+# tokens can be shown while they are generated. The Sales Agent's LLM calls are
+# tool-calling (or ReAct) steps; its reply is only shown once it has finished.
+STREAMING_AGENTS = {"Marketing Agent", "Service Agent"}
+
+
+async def astream_reply(message: str, session_id: str | None = None):
+    """
+    Runs the graph on the async path for one user message and streams the reply.
+    With a `session_id` (and MEMORY_ENABLED), the message continues that chat
+    session's conversation; without one it is answered on its own.
+
+    Yields:
+        tuple: (agent name, text, done). While an agent generates, `text` is the
+        next token (done=False); when it finishes, `text` is its complete reply
+        (done=True). Replies that were not generated token by token (cached RAG
+        answers, deal lookups, the Sales Agent) only arrive with done=True.
+
+        For a multi-step plan, the sub-task results arrive as done=False chunks
+        in the order they finish, and the merged reply with done=True.
+
+    With TRACING_ENABLED, the turn is recorded as one trace (see src/tracing.py).
+    """
+    metrics.ACTIVE_SESSIONS.inc()
+    start = time.perf_counter()
+    status = "error"
+    try:
+        with tracing.start_trace("chat turn", message=message):
+            async for reply in _astream_graph(message, session_id):
+                yield reply
+        status = "ok"
+    except (GeneratorExit, asyncio.CancelledError):
+        # The UI stopped reading, e.g. because the user left.
+        status = "cancelled"
+        raise
+    finally:
+        metrics.ACTIVE_SESSIONS.dec()
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - start)
+        metrics.REQUESTS.inc(status=status)
+
+
+async def _astream_graph(message: str, session_id: str | None = None):
+    initial_state = {"messages": [HumanMessage(content=message)]}
+    app, run_config, options = supervisor_graph, None, {}
+    if session_id is not None and config.MEMORY_ENABLED:
+        memory = get_conversation_memory()
+        await asyncio.to_thread(memory.touch, session_id)
+        app = get_conversation_graph()
+        run_config = {"configurable": {"thread_id": str(session_id)}}
+        # One checkpoint write per turn instead of one per step.
+        options["durability"] = "exit"
+    plan = []
+    streamed_steps = 0
+    async for mode, chunk in app.astream(
+        initial_state, run_config, stream_mode=["messages", "updates"], **options
+    ):
+        if mode == "messages":
+            token, metadata = chunk
+            agent = metadata.get("langgraph_node")
+            if (
+                len(plan) <= 1
+                and agent in STREAMING_AGENTS
+                and USER_FACING_TAG in metadata.get("tags", ())
+                and isinstance(token, AIMessageChunk)
+                and token.content
+            ):
+                yield agent, token.content, False
+            continue
+        for node, update in chunk.items():
+            update = update or {}
+            if node == "supervisor":
+                plan = update.get("plan") or []
+                continue
+            if node == "memory":
+                continue
+            if len(plan) > 1 and node in members:
+                for result in update.get("results", ()):
+                    separator = "\n\n" if streamed_steps else ""
+                    streamed_steps += 1
+                    step = plan[result["step"]]
+                    text = format_result(step, result["content"])
+                    yield MERGED_REPLY_NAME, separator + text, False
+                continue
+            for reply in update.get("messages", ()):
+                if reply.name and reply.name != "supervisor":
+                    yield reply.name, reply.content, True
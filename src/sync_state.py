@@ -0,0 +1,124 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from . import config
+
+
+class SyncState:
+    """
+    Local bookkeeping for incremental ingestion, stored in SQLite.
+
+    For every ingested deal it records the hash of the document content and the
+    number of vector chunks written for it, plus a watermark: the latest deal
+    `update_time` seen by a completed sync.
+    """
+
+    def __init__(self, path: str = config.SYNC_STATE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.RLock()
+        self._deferred = False
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS deals ("
+            " deal_id INTEGER PRIMARY KEY,"
+            " content_hash TEXT NOT NULL,"
+            " chunk_count INTEGER NOT NULL,"
+            " update_time TEXT)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        self._db.commit()
+
+    def _commit(self):
+        if not self._deferred:
+            self._db.commit()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Groups every write made inside the block into one SQLite transaction.
+
+        Used with vector stores that only become durable when persisted at the
+        end of a run: if the run fails, the recorded hashes roll back with it.
+        """
+        with self._lock:
+            self._deferred = True
+        try:
+            yield self
+        except BaseException:
+            with self._lock:
+                self._db.rollback()
+            raise
+        else:
+            with self._lock:
+                self._db.commit()
+        finally:
+            with self._lock:
+                self._deferred = False
+
+    def get_watermark(self):
+        """Returns the stored update_time watermark, or None before the first sync."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM meta WHERE key = 'watermark'"
+            ).fetchone()
+        return row[0] if row else None
+
+    def set_watermark(self, value: str):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('watermark', ?)",
+                (value,),
+            )
+            self._commit()
+
+    def get_deals(self, deal_ids) -> dict:
+        """Returns {deal_id: (content_hash, chunk_count)} for the known deals."""
+        deal_ids = list(deal_ids)
+        found = {}
+        with self._lock:
+            for i in range(0, len(deal_ids), 500):
+                chunk = deal_ids[i : i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._db.execute(
+                    "SELECT deal_id, content_hash, chunk_count FROM deals "
+                    f"WHERE deal_id IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+                for deal_id, content_hash, chunk_count in rows:
+                    found[deal_id] = (content_hash, chunk_count)
+        return found
+
+    def all_deal_ids(self) -> set:
+        with self._lock:
+            rows = self._db.execute("SELECT deal_id FROM deals").fetchall()
+        return {row[0] for row in rows}
+
+    def upsert_deals(self, rows):
+        """Records (deal_id, content_hash, chunk_count, update_time) tuples."""
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO deals "
+                "(deal_id, content_hash, chunk_count, update_time) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._commit()
+
+    def delete_deals(self, deal_ids):
+        with self._lock:
+            self._db.executemany(
+                "DELETE FROM deals WHERE deal_id = ?", [(i,) for i in deal_ids]
+            )
+            self._commit()
+
+    def clear(self):
+        """Forgets every deal and the watermark (used before a full rebuild)."""
+        with self._lock:
+            self._db.execute("DELETE FROM deals")
+            self._db.execute("DELETE FROM meta")
+            self._commit()
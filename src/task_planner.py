@@ -0,0 +1,176 @@
+import asyncio
+import re
+
+from . import config
+
+# Words a clause has to start with to count as a separate request; anything
+# else after an "and" is part of the previous clause ("value and status of ...").
+ACTION_WORDS = {
+    "add",
+    "append",
+    "log",
+    "record",
+    "note",
+    "update",
+    "mark",
+    "set",
+    "change",
+    "move",
+    "close",
+    "create",
+    "draft",
+    "write",
+    "compose",
+    "prepare",
+    "send",
+    "reply",
+    "respond",
+    "answer",
+    "summarize",
+    "summarise",
+    "tell",
+    "show",
+    "find",
+    "get",
+    "list",
+    "give",
+    "check",
+    "look",
+    "what",
+    "who",
+    "which",
+    "how",
+    "when",
+    "where",
+    "is",
+    "are",
+    "does",
+    "do",
+    "can",
+    "please",
+}
+
+# Clause boundaries: ";", "and", "also", "then" (optionally after a comma).
+_SEPARATOR = re.compile(
+    r"\s*;\s*(?:and\s+)?(?:(?:then|also)\s+)?"
+    r"|,?\s+(?:and\s+)?(?:then|also)\s+|,?\s+and\s+",
+    re.IGNORECASE,
+)
+# Quoted text (note contents, email topics) is never split.
+_QUOTED = re.compile(r"\"[^\"]*\"|“[^”]*”|(?<!\w)'[^']*'(?!\w)")
+# A clause referring back to an earlier one has to wait for its result.
+# "that" and "this" only count before a noun for a CRM record or an output
+# ("that deal"), or on their own after an action ("summarize this"), not as
+# relative pronouns or other determiners ("deals that are open", "this
+# quarter").
+_BACK_REFERENCE = re.compile(
+    r"\b(?:it|its|them|those|these|the result|the above|the same)\b"
+    r"|\b(?:that|this)\s+(?:deals?|ones?|notes?|contacts?|customers?|clients?"
+    r"|compan(?:y|ies)|organi[sz]ations?|orgs?|persons?|people|owners?|emails?"
+    r"|repl(?:y|ies)|results?|answers?|summary|list|drafts?)\b"
+    rf"|\b(?:{'|'.join(sorted(ACTION_WORDS))})\s+(?:that|this)\b"
+    r"(?=\s*(?:$|[.,;:!?]|(?:to|for|with|as|in|into|on|about)\b))",
+    re.IGNORECASE,
+)
+
+
+def split_request(text: str, max_tasks: int = config.MULTI_INTENT_MAX_TASKS):
+    """
+    Splits a request into clauses at conjunctions that start a new action.
+
+    Returns:
+        list: (clause, depends_on_previous) tuples. A clause depends on the one
+        before it when it was joined with "then" or refers back to it ("it",
+        "that deal", ...). A plain request yields a single clause.
+    """
+    quoted = [m.span() for m in _QUOTED.finditer(text)]
+    clauses = []
+    start = 0
+    dependent = False
+    for match in _SEPARATOR.finditer(text):
+        if any(a <= match.start() < b for a, b in quoted):
+            continue
+        rest = text[match.end() :].lstrip()
+        first_word = re.match(r"[a-z']+", rest.lower())
+        if not first_word or first_word.group() not in ACTION_WORDS:
+            continue
+        clauses.append((text[start : match.start()].strip(), dependent))
+        separator = match.group().lower()
+        start = match.end()
+        dependent = "then" in separator
+    clauses.append((text[start:].strip(), dependent))
+
+    clauses = [
+        (clause, dependent or (i > 0 and bool(_BACK_REFERENCE.search(clause))))
+        for i, (clause, dependent) in enumerate(clauses)
+        if clause
+    ]
+    if len(clauses) > max_tasks:
+        # Too many pieces: keep the tail together as the last sub-task.
+        tail = " and ".join(clause for clause, _ in clauses[max_tasks - 1 :])
+        clauses = clauses[: max_tasks - 1] + [(tail, clauses[max_tasks - 1][1])]
+    return clauses
+
+
+def _build_plan(clauses, agents) -> list[dict]:
+    plan = []
+    for (clause, dependent), agent in zip(clauses, agents):
+        if agent == "FINISH":
+            continue
+        after = [plan[-1]["id"]] if dependent and plan else []
+        plan.append({"id": len(plan), "agent": agent, "task": clause, "after": after})
+    return plan
+
+
+def plan_request(text: str, route) -> list[dict]:
+    """
+    Turns a request into a plan: a list of sub-tasks
+    {"id", "agent", "task", "after"}, where `after` holds the ids of the steps
+    that have to finish first. `route(text)` picks the agent of each clause.
+    Agents that decide "FINISH" are dropped.
+    """
+    clauses = split_request(text) if config.MULTI_INTENT_ENABLED else [(text, False)]
+    if len(clauses) == 1:
+        clauses = [(text, False)]
+    return _build_plan(clauses, [route(clause) for clause, _ in clauses])
+
+
+async def aplan_request(text: str, aroute) -> list[dict]:
+    """Async version of `plan_request`; the clauses are routed concurrently."""
+    clauses = split_request(text) if config.MULTI_INTENT_ENABLED else [(text, False)]
+    if len(clauses) == 1:
+        clauses = [(text, False)]
+    agents = await asyncio.gather(*(aroute(clause) for clause, _ in clauses))
+    return _build_plan(clauses, agents)
+
+
+def ready_steps(plan: list[dict], results: list[dict]) -> list[dict]:
+    """Steps that have not run yet and whose prerequisites have all finished."""
+    done = {result["step"] for result in results}
+    return [
+        step
+        for step in plan
+        if step["id"] not in done and all(dep in done for dep in step["after"])
+    ]
+
+
+def task_with_context(step: dict, results: list[dict]) -> str:
+    """The input of a step, followed by the results of the steps it waited for."""
+    earlier = [r["content"] for r in results if r["step"] in step["after"]]
+    if not earlier:
+        return step["task"]
+    return step["task"] + "\n\nResult of the previous step:\n" + "\n\n".join(earlier)
+
+
+def format_result(step: dict, content: str) -> str:
+    return f"**{step['agent']}** — {step['task']}\n{content}"
+
+
+def merge_results(plan: list[dict], results: list[dict]) -> str:
+    """Combines the results of a multi-step plan into one reply, in plan order."""
+    by_step = {result["step"]: result["content"] for result in results}
+    return "\n\n".join(
+        format_result(step, by_step[step["id"]])
+        for step in plan
+        if step["id"] in by_step
+    )
@@ -0,0 +1,230 @@
+import functools
+import json
+import re
+
+from pydantic import TypeAdapter, ValidationError
+
+# The "Action Input:" label and code fence an agent may put before its input.
+_PREFIX = re.compile(
+    r"\s*(?:action\s+input\s*:)?\s*(?:```(?:json)?)?\s*", re.IGNORECASE
+)
+# Built once: json.loads(text, strict=False) builds a new decoder per call.
+_DECODER = json.JSONDecoder(strict=False)
+_IDENTIFIER = re.compile(r"[A-Za-z_][\w-]*")
+_SPACE = re.compile(r"\s*")
+# What may follow the closing quote of a single-quoted string; any other quote
+# character inside it is an apostrophe ('Client's budget').
+_AFTER_STRING = re.compile(r"\s*(?:[,:}\]=]|$)")
+_TRAILING_COMMA = re.compile(r"\s*[}\]]")
+# Python and JSON literals, as JSON.
+_LITERALS = {
+    "True": "true",
+    "False": "false",
+    "None": "null",
+    "true": "true",
+    "false": "false",
+    "null": "null",
+}
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+def _unwrap(text: str) -> str:
+    """The text without the label and code fence around it."""
+    text = text[_PREFIX.match(text).end() :].rstrip()
+    return text.removesuffix("```").rstrip()
+
+
+def _string_end(text: str, i: int, quote: str) -> int:
+    """Index of the quote closing the string opened at text[i], or len(text)."""
+    i += 1
+    while i < len(text):
+        char = text[i]
+        if char == "\\":
+            i += 2
+            continue
+        if char == quote and (quote == '"' or _AFTER_STRING.match(text, i + 1)):
+            return i
+        i += 1
+    return len(text)
+
+
+def extract_object(text: str):
+    """
+    The first complete {...} object in `text`, found in a single pass that
+    skips braces inside strings, so trailing text ("}\\nObservation: ...")
+    does not end up in it. An object cut off at the end of the text (a
+    truncated reply) is closed. None if the text has no "{".
+    """
+    start = text.find("{")
+    if start < 0:
+        return None
+    expected = []
+    i = start
+    while i < len(text):
+        char = text[i]
+        if char in "\"'":
+            end = _string_end(text, i, char)
+            if end == len(text):
+                return text[start:] + char + "".join(reversed(expected))
+            i = end
+        elif char in _CLOSERS:
+            expected.append(_CLOSERS[char])
+        elif expected and char == expected[-1]:
+            expected.pop()
+            if not expected:
+                return text[start : i + 1]
+        i += 1
+    return text[start:] + "".join(reversed(expected))
+
+
+def repair_json(text: str) -> str:
+    """
+    Rewrites the JSON-like object text LLMs produce into JSON: single-quoted
+    strings, unquoted keys and bare words, `key=value`, Python literals
+    (True, None) and trailing commas.
+    """
+    out = []
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if char == '"':
+            end = _string_end(text, i, '"')
+            out.append(text[i : end + 1])
+            i = end + 1
+        elif char == "'":
+            end = _string_end(text, i, "'")
+            out.append(json.dumps(text[i + 1 : end].replace("\\'", "'")))
+            i = end + 1
+        elif char == "=":
+            out.append(":")
+            i += 1
+        elif char == ",":
+            # A comma before a closing bracket is dropped.
+            if not _TRAILING_COMMA.match(text, i + 1):
+                out.append(char)
+            i += 1
+        elif char.isalpha() or char == "_":
+            word = _IDENTIFIER.match(text, i).group(0)
+            after = _SPACE.match(text, i + len(word)).end()
+            if after < len(text) and text[after] in ":=":
+                out.append(json.dumps(word))
+                i += len(word)
+            elif word in _LITERALS:
+                out.append(_LITERALS[word])
+                i += len(word)
+            else:
+                # A bare value runs to the next separator: {status: won}.
+                end = i
+                while end < len(text) and text[end] not in ",}]\n":
+                    end += 1
+                out.append(json.dumps(text[i:end].strip()))
+                i = end
+        else:
+            out.append(char)
+            i += 1
+    return "".join(out)
+
+
+@functools.cache
+def _adapter(model) -> TypeAdapter:
+    return TypeAdapter(model)
+
+
+@functools.cache
+def _key_pattern(model) -> re.Pattern:
+    """Matches a field name of the model followed by "=" or ":"."""
+    names = sorted(model.model_fields, key=len, reverse=True)
+    return re.compile(
+        r"(?<![\w-])[\"']?(" + "|".join(map(re.escape, names)) + r")[\"']?\s*[=:]\s*"
+    )
+
+
+def _key_values(text: str, model) -> dict:
+    """
+    Arguments written without braces ("deal_id=5, content=Call back Monday"),
+    split at the model's field names so values may contain commas.
+    """
+    matches = list(_key_pattern(model).finditer(text))
+    values = {}
+    for match, following in zip(matches, matches[1:] + [None]):
+        end = following.start() if following else len(text)
+        value = text[match.end() : end].strip().rstrip(",;").strip()
+        if value[:1] in ("[", "{"):
+            try:
+                value = _DECODER.decode(repair_json(value))
+            except ValueError:
+                pass
+        elif len(value) > 1 and value[0] == value[-1] and value[0] in "\"'":
+            value = value[1:-1]
+        values[match.group(1)] = value
+    return values
+
+
+def _loads(text: str):
+    try:
+        return _DECODER.decode(text)
+    except ValueError:
+        return None
+
+
+def decode_object(tool_input: str, model=None):
+    """
+    The arguments dict in a raw tool input, or None. Well-formed JSON takes
+    the fast path (one json.loads); otherwise the object is extracted and
+    repaired. Input without braces is read, for `model`, from key=value pairs;
+    an object that cannot be repaired is not, since splitting it at the keys
+    would keep its JSON punctuation in the values.
+    """
+    text = _unwrap(tool_input)
+    data = _loads(text) if text[:1] in ("{", '"') else None
+    if isinstance(data, str):
+        # A JSON string holding the JSON object: '"{\\"deal_id\\": 5}"'.
+        text = _unwrap(data)
+        data = _loads(text)
+    if isinstance(data, dict):
+        return data
+    snippet = extract_object(text)
+    if snippet is not None:
+        data = _loads(snippet)
+        if not isinstance(data, dict):
+            data = _loads(repair_json(snippet))
+        return data if isinstance(data, dict) else None
+    if model is not None:
+        return _key_values(text, model) or None
+    return None
+
+
+def _keys(model) -> str:
+    return ", ".join(f"'{name}'" for name in model.model_fields)
+
+
+def decode_arguments(tool_input, model):
+    """
+    Decodes and validates the arguments of a tool from the agent's raw input
+    (or an already parsed dict), with the model's cached TypeAdapter.
+
+    Returns:
+        tuple: The validated model and None, or None and an error message that
+        tells the agent what input is expected.
+    """
+    if isinstance(tool_input, dict):
+        data = tool_input
+    else:
+        data = decode_object(str(tool_input), model)
+        if data is None:
+            message = (
+                "Error: Could not read a JSON object from the tool input. "
+                f"Send one JSON object with the keys {_keys(model)}. "
+                f"Received: '{tool_input}'"
+            )
+            return None, message
+    # Models often send null for the optional arguments they do not use.
+    data = {key: value for key, value in data.items() if value is not None}
+    try:
+        return _adapter(model).validate_python(data), None
+    except ValidationError as e:
+        message = (
+            f"Error: Invalid tool arguments: {e}. Expected a JSON object with "
+            f"the keys {_keys(model)}. Parsed dict: {data}"
+        )
+        return None, message
@@ -1,17 +1,46 @@
-import json
+import datetime
 import re  # <-- Add this import
-from langchain.tools import Tool
-from pydantic import BaseModel, Field
-# from typing import Union, Dict
+from typing import Literal
+
+from langchain.tools import StructuredTool, Tool
+from pydantic import BaseModel, Field, field_validator, model_validator
 
+# from typing import Union, Dict
+from src import config
+from src.crm_connector import (
+    abulk_create_notes,
+    abulk_update_deal_status,
+    acreate_note_on_deal,
+    aupdate_deal_status,
+    bulk_create_notes,
+    bulk_update_deal_status,
+    create_note_on_deal,
+    update_deal_status,
+)
+from src.deal_analytics import PERIODS, get_deal_analytics
+from src.deal_documents import format_deal_to_document
+from src.deal_index import get_deal_index
+from src.deal_store import get_deal_store
 from src.rag_chain import get_rag_chain
-from src.crm_connector import create_note_on_deal, update_deal_status
+from src.semantic_cache import get_answer_cache
+from src.tools.arg_decoder import decode_arguments
 
 # --- Tool 1: CRM Information Lookup (Unchanged, minor func direct call update) ---
-rag_chain = get_rag_chain()
+
+
+def run_crm_rag_tool(question: str) -> str:
+    """Answers a CRM question with the RAG chain, which is built on first use."""
+    return get_rag_chain().invoke(question)
+
+
+async def arun_crm_rag_tool(question: str) -> str:
+    return await get_rag_chain().ainvoke(question)
+
+
 crm_rag_tool = Tool(
     name="CRM_Information_Lookup",
-    func=rag_chain.invoke,
+    func=run_crm_rag_tool,
+    coroutine=arun_crm_rag_tool,
     description="Use this tool to answer any questions about CRM deals, such as status, value, owner, or contacts. The input should be a clear question (e.g., 'What are the details of the deal for Acme Corp?').",
 )
 
@@ -19,72 +48,55 @@ crm_rag_tool = Tool(
 
 
 class CreateNoteInput(BaseModel):
-    deal_id: int
-    content: str
+    deal_id: int = Field(description="The integer ID of the deal to add the note to.")
+    content: str = Field(description="The text of the note.")
+
+
+def _create_note_result_message(deal_id: int, result) -> str:
+    if result:
+        return f"Successfully created the note on deal ID {deal_id}."
+    else:
+        return f"Failed to create the note on deal ID {deal_id}. Pipedrive API returned no success data."
 
 
 def run_create_note_tool(tool_input: str) -> str:
     """
-    Parses a JSON string input, validates it, and executes the
-    create_note_on_deal function. Robustly handles common LLM output parsing quirks,
-    including extraneous characters/newlines from the AgentExecutor.
+    Decodes and validates the tool input (see arg_decoder), and executes the
+    create_note_on_deal function.
     """
-    cleaned_input = tool_input.strip()
-    json_str_to_parse = None
-
-    # --- Step 1: Robustly extract the JSON object from the input string ---
-    # This regex looks for the content between the first '{' and the last '}'
-    # It's designed to ignore leading/trailing non-JSON characters or extra text.
-    # The re.DOTALL flag is crucial to allow '.' to match newlines within the JSON content.
-    match = re.search(r"\{.*\}", cleaned_input, re.DOTALL)
-    if match:
-        json_str_to_parse = match.group(0)
-
-    if json_str_to_parse is None:
-        # If no direct {..} object was found, it's a severe parsing problem or bad LLM output
-        return f"Error: Critical: Could not extract a JSON object (missing braces) from the tool input. Received: '{tool_input}'"
-
-    # --- Step 2: Attempt to parse the extracted JSON string ---
-    input_dict = {}
-    try:
-        # Attempt to load it directly as a JSON object
-        input_dict = json.loads(json_str_to_parse)
-    except json.JSONDecodeError:
-        # If direct loading fails, it might be a JSON string *literal* that needs double-parsing
-        # e.g., LLM produced '"{\"key\":\"value\"}"' (a string of a JSON string)
-        try:
-            # First, load the outer string (which should result in the inner JSON string)
-            inner_json_str = json.loads(json_str_to_parse)
-            # Then, load the inner JSON string
-            input_dict = json.loads(inner_json_str)
-        except (json.JSONDecodeError, TypeError) as e:
-            return f"Error: Failed to parse extracted content as valid JSON (tried direct and double-decode). Details: {e}. Attempted to parse: '{json_str_to_parse}'"
-
-    # --- Step 3: Validate with Pydantic and execute ---
-    try:
-        validated_input = CreateNoteInput(**input_dict)
+    validated_input, error = decode_arguments(tool_input, CreateNoteInput)
+    if error:
+        return error
 
+    try:
         result = create_note_on_deal(
             deal_id=validated_input.deal_id, content=validated_input.content
         )
+        return _create_note_result_message(validated_input.deal_id, result)
+    except Exception as e:
+        return f"An error occurred during note creation: {e}."
 
-        if result:
-            return (
-                f"Successfully created the note on deal ID {validated_input.deal_id}."
-            )
-        else:
-            return f"Failed to create the note on deal ID {validated_input.deal_id}. Pipedrive API returned no success data."
 
+async def arun_create_note_tool(tool_input: str) -> str:
+    """Async version of run_create_note_tool (non-blocking Pipedrive call)."""
+    validated_input, error = decode_arguments(tool_input, CreateNoteInput)
+    if error:
+        return error
+
+    try:
+        result = await acreate_note_on_deal(
+            deal_id=validated_input.deal_id, content=validated_input.content
+        )
+        return _create_note_result_message(validated_input.deal_id, result)
     except Exception as e:
-        # Catches Pydantic validation errors (e.g., if deal_id is not an int)
-        # or issues with the create_note_on_deal function itself
-        return f"An error occurred during note creation or validation: {e}. Parsed dict: {input_dict}"
+        return f"An error occurred during note creation: {e}."
 
 
 # The Tool definition (still no args_schema)
 create_crm_note_tool = Tool(
     name="create_crm_note",
     func=run_create_note_tool,
+    coroutine=arun_create_note_tool,
     description=(
         "Use this tool to add a new note to a specific CRM deal. "
         "The input to this tool MUST be a single, valid JSON string. "
@@ -101,44 +113,553 @@ class UpdateDealStatusInput(BaseModel):
     )
 
 
+def _update_deal_status_result_message(validated_input, result) -> str:
+    if result:
+        # Cached answers about this deal would now report the old status.
+        get_answer_cache().invalidate_deals([validated_input.deal_id])
+        return f"Successfully updated status for deal ID {validated_input.deal_id} to '{validated_input.status}'."
+    else:
+        return f"Failed to update status for deal ID {validated_input.deal_id}."
+
+
 def run_update_deal_status_tool(tool_input: str) -> str:
     """
-    (FIXED) Wrapper for updating a deal's status. Now uses the same robust parsing
-    logic as the proven create_crm_note tool.
+    Wrapper for updating a deal's status, with the same argument decoding as
+    the create_crm_note tool.
     """
-    cleaned_input = tool_input.strip()
-    match = re.search(r"\{.*\}", cleaned_input, re.DOTALL)
-    if not match:
-        return f"Error: Could not extract a JSON object from the tool input. Received: '{tool_input}'"
-
-    json_str_to_parse = match.group(0)
+    validated_input, error = decode_arguments(tool_input, UpdateDealStatusInput)
+    if error:
+        return error
 
     try:
-        input_dict = json.loads(json_str_to_parse)
-    except json.JSONDecodeError:
-        try:
-            input_dict = json.loads(json.loads(json_str_to_parse))
-        except (json.JSONDecodeError, TypeError) as e:
-            return f"Error: Failed to parse extracted content as valid JSON. Details: {e}. Attempted to parse: '{json_str_to_parse}'"
+        result = update_deal_status(
+            deal_id=validated_input.deal_id, status=validated_input.status
+        )
+        return _update_deal_status_result_message(validated_input, result)
+    except Exception as e:
+        return f"An error occurred during status update: {e}."
+
+
+async def arun_update_deal_status_tool(tool_input: str) -> str:
+    """Async version of run_update_deal_status_tool (non-blocking Pipedrive call)."""
+    validated_input, error = decode_arguments(tool_input, UpdateDealStatusInput)
+    if error:
+        return error
 
     try:
-        validated_input = UpdateDealStatusInput(**input_dict)
-        result = update_deal_status(
+        result = await aupdate_deal_status(
             deal_id=validated_input.deal_id, status=validated_input.status
         )
-        if result:
-            return f"Successfully updated status for deal ID {validated_input.deal_id} to '{validated_input.status}'."
-        else:
-            return f"Failed to update status for deal ID {validated_input.deal_id}."
+        return _update_deal_status_result_message(validated_input, result)
     except Exception as e:
-        return f"An error occurred during status update or validation: {e}. Parsed dict: {input_dict}"
+        return f"An error occurred during status update: {e}."
 
 
 update_deal_status_tool = Tool(
     name="update_deal_status",
     func=run_update_deal_status_tool,
+    coroutine=arun_update_deal_status_tool,
     description="Use this tool to update the status of a specific CRM deal. The input must be a valid JSON string with 'deal_id' (integer) and 'status' (string: 'open', 'won', or 'lost') as keys.",
 )
 
-# --- Final, Updated Toolbox (NO CHANGES) ---
-sales_agent_tools = [crm_rag_tool, create_crm_note_tool, update_deal_status_tool]
+# --- Bulk write tools: one action for many deals ---
+
+
+_DEAL_ID_RANGE = re.compile(r"(\d+)(?:\s*[-–]\s*(\d+))?")
+
+
+def _expand_deal_ids(value):
+    """
+    Accepts deal IDs as a list of integers and/or ranges ([10, "12-15"]) or as
+    a string ("10-60", "3, 5, 8") and returns the list of integers.
+    """
+    if isinstance(value, (int, str)):
+        value = [value]
+    deal_ids = []
+    for item in value or []:
+        if isinstance(item, int):
+            deal_ids.append(item)
+            continue
+        for match in _DEAL_ID_RANGE.finditer(str(item)):
+            low, high = match.groups()
+            if high is None:
+                deal_ids.append(int(low))
+            else:
+                low, high = sorted((int(low), int(high)))
+                deal_ids.extend(range(low, high + 1))
+    return deal_ids
+
+
+class _BulkInput(BaseModel):
+    deal_ids: list[int] = Field(
+        default_factory=list,
+        description="Deal IDs; ranges like '10-60' are expanded.",
+    )
+
+    _expand = field_validator("deal_ids", mode="before")(_expand_deal_ids)
+
+    def check_size(self, items: list):
+        if not items:
+            raise ValueError("no deals given")
+        if len(items) > config.PIPEDRIVE_BULK_MAX_ITEMS:
+            raise ValueError(
+                f"{len(items)} deals given, at most "
+                f"{config.PIPEDRIVE_BULK_MAX_ITEMS} per call"
+            )
+        return items
+
+
+class BulkCreateNotesInput(_BulkInput):
+    content: str | None = Field(
+        default=None, description="Note added to every deal_id."
+    )
+    notes: list[CreateNoteInput] = Field(default_factory=list)
+
+    def items(self) -> list[tuple[int, str]]:
+        items = [(note.deal_id, note.content) for note in self.notes]
+        if self.deal_ids:
+            if not self.content:
+                raise ValueError("'content' is required with 'deal_ids'")
+            items += [(deal_id, self.content) for deal_id in self.deal_ids]
+        return self.check_size(items)
+
+
+class BulkUpdateDealStatusInput(_BulkInput):
+    status: str | None = Field(default=None, description="Status set on every deal_id.")
+    updates: list[UpdateDealStatusInput] = Field(default_factory=list)
+
+    def items(self) -> list[tuple[int, str]]:
+        items = [(update.deal_id, update.status) for update in self.updates]
+        if self.deal_ids:
+            if not self.status:
+                raise ValueError("'status' is required with 'deal_ids'")
+            items += [(deal_id, self.status) for deal_id in self.deal_ids]
+        return self.check_size(items)
+
+
+def _bulk_result_message(action: str, results: list[dict]) -> str:
+    failed = [r for r in results if not r["ok"]]
+    message = (
+        f"{action}: {len(results) - len(failed)} of {len(results)} deals succeeded."
+    )
+    if failed:
+        details = "; ".join(
+            f"deal ID {r['deal_id']}: {r['error']}" for r in failed[:20]
+        )
+        more = f" (and {len(failed) - 20} more)" if len(failed) > 20 else ""
+        message += f" Failed: {details}{more}."
+    return message
+
+
+def _bulk_status_result_message(results: list[dict]) -> str:
+    updated = [r["deal_id"] for r in results if r["ok"]]
+    if updated:
+        get_answer_cache().invalidate_deals(updated)
+    return _bulk_result_message("Bulk status update", results)
+
+
+def _bulk_items(tool_input, model):
+    """The (deal ID, value) items of a bulk request, or None and an error."""
+    validated_input, error = decode_arguments(tool_input, model)
+    if error:
+        return None, error
+    try:
+        return validated_input.items(), None
+    except ValueError as e:
+        return None, f"An error occurred during validation: {e}."
+
+
+def run_bulk_create_notes_tool(tool_input: str) -> str:
+    """Decodes the JSON input and creates all notes in one rate-limited batch."""
+    items, error = _bulk_items(tool_input, BulkCreateNotesInput)
+    if error:
+        return error
+    return _bulk_result_message("Bulk note creation", bulk_create_notes(items))
+
+
+async def arun_bulk_create_notes_tool(tool_input: str) -> str:
+    items, error = _bulk_items(tool_input, BulkCreateNotesInput)
+    if error:
+        return error
+    return _bulk_result_message("Bulk note creation", await abulk_create_notes(items))
+
+
+def run_bulk_update_deal_status_tool(tool_input: str) -> str:
+    """Decodes the JSON input and updates all deals in one rate-limited batch."""
+    items, error = _bulk_items(tool_input, BulkUpdateDealStatusInput)
+    if error:
+        return error
+    return _bulk_status_result_message(bulk_update_deal_status(items))
+
+
+async def arun_bulk_update_deal_status_tool(tool_input: str) -> str:
+    items, error = _bulk_items(tool_input, BulkUpdateDealStatusInput)
+    if error:
+        return error
+    return _bulk_status_result_message(await abulk_update_deal_status(items))
+
+
+bulk_create_notes_tool = Tool(
+    name="bulk_create_crm_notes",
+    func=run_bulk_create_notes_tool,
+    coroutine=arun_bulk_create_notes_tool,
+    description=(
+        "Use this tool to add notes to SEVERAL deals in one action instead of "
+        "calling create_crm_note once per deal. The input MUST be a single, valid "
+        "JSON string, either the same note for many deals: "
+        '{"deal_ids": [3, 7, "10-20"], "content": "..."} '
+        'or different notes: {"notes": [{"deal_id": 3, "content": "..."}, ...]}. '
+        "It reports which deals succeeded and which failed."
+    ),
+)
+
+bulk_update_deal_status_tool = Tool(
+    name="bulk_update_deal_status",
+    func=run_bulk_update_deal_status_tool,
+    coroutine=arun_bulk_update_deal_status_tool,
+    description=(
+        "Use this tool to change the status of SEVERAL deals in one action instead "
+        "of calling update_deal_status once per deal. The input MUST be a single, "
+        "valid JSON string, either one status for many deals: "
+        '{"deal_ids": ["10-60"], "status": "lost"} '
+        'or per-deal statuses: {"updates": [{"deal_id": 3, "status": "won"}, ...]}. '
+        "Status must be 'open', 'won' or 'lost'. It reports which deals succeeded "
+        "and which failed."
+    ),
+)
+
+# --- Tool 4: Structured Deal Lookup (no embeddings, no vector search) ---
+
+
+def lookup_deals_text(query: str):
+    """
+    Resolves a deal ID or a deal/organization/contact name in the query against
+    the local deal index built at ingest time.
+
+    Returns:
+        str: One line of details per matching deal, or None if nothing matched.
+    """
+    deals = get_deal_index().lookup(query)
+    if not deals:
+        return None
+    if config.DEAL_STORE_ENABLED:
+        deals = _with_snapshot_copies(deals)
+    return "\n".join(format_deal_to_document(deal).page_content for deal in deals)
+
+
+def _with_snapshot_copies(deals: list[dict]) -> list[dict]:
+    """
+    Replaces deals from the ingest-time index with their copy in the deal
+    snapshot when that one is at least as recent (e.g. after a status update
+    made through the copilot).
+    """
+    snapshot = get_deal_store().get_many(deal["id"] for deal in deals)
+    latest = []
+    for deal in deals:
+        copy = snapshot.get(deal["id"])
+        newer = copy is not None and (copy.get("update_time") or "") >= (
+            deal.get("update_time") or ""
+        )
+        latest.append(copy if newer else deal)
+    return latest
+
+
+def run_deal_lookup_tool(query: str) -> str:
+    """Wrapper for the deal lookup tool that tells the agent what to do on a miss."""
+    result = lookup_deals_text(query)
+    if result is None:
+        return (
+            "No deal matched that ID or name in the local deal index. "
+            "Use CRM_Information_Lookup for broader questions."
+        )
+    return result
+
+
+deal_lookup_tool = Tool(
+    name="CRM_Deal_Lookup",
+    func=run_deal_lookup_tool,
+    description=(
+        "Use this tool FIRST when the question refers to a specific deal by its ID "
+        "(e.g. 'deal ID 5') or by a deal title, company or contact name "
+        "(e.g. 'the deal with EmpowerMove'). It instantly returns the deal's ID, "
+        "status, value, owner and contacts. The input is the user's question. "
+        "If it finds nothing, use CRM_Information_Lookup instead."
+    ),
+)
+
+# --- Tool 5: Deal Analytics (exact aggregates over every deal) ---
+
+
+class AggregateDealsInput(BaseModel):
+    metrics: list[Literal["count", "total_value", "average_value", "win_rate"]] = Field(
+        default=["count", "total_value"], min_length=1
+    )
+    group_by: list[
+        Literal[
+            "status", "owner_name", "org_name", "currency", "month", "quarter", "year"
+        ]
+    ] = Field(default_factory=list, max_length=2)
+    status: list[Literal["open", "won", "lost"]] = Field(default_factory=list)
+    owner_name: str | None = None
+    org_name: str | None = None
+    currency: str | None = None
+    min_value: float | None = None
+    max_value: float | None = None
+    date_field: Literal["add_time", "update_time"] = "add_time"
+    period: Literal[PERIODS] | None = None
+    date_from: datetime.date | None = None
+    date_to: datetime.date | None = None
+    order_by: Literal["count", "total_value", "average_value", "win_rate"] | None = None
+    limit: int = Field(default=20, ge=1, le=100)
+
+    @field_validator("status", "group_by", "metrics", mode="before")
+    @classmethod
+    def _as_list(cls, value):
+        return [value] if isinstance(value, str) else value
+
+    @model_validator(mode="after")
+    def _rank_by_a_metric(self):
+        # Groups can only be ranked by a metric that is computed.
+        if self.order_by and self.order_by not in self.metrics:
+            self.metrics.append(self.order_by)
+        return self
+
+
+def _format_metric(metric: str, value) -> str:
+    if value is None:
+        return f"{metric} n/a (no closed deals)"
+    if metric == "count":
+        return f"count {value:,}"
+    if metric == "win_rate":
+        return f"win_rate {value:.1%}"
+    return f"{metric} {value:,.2f}"
+
+
+def _aggregate_result_message(query: AggregateDealsInput, result: dict) -> str:
+    filters = query.model_dump(
+        exclude={"metrics", "group_by", "order_by", "limit", "date_field"},
+        exclude_none=True,
+    )
+    filters = {name: value for name, value in filters.items() if value != []}
+    if "period" in filters or "date_from" in filters or "date_to" in filters:
+        filters["date_field"] = query.date_field
+    header = f"Aggregated {result['matched']:,} of {result['total']:,} deals"
+    if filters:
+        header += " where " + ", ".join(f"{k}={v}" for k, v in filters.items())
+    if result["group_by"]:
+        header += f", grouped by {', '.join(result['group_by'])}"
+    if not result["rows"]:
+        return header + ": no deals matched."
+
+    lines = [header + ":"]
+    for labels, values in result["rows"]:
+        name = " / ".join(labels) or "All matching deals"
+        lines.append(
+            f"- {name}: " + ", ".join(_format_metric(m, v) for m, v in values.items())
+        )
+    if result["groups"] > len(result["rows"]):
+        lines.append(
+            f"({result['groups'] - len(result['rows'])} more groups not shown)"
+        )
+    return "\n".join(lines)
+
+
+def run_aggregate_deals_tool(tool_input: str) -> str:
+    """Validates the query spec and aggregates it over the local deal snapshot."""
+    query, error = decode_arguments(tool_input, AggregateDealsInput)
+    if error:
+        return error
+    return aggregate_deals(query)
+
+
+def aggregate_deals(query: AggregateDealsInput) -> str:
+    if not config.DEAL_STORE_ENABLED:
+        return "Deal analytics need the local deal snapshot (DEAL_STORE_ENABLED)."
+    result = get_deal_analytics().aggregate(**query.model_dump())
+    return _aggregate_result_message(query, result)
+
+
+aggregate_deals_tool = Tool(
+    name="CRM_Deal_Analytics",
+    func=run_aggregate_deals_tool,
+    description=(
+        "Use this tool for totals, counts, averages and win rates over MANY deals "
+        "(e.g. 'total value of open deals by owner', 'win rate this quarter'). "
+        "It is exact and covers every deal, unlike CRM_Information_Lookup. The "
+        "input MUST be a single, valid JSON string with any of these keys: "
+        '"metrics" (list of "count", "total_value", "average_value", "win_rate"), '
+        '"group_by" (up to 2 of "status", "owner_name", "org_name", "currency", '
+        '"month", "quarter", "year"), filters "status" (list of "open", "won", '
+        '"lost"), "owner_name", "org_name", "currency", "min_value", "max_value", '
+        'and a time range on "date_field" ("add_time" or "update_time"): either '
+        '"period" (' + ", ".join(f'"{p}"' for p in PERIODS) + ") or "
+        '"date_from"/"date_to" (YYYY-MM-DD, inclusive). Optional "order_by" (a '
+        'metric) and "limit" (groups shown). Example: {"metrics": ["count", '
+        '"total_value"], "group_by": ["owner_name"], "status": ["open"]}'
+    ),
+)
+
+# --- Structured tools for the tool-calling Sales Agent ---
+# The same tools, with their arguments described by the Pydantic schemas above:
+# the model passes them through the tools API, already as JSON, so nothing has
+# to be extracted from free text (see SALES_AGENT_MODE).
+
+
+class QuestionInput(BaseModel):
+    question: str = Field(description="The user's question, in their words.")
+
+
+def create_note(deal_id: int, content: str) -> str:
+    result = create_note_on_deal(deal_id=deal_id, content=content)
+    return _create_note_result_message(deal_id, result)
+
+
+async def acreate_note(deal_id: int, content: str) -> str:
+    result = await acreate_note_on_deal(deal_id=deal_id, content=content)
+    return _create_note_result_message(deal_id, result)
+
+
+def set_deal_status(deal_id: int, status: str) -> str:
+    validated_input = UpdateDealStatusInput(deal_id=deal_id, status=status)
+    result = update_deal_status(deal_id=deal_id, status=status)
+    return _update_deal_status_result_message(validated_input, result)
+
+
+async def aset_deal_status(deal_id: int, status: str) -> str:
+    validated_input = UpdateDealStatusInput(deal_id=deal_id, status=status)
+    result = await aupdate_deal_status(deal_id=deal_id, status=status)
+    return _update_deal_status_result_message(validated_input, result)
+
+
+def bulk_create_notes_from(**fields) -> str:
+    items, error = _bulk_items(fields, BulkCreateNotesInput)
+    if error:
+        return error
+    return _bulk_result_message("Bulk note creation", bulk_create_notes(items))
+
+
+async def abulk_create_notes_from(**fields) -> str:
+    items, error = _bulk_items(fields, BulkCreateNotesInput)
+    if error:
+        return error
+    return _bulk_result_message("Bulk note creation", await abulk_create_notes(items))
+
+
+def bulk_update_deal_status_from(**fields) -> str:
+    items, error = _bulk_items(fields, BulkUpdateDealStatusInput)
+    if error:
+        return error
+    return _bulk_status_result_message(bulk_update_deal_status(items))
+
+
+async def abulk_update_deal_status_from(**fields) -> str:
+    items, error = _bulk_items(fields, BulkUpdateDealStatusInput)
+    if error:
+        return error
+    return _bulk_status_result_message(await abulk_update_deal_status(items))
+
+
+def aggregate_deals_from(**fields) -> str:
+    return aggregate_deals(AggregateDealsInput(**fields))
+
+
+def _validation_error_message(error) -> str:
+    return f"Error: invalid tool arguments: {error}"
+
+
+def _structured_tool(
+    tool, func, coroutine=None, args_schema=QuestionInput, description=None
+):
+    """A StructuredTool with the name (and description) of a text tool."""
+    return StructuredTool.from_function(
+        func=func,
+        coroutine=coroutine,
+        name=tool.name,
+        description=description or tool.description,
+        args_schema=args_schema,
+        # Invalid arguments are reported to the model, which can retry.
+        handle_validation_error=_validation_error_message,
+    )
+
+
+structured_deal_lookup_tool = _structured_tool(
+    deal_lookup_tool,
+    lambda question: run_deal_lookup_tool(question),
+    description=(
+        "Look up a specific deal by its ID or by a deal title, company or contact "
+        "name, and get its ID, status, value, owner and contacts. Use it FIRST "
+        "for questions about one deal; if it finds nothing, use "
+        "CRM_Information_Lookup."
+    ),
+)
+structured_aggregate_deals_tool = _structured_tool(
+    aggregate_deals_tool,
+    aggregate_deals_from,
+    args_schema=AggregateDealsInput,
+    description=(
+        "Exact totals, counts, averages and win rates over MANY deals (e.g. 'total "
+        "value of open deals by owner', 'win rate this quarter'), grouped and "
+        "filtered as requested. Covers every deal, unlike CRM_Information_Lookup."
+    ),
+)
+structured_crm_rag_tool = _structured_tool(
+    crm_rag_tool, run_crm_rag_tool, arun_crm_rag_tool
+)
+structured_create_crm_note_tool = _structured_tool(
+    create_crm_note_tool,
+    create_note,
+    acreate_note,
+    args_schema=CreateNoteInput,
+    description="Add a new note to a specific CRM deal.",
+)
+structured_update_deal_status_tool = _structured_tool(
+    update_deal_status_tool,
+    set_deal_status,
+    aset_deal_status,
+    args_schema=UpdateDealStatusInput,
+    description="Update the status of a specific CRM deal to 'open', 'won' or 'lost'.",
+)
+structured_bulk_create_notes_tool = _structured_tool(
+    bulk_create_notes_tool,
+    bulk_create_notes_from,
+    abulk_create_notes_from,
+    args_schema=BulkCreateNotesInput,
+    description=(
+        "Add notes to SEVERAL deals in one action: the same 'content' for all "
+        "'deal_ids', or different 'notes'. Reports which deals succeeded and "
+        "which failed."
+    ),
+)
+structured_bulk_update_deal_status_tool = _structured_tool(
+    bulk_update_deal_status_tool,
+    bulk_update_deal_status_from,
+    abulk_update_deal_status_from,
+    args_schema=BulkUpdateDealStatusInput,
+    description=(
+        "Change the status of SEVERAL deals in one action: one 'status' for all "
+        "'deal_ids', or per-deal 'updates'. Status must be 'open', 'won' or "
+        "'lost'. Reports which deals succeeded and which failed."
+    ),
+)
+
+# --- Final, Updated Toolbox ---
+sales_agent_tools = [
+    deal_lookup_tool,
+    aggregate_deals_tool,
+    crm_rag_tool,
+    create_crm_note_tool,
+    update_deal_status_tool,
+    bulk_create_notes_tool,
+    bulk_update_deal_status_tool,
+]
+
+# The same toolbox for the tool-calling Sales Agent.
+sales_agent_structured_tools = [
+    structured_deal_lookup_tool,
+    structured_aggregate_deals_tool,
+    structured_crm_rag_tool,
+    structured_create_crm_note_tool,
+    structured_update_deal_status_tool,
+    structured_bulk_create_notes_tool,
+    structured_bulk_update_deal_status_tool,
+]
@@ -1,62 +1,80 @@
 from langchain.tools import Tool
 from langchain_core.prompts import PromptTemplate
-from src.llm_connector import get_llm
+from src.llm_connector import USER_FACING_TAG, get_llm
+from src.registry import component
+
+
+@component
+def get_generative_chain(template: str):
+    """
+    This is a simple chain that will power our generative tools. Each chain (and
+    the shared LLM client behind it) is built the first time a tool needs it.
+    """
+    llm = get_llm(temperature=0.7).with_config(tags=[USER_FACING_TAG])
+    return PromptTemplate.from_template(template) | llm
 
-# This is a simple chain that will power our generative tools
-llm = get_llm(temperature=0.7)
 
 # --- Marketing Agent Tool ---
-marketing_prompt = PromptTemplate.from_template(
-    "You are a marketing expert. Create a short, engaging blog post outline for the following topic: {topic}"
-)
-marketing_chain = marketing_prompt | llm
+MARKETING_TEMPLATE = "You are a marketing expert. Create a short, engaging blog post outline for the following topic: {topic}"
 
 
 def generate_blog_outline(topic: str) -> str:
     """A tool to generate blog post outlines."""
-    return marketing_chain.invoke({"topic": topic}).content
+    return get_generative_chain(MARKETING_TEMPLATE).invoke({"topic": topic}).content
+
+
+async def agenerate_blog_outline(topic: str) -> str:
+    chain = get_generative_chain(MARKETING_TEMPLATE)
+    return (await chain.ainvoke({"topic": topic})).content
 
 
 marketing_tool = Tool(
     name="Blog_Post_Outline_Generator",
     func=generate_blog_outline,
+    coroutine=agenerate_blog_outline,
     description="Use this tool to generate a blog post outline on a given topic. The input should be the topic of the blog.",
 )
 
 # --- Service Agent Tool ---
 # The service agent will primarily use the existing crm_rag_tool,
 # but we can give it a specific tool for drafting responses.
-service_prompt = PromptTemplate.from_template(
-    "You are a customer service expert. Draft a polite and helpful response to the following customer query: {query}"
-)
-service_chain = service_prompt | llm
+SERVICE_TEMPLATE = "You are a customer service expert. Draft a polite and helpful response to the following customer query: {query}"
 
 
 def draft_customer_response(query: str) -> str:
     """A tool to draft customer service email responses."""
-    return service_chain.invoke({"query": query}).content
+    return get_generative_chain(SERVICE_TEMPLATE).invoke({"query": query}).content
+
+
+async def adraft_customer_response(query: str) -> str:
+    chain = get_generative_chain(SERVICE_TEMPLATE)
+    return (await chain.ainvoke({"query": query})).content
 
 
 service_tool = Tool(
     name="Customer_Response_Drafter",
     func=draft_customer_response,
+    coroutine=adraft_customer_response,
     description="Use this tool to draft a response to a customer's question. The input should be the customer's full question.",
 )
 
 
-email_prompt = PromptTemplate.from_template(
-    "You are an expert marketing copywriter. Draft a compelling and professional marketing email based on the following topic. The email should have a clear subject line and call to action.\n\nTopic: {topic}"
-)
-email_chain = email_prompt | llm
+EMAIL_TEMPLATE = "You are an expert marketing copywriter. Draft a compelling and professional marketing email based on the following topic. The email should have a clear subject line and call to action.\n\nTopic: {topic}"
 
 
 def draft_marketing_email(topic: str) -> str:
     """A tool to draft marketing emails."""
-    return email_chain.invoke({"topic": topic}).content
+    return get_generative_chain(EMAIL_TEMPLATE).invoke({"topic": topic}).content
+
+
+async def adraft_marketing_email(topic: str) -> str:
+    chain = get_generative_chain(EMAIL_TEMPLATE)
+    return (await chain.ainvoke({"topic": topic})).content
 
 
 marketing_email_tool = Tool(
     name="Marketing_Email_Drafter",
     func=draft_marketing_email,
+    coroutine=adraft_marketing_email,
     description="Use this tool to draft a marketing email on a given topic. The input should be a string describing the purpose or topic of the email.",
 )
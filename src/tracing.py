@@ -0,0 +1,456 @@
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.tracers.context import register_configure_hook
+
+from . import config
+
+# Span kinds, used to group the waterfall summary.
+REQUEST = "request"
+NODE = "node"
+ROUTER = "router"
+LLM = "llm"
+TOOL = "tool"
+RETRIEVER = "retriever"
+EMBEDDING = "embedding"
+HTTP = "http"
+INTERNAL = "internal"
+
+_enabled = config.TRACING_ENABLED
+_trace_file = config.TRACE_FILE
+_write_lock = threading.Lock()
+# The innermost open span of the current thread/task, or None outside a trace.
+_current = contextvars.ContextVar("trace_span", default=None)
+
+
+def enable(trace_file: str | None = None):
+    """Turns tracing on at runtime (e.g. in a benchmark), optionally to another file."""
+    global _enabled, _trace_file
+    _enabled = True
+    if trace_file:
+        _trace_file = trace_file
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def _new_id(n_bytes: int) -> str:
+    return os.urandom(n_bytes).hex()
+
+
+class Span:
+    """
+    One timed operation of a trace. The exported fields follow the
+    OpenTelemetry span model (trace/span/parent IDs, kind, Unix-nanosecond
+    start and end, attributes, status).
+    """
+
+    __slots__ = (
+        "attributes",
+        "end_ns",
+        "error",
+        "kind",
+        "name",
+        "parent",
+        "span_id",
+        "start_ns",
+        "trace",
+    )
+
+    def __init__(self, trace, parent, name: str, kind: str, attributes: dict):
+        self.trace = trace
+        self.span_id = _new_id(8)
+        self.parent = parent
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes
+        self.error = None
+        self.end_ns = None
+        self.start_ns = time.time_ns()
+        trace.spans.append(self)
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def finish(self, error: BaseException | None = None):
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        self.end_ns = time.time_ns()
+
+    def to_dict(self) -> dict:
+        return {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent.span_id if self.parent else None,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns or time.time_ns(),
+            "attributes": self.attributes,
+            "status": {"code": "ERROR", "message": self.error}
+            if self.error
+            else {"code": "OK"},
+        }
+
+
+class _Trace:
+    def __init__(self):
+        self.trace_id = _new_id(16)
+        # list.append is atomic, so spans from worker threads need no lock.
+        self.spans = []
+
+
+class _NullSpan:
+    """Stands in for a span outside a trace, so instrumented code never branches."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _SpanScope:
+    def __init__(self, parent: Span, name: str, kind: str, attributes: dict):
+        self._args = (parent.trace, parent, name, kind, attributes)
+
+    def __enter__(self) -> Span:
+        self.span = Span(*self._args)
+        self._token = _current.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        self.span.finish(exc)
+        _current.reset(self._token)
+        return False
+
+
+def span(name: str, kind: str = INTERNAL, **attributes):
+    """
+    Context manager timing a block as a child of the current span. Outside a
+    trace (always, when tracing is disabled) it costs one context variable
+    lookup and yields a span whose `set()` does nothing.
+
+    Usage:
+        with tracing.span("POST api.pipedrive.com", tracing.HTTP) as span:
+            ...
+            span.set(status_code=response.status_code)
+    """
+    parent = _current.get()
+    if parent is None:
+        return _NULL_SPAN
+    return _SpanScope(parent, name, kind, attributes)
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """
+    Turns LangChain callbacks into spans: graph nodes, LLM calls (with model,
+    token counts and time to first token), tools and retrievers (Pinecone or
+    the local store). It only records runs that start inside a trace.
+
+    Runs that are not recorded (prompts, parsers, sequences...) map to their
+    nearest recorded ancestor, so the recorded spans nest correctly.
+    """
+
+    # Called in the thread/task of the run itself, which lets node and tool
+    # spans become the current span of the code they run.
+    run_inline = True
+    raise_error = False
+
+    def __init__(self):
+        self._spans = {}
+        self._ancestors = {}
+
+    def _parent(self, parent_run_id):
+        if parent_run_id is not None:
+            parent = self._spans.get(parent_run_id) or self._ancestors.get(
+                parent_run_id
+            )
+            if parent is not None:
+                return parent
+        return _current.get()
+
+    def _start(self, run_id, parent_run_id, name, kind, scoped=False, **attributes):
+        parent = self._parent(parent_run_id)
+        if parent is None:
+            return
+        span = Span(parent.trace, parent, name, kind, attributes)
+        self._spans[run_id] = span
+        if scoped:
+            _current.set(span)
+
+    def _skip(self, run_id, parent_run_id):
+        parent = self._parent(parent_run_id)
+        if parent is not None:
+            self._ancestors[run_id] = parent
+
+    def _end(self, run_id, error=None, **attributes):
+        self._ancestors.pop(run_id, None)
+        span = self._spans.pop(run_id, None)
+        if span is None:
+            return
+        span.set(**attributes)
+        span.finish(error)
+        if _current.get() is span:
+            _current.set(span.parent)
+
+    # --- Graph nodes ---
+    def on_chain_start(
+        self, serialized, inputs, *, run_id, parent_run_id=None, metadata=None, **kwargs
+    ):
+        name = kwargs.get("name")
+        if name and (metadata or {}).get("langgraph_node") == name:
+            self._start(run_id, parent_run_id, name, NODE, scoped=True)
+        else:
+            self._skip(run_id, parent_run_id)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    # --- LLM calls ---
+    def on_chat_model_start(
+        self, serialized, messages, *, run_id, parent_run_id=None, **kwargs
+    ):
+        self._start_llm(run_id, parent_run_id, kwargs)
+
+    def on_llm_start(
+        self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs
+    ):
+        self._start_llm(run_id, parent_run_id, kwargs)
+
+    def _start_llm(self, run_id, parent_run_id, kwargs):
+        metadata = kwargs.get("metadata") or {}
+        model = metadata.get("ls_model_name") or "llm"
+        self._start(
+            run_id,
+            parent_run_id,
+            model,
+            LLM,
+            model=model,
+            temperature=metadata.get("ls_temperature"),
+        )
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        span = self._spans.get(run_id)
+        if span is None:
+            return
+        attributes = span.attributes
+        if "first_token_ms" not in attributes:
+            attributes["first_token_ms"] = round(
+                (time.time_ns() - span.start_ns) / 1e6, 1
+            )
+        attributes["streamed_chunks"] = attributes.get("streamed_chunks", 0) + 1
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._end(run_id, **_token_usage(response))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    # --- Tools ---
+    def on_tool_start(
+        self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs
+    ):
+        name = kwargs.get("name") or (serialized or {}).get("name") or "tool"
+        self._start(run_id, parent_run_id, name, TOOL, scoped=True)
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    # --- Retrievers (vector store queries) ---
+    def on_retriever_start(
+        self, serialized, query, *, run_id, parent_run_id=None, **kwargs
+    ):
+        name = kwargs.get("name") or "retriever"
+        self._start(run_id, parent_run_id, name, RETRIEVER, scoped=True)
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        self._end(run_id, documents=len(documents))
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+
+def _token_usage(response) -> dict:
+    """Token counts of an LLMResult, from the provider's usage report if present."""
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    if usage.get("prompt_tokens") is not None:
+        return {
+            "prompt_tokens": usage.get("prompt_tokens"),
+            "completion_tokens": usage.get("completion_tokens"),
+        }
+    for generations in response.generations:
+        for generation in generations:
+            metadata = getattr(
+                getattr(generation, "message", None), "usage_metadata", None
+            )
+            if metadata:
+                return {
+                    "prompt_tokens": metadata.get("input_tokens"),
+                    "completion_tokens": metadata.get("output_tokens"),
+                }
+    return {}
+
+
+# Every LangChain run started while this variable holds the handler (that is,
+# inside `start_trace`) reports to it, without passing callbacks around.
+_handler = TracingCallbackHandler()
+_handler_var = contextvars.ContextVar("tracing_callback_handler", default=None)
+register_configure_hook(_handler_var, inheritable=True)
+
+
+class _TraceScope:
+    def __init__(self, name: str, attributes: dict):
+        self._name = name
+        self._attributes = attributes
+
+    def __enter__(self) -> Span:
+        self.span = Span(_Trace(), None, self._name, REQUEST, self._attributes)
+        self._tokens = (_current.set(self.span), _handler_var.set(_handler))
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        self.span.finish(exc)
+        span_token, handler_token = self._tokens
+        try:
+            _current.reset(span_token)
+            _handler_var.reset(handler_token)
+        except ValueError:
+            # An abandoned async generator is closed from another context.
+            pass
+        export(self.span.trace)
+        return False
+
+
+def start_trace(name: str, **attributes):
+    """
+    Context manager around one request (e.g. a chat turn). Everything traced
+    inside it becomes part of the request's trace, which is appended to
+    TRACE_FILE when the block exits and, with TRACE_WATERFALL, printed as a
+    waterfall. Does nothing when tracing is disabled.
+    """
+    if not _enabled or _current.get() is not None:
+        return _NULL_SPAN
+    return _TraceScope(name, attributes)
+
+
+def export(trace: _Trace):
+    spans = [span.to_dict() for span in trace.spans]
+    try:
+        directory = os.path.dirname(os.path.abspath(_trace_file))
+        os.makedirs(directory, exist_ok=True)
+        with _write_lock, open(_trace_file, "a", encoding="utf-8") as f:
+            for span in spans:
+                f.write(json.dumps(span, default=str) + "\n")
+    except OSError as e:
+        print(f"⚠️ Could not write trace to {_trace_file}: {e}")
+    if config.TRACE_WATERFALL:
+        print(format_waterfall(spans))
+
+
+def _covered_ns(intervals) -> int:
+    """Wall time covered by possibly overlapping (start, end) intervals."""
+    covered, reach = 0, None
+    for start, end in sorted(intervals):
+        if reach is None or start > reach:
+            covered += end - start
+            reach = end
+        elif end > reach:
+            covered += end - reach
+            reach = end
+    return covered
+
+
+def format_waterfall(spans: list[dict], width: int = 40) -> str:
+    """
+    Renders the exported spans of one trace as a waterfall: one line per span
+    with its start offset, duration and a bar on the request's timeline,
+    followed by the wall time covered by each kind of span.
+    """
+    if not spans:
+        return ""
+    by_parent = {}
+    for span in spans:
+        by_parent.setdefault(span["parentSpanId"], []).append(span)
+    roots = by_parent.get(None) or [min(spans, key=lambda s: s["startTimeUnixNano"])]
+    origin = min(span["startTimeUnixNano"] for span in spans)
+    total = max(span["endTimeUnixNano"] for span in spans) - origin or 1
+
+    lines = [f"--- TRACE {spans[0]['traceId']} ({total / 1e9:.2f}s) ---"]
+
+    def render(span, depth):
+        start = span["startTimeUnixNano"] - origin
+        duration = span["endTimeUnixNano"] - span["startTimeUnixNano"]
+        offset = int(width * start / total)
+        length = max(1, int(width * duration / total))
+        bar = (" " * offset + "█" * length)[:width].ljust(width)
+        failed = " ❌" if span["status"]["code"] == "ERROR" else ""
+        lines.append(
+            f"{start / 1e6:8.0f}ms {duration / 1e6:8.0f}ms |{bar}| "
+            f"{'  ' * depth}[{span['kind']}] {span['name']}{failed}"
+        )
+        children = by_parent.get(span["spanId"], [])
+        for child in sorted(children, key=lambda s: s["startTimeUnixNano"]):
+            render(child, depth + 1)
+
+    for root in roots:
+        render(root, 0)
+
+    kinds = {}
+    for span in spans:
+        if span["kind"] != REQUEST:
+            kinds.setdefault(span["kind"], []).append(
+                (span["startTimeUnixNano"], span["endTimeUnixNano"])
+            )
+    summary = ", ".join(
+        f"{kind} {_covered_ns(intervals) / 1e9:.2f}s"
+        for kind, intervals in sorted(
+            kinds.items(), key=lambda item: -_covered_ns(item[1])
+        )
+    )
+    lines.append(f"Time by kind: {summary}")
+    lines.append("--- END TRACE ---")
+    return "\n".join(lines)
+
+
+def load_traces(path: str | None = None) -> list[list[dict]]:
+    """Reads a trace file back as one list of spans per trace, in file order."""
+    traces = {}
+    with open(path or _trace_file, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                span = json.loads(line)
+                traces.setdefault(span["traceId"], []).append(span)
+    return list(traces.values())
+
+
+# Prints the waterfalls of the last traces in a trace file:
+#   python -m src.tracing [trace file] [number of traces]
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else _trace_file
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    for spans in load_traces(path)[-count:]:
+        print(format_waterfall(spans))
@@ -44,6 +44,26 @@ def get_pinecone_index(client: Pinecone, index_name: str):
     return client.Index(index_name)
 
 
+def get_vector_store(embedding):
+    """
+    Returns the LangChain vector store selected by VECTOR_STORE_BACKEND.
+
+    Both backends expose the same VectorStore interface (add_documents, delete,
+    similarity_search, as_retriever, ...). The local backend additionally has a
+    `persist()` method that must be called after writes.
+    """
+    if config.VECTOR_STORE_BACKEND == "local":
+        from .local_vector_store import LocalVectorStore
+
+        return LocalVectorStore.load(config.LOCAL_VECTOR_STORE_PATH, embedding)
+
+    from langchain_pinecone import PineconeVectorStore
+
+    return PineconeVectorStore(
+        index_name=config.PINECONE_INDEX_NAME, embedding=embedding
+    )
+
+
 # This __main__ block for direct testing is fine and does not cause issues.
 if __name__ == "__main__":
     print("--- Running a direct test of the Vector Store Connector ---")